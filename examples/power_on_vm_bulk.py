@@ -1,4 +1,6 @@
-from vmjuggler import VCenter
+from vmjuggler import VCenter, Logger
+
+Logger.set()  # Print vmjuggler messages to the console
 
 args = {'host': '10.0.0.1',  # VCenter IP or hostname
         'user': 'foo',       # VCenter username
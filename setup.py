@@ -41,7 +41,10 @@ setup(
     ],
     keywords='vmware pyvmomi vm vcenter API devops sdk',
     packages=['vmjuggler'],
-    install_requires=['pyvmomi>=6.5', 'future-fstrings>=0.4.2'],
+    install_requires=['pyvmomi>=6.5', 'future-fstrings>=0.4.2', 'requests'],
+    entry_points={
+        'console_scripts': ['vmjuggler=vmjuggler.cli:main'],
+    },
 
     # List additional URLs that are relevant to your project as a dict.
     #
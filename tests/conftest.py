@@ -0,0 +1,21 @@
+import pytest
+from fakes import FakeStub, make_vc
+from vmjuggler.helpers import VMJHelper
+
+
+@pytest.fixture
+def stub():
+    return FakeStub()
+
+
+@pytest.fixture
+def vc(stub):
+    return make_vc(stub)
+
+
+@pytest.fixture
+def task_results():
+    """Return TaskResult objects from operations for the duration of test"""
+    VMJHelper.task_results = True
+    yield
+    VMJHelper.task_results = False
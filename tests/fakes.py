@@ -0,0 +1,275 @@
+"""
+In-memory stand-in for VCenter used by tests.
+
+:class:`FakeStub` takes place of SOAP stub of raw managed objects, so pyVmomi objects work as usual, but
+properties are served from memory and methods are routed to Python functions. PropertyCollector calls
+(paged retrieval, versioned updates), container views and tasks are implemented on top of it.
+"""
+
+import datetime
+import itertools
+from types import SimpleNamespace
+from pyVmomi import vim, vmodl
+from vmjuggler.base_objects import VCenter
+
+
+class FakeStub(object):
+    """
+    SOAP stub which serves VCenter inventory from memory.
+
+    Objects are added by :meth:`add`, methods are set by :meth:`on`. Methods which are not set return None,
+    except task methods which return successful task.
+    """
+
+    host = 'vc.local:443'
+    cookie = 'vmware_soap_session="52a1"; Path=/; HttpOnly'
+    version = 'vim.version.version13'
+
+    def __init__(self):
+        self.props = {}  # moId -> {property path: value}
+        self.objects = []  # Inventory objects in order of adding
+        self.methods = {}  # (moId or type name, method name) -> function(mo, **kwargs)
+        self.calls = []  # (moId, method name, kwargs) of every method call
+        self.views = {}  # View moId -> list of types
+        self.collectors = {}  # Collector moId -> {'spec': FilterSpec, 'version': int}
+        self.destroyed = []  # moIds of destroyed views and collectors
+        self.updates = []  # Updates served to watching collectors, see update()
+        self.missing = set()  # moIds reported as ManagedObjectNotFound by retrieval
+        self.page_calls = 0  # Number of RetrievePropertiesEx and ContinueRetrievePropertiesEx calls
+        self._tokens = {}
+        self._ids = itertools.count(1)
+        self.content = SimpleNamespace(
+            rootFolder=vim.Folder('group-d1', self),
+            propertyCollector=vmodl.query.PropertyCollector('propertyCollector', self),
+            viewManager=vim.view.ViewManager('ViewManager', self),
+            customFieldsManager=vim.CustomFieldsManager('CustomFieldsManager', self),
+            eventManager=vim.event.EventManager('EventManager', self),
+            taskManager=vim.TaskManager('TaskManager', self),
+            about=SimpleNamespace(instanceUuid='vc-uuid-1'),
+            guestOperationsManager=None,
+            ovfManager=None)
+        self.props['group-d1'] = {'name': 'Datacenters'}
+
+    def add(self, obj_type, moid, **props):
+        """
+        Add object to inventory.
+
+        :param obj_type: Raw type, e.g. vim.VirtualMachine.
+        :param str moid: Managed object ID.
+        :param props: Property values. Nested paths are passed as dict, e.g. add(..., **{'runtime.host': h}).
+        :return: Raw object bound to the stub.
+        """
+        obj = obj_type(moid, self)
+        self.props[moid] = dict(props)
+        self.objects.append(obj)
+        return obj
+
+    def remove(self, obj):
+        """Remove object from inventory."""
+        self.props.pop(obj._moId, None)
+        self.objects = [el for el in self.objects if el._moId != obj._moId]
+
+    def on(self, target, method, fn):
+        """
+        Route method to function.
+
+        :param target: Raw object, moId or type name (e.g. 'VirtualMachine') the method belongs to.
+        :param str method: Method name as in the API, e.g. 'ReconfigVM_Task'.
+        :param fn: Function which takes raw object and method arguments as keyword arguments.
+        """
+        key = target._moId if hasattr(target, '_moId') else target
+        self.methods[(key, method)] = fn
+
+    def task(self, state='success', result=None, error=None, cancelable=False):
+        """Create task object in given state."""
+        moid = f'task-{next(self._ids)}'
+        task = vim.Task(moid, self)
+        now = datetime.datetime(2024, 1, 1, 12, 0, 0)
+        self.props[moid] = {'info': vim.TaskInfo(key=moid, task=task, state=state, result=result, error=error,
+                                                 cancelable=cancelable, queueTime=now,
+                                                 startTime=now + datetime.timedelta(seconds=1),
+                                                 completeTime=now + datetime.timedelta(seconds=3)
+                                                 if state in ('success', 'error') else None)}
+        return task
+
+    def update(self, *changes):
+        """
+        Queue update for watching collectors.
+
+        :param changes: Tuples (kind, raw object, {property path: value}), kind is 'enter', 'modify' or 'leave'.
+        """
+        self.updates.append(changes)
+
+    def count(self, method):
+        """Number of calls of the method."""
+        return len([el for el in self.calls if el[1] == method])
+
+    # Stub interface used by pyVmomi
+
+    def InvokeAccessor(self, mo, info):
+        if isinstance(mo, vim.view.ContainerView):
+            return self._in_view(mo)
+        return self._get(mo, info.name)
+
+    def InvokeMethod(self, mo, info, args):
+        kwargs = dict((p.name, a) for p, a in zip(info.params, args))
+        name = info.wsdlName
+        self.calls.append((mo._moId, name, kwargs))
+        fn = self.methods.get((mo._moId, name)) or self.methods.get((mo._wsdlName, name))
+        if fn is not None:
+            return fn(mo, **kwargs)
+        builtin = getattr(self, f'_{name}', None)
+        if builtin is not None:
+            return builtin(mo, **kwargs)
+        if name.endswith('_Task'):
+            return self.task()
+        return None
+
+    def DropConnections(self):
+        pass
+
+    # Properties
+
+    def _get(self, mo, path):
+        """Property value by path, None if unset"""
+        props = self.props.get(mo._moId, {})
+        if path in props:
+            return props[path]
+        nested = dict((k[len(path) + 1:], v) for k, v in props.items() if k.startswith(path + '.'))
+        if nested:
+            return _Nested(nested)
+        head, _, rest = path.partition('.')
+        value = props.get(head)
+        for el in rest.split('.') if rest and value is not None else []:
+            value = getattr(value, el, None)
+        return value
+
+    def _in_view(self, view):
+        types = tuple(self.views.get(view._moId) or [vim.ManagedEntity])
+        return [el for el in self.objects if isinstance(el, types)]
+
+    # Built-in methods
+
+    def _RetrieveServiceContent(self, mo):
+        return self.content
+
+    def _CreateContainerView(self, mo, container, type, recursive):
+        view = vim.view.ContainerView(f'session[1]view-{next(self._ids)}', self)
+        self.views[view._moId] = list(type or [])
+        return view
+
+    def _DestroyView(self, mo):
+        self.destroyed.append(mo._moId)
+        self.views.pop(mo._moId, None)
+
+    def _RetrievePropertiesEx(self, mo, specSet, options):
+        found = []
+        for spec in specSet:
+            for obj_spec in spec.objectSet:
+                if isinstance(obj_spec.obj, vim.view.ContainerView) and obj_spec.skip:
+                    objects = self._in_view(obj_spec.obj)
+                elif obj_spec.obj._moId in self.missing or obj_spec.obj._moId not in self.props:
+                    raise vmodl.fault.ManagedObjectNotFound(obj=obj_spec.obj)
+                else:
+                    objects = [obj_spec.obj]
+                for obj in objects:
+                    found.append(self._content(obj, spec.propSet))
+        found = [el for el in found if el is not None]
+        return self._page(found, options.maxObjects if options else None)
+
+    def _content(self, obj, prop_set):
+        """ObjectContent of object for the first matching property spec"""
+        for el in prop_set:
+            if isinstance(obj, el.type):
+                values = [(path, self._get(obj, path)) for path in el.pathSet]
+                return SimpleNamespace(obj=obj, propSet=[SimpleNamespace(name=k, val=v) for k, v in values
+                                                         if v is not None])
+        return None
+
+    def _page(self, objects, size):
+        self.page_calls += 1
+        size = size or len(objects) or 1
+        token = None
+        if len(objects) > size:
+            token = f'token-{next(self._ids)}'
+            self._tokens[token] = (objects[size:], size)
+        return SimpleNamespace(objects=objects[:size], token=token) if objects else None
+
+    def _ContinueRetrievePropertiesEx(self, mo, token):
+        objects, size = self._tokens.pop(token)
+        return self._page(objects, size)
+
+    def _CancelRetrievePropertiesEx(self, mo, token):
+        self._tokens.pop(token, None)
+
+    def _CreatePropertyCollector(self, mo):
+        pc = vmodl.query.PropertyCollector(f'session[1]pc-{next(self._ids)}', self)
+        self.collectors[pc._moId] = {'spec': None, 'version': 0}
+        return pc
+
+    def _CreateFilter(self, mo, spec, partialUpdates):
+        self.collectors[mo._moId]['spec'] = spec
+        return vmodl.query.PropertyCollector.Filter(f'session[1]filter-{next(self._ids)}', self)
+
+    def _DestroyPropertyCollector(self, mo):
+        self.destroyed.append(mo._moId)
+        self.collectors.pop(mo._moId, None)
+
+    def _WaitForUpdatesEx(self, mo, version, options):
+        collector = self.collectors[mo._moId]
+        spec = collector['spec']
+        obj = spec.objectSet[0].obj
+        if isinstance(obj, vim.Task):
+            info = self.props[obj._moId]['info']
+            if version or info.state in ('queued', 'running'):
+                return None
+            return self._update_set(1, [('enter', obj, {'info.state': info.state})])
+        if not version:
+            changes = []
+            for el in self._in_view(obj):
+                content = self._content(el, spec.propSet)
+                if content is not None:
+                    changes.append(('enter', el, dict((p.name, p.val) for p in content.propSet)))
+            collector['version'] = 1
+            return self._update_set(collector['version'], changes)
+        if not self.updates:
+            return None
+        collector['version'] += 1
+        return self._update_set(collector['version'], self.updates.pop(0))
+
+    @staticmethod
+    def _update_set(version, changes):
+        objects = [SimpleNamespace(kind=kind, obj=obj,
+                                   changeSet=[SimpleNamespace(name=k, val=v, op='assign') for k, v in props.items()])
+                   for kind, obj, props in changes]
+        return SimpleNamespace(version=str(version), truncated=False, filterSet=[SimpleNamespace(objectSet=objects)])
+
+
+class _Nested(object):
+    """Data object built from nested property paths, e.g. 'runtime.host' and 'runtime.powerState'"""
+
+    def __init__(self, props):
+        self._props = props
+
+    def __getattr__(self, item):
+        if item.startswith('_'):
+            raise AttributeError(item)
+        if item in self._props:
+            return self._props[item]
+        nested = dict((k[len(item) + 1:], v) for k, v in self._props.items() if k.startswith(item + '.'))
+        return _Nested(nested) if nested else None
+
+
+def make_vc(stub=None):
+    """
+    VCenter object connected to the fake stub.
+
+    :param FakeStub stub: Stub to use. New one created if not specified.
+    :return: VCenter object, its stub is available as 'vc.stub'.
+    """
+    stub = stub or FakeStub()
+    vc = VCenter(stub.host.rsplit(':', 1)[0], 'user', 'password')
+    vc.si = vim.ServiceInstance('ServiceInstance', stub)
+    vc.content = stub.content
+    vc.stub = stub
+    return vc
@@ -0,0 +1,62 @@
+from pyVmomi import vim
+from vmjuggler import VirtualMachine
+
+FM = 'CustomFieldsManager'
+
+
+def _field(key, name):
+    return vim.CustomFieldsManager.FieldDef(key=key, name=name, type=str, managedObjectType=vim.VirtualMachine)
+
+
+def _vm(stub, moid, name, values=None):
+    return stub.add(vim.VirtualMachine, moid, name=name,
+                    customValue=[vim.CustomFieldsManager.StringValue(key=k, value=v)
+                                 for k, v in (values or {}).items()])
+
+
+def _set_calls(stub):
+    return sorted((el[2]['entity']._moId, el[2]['value']) for el in stub.calls if el[1] == 'SetField')
+
+
+def test_select_by_attrs(vc, stub):
+    stub.props[FM] = {'field': [_field(101, 'team')]}
+    _vm(stub, 'vm-1', 'vm1', {101: 'ci'})
+    _vm(stub, 'vm-2', 'vm2', {101: 'qa'})
+    _vm(stub, 'vm-3', 'vm3')
+    found = vc.get_vm(attrs={'team': 'ci'})
+    assert [el.name for el in found] == ['vm1']
+    assert vc.get_vm(attrs={'owner': 'me'}) == []
+
+
+def test_set_attr_skips_and_keys_by_item(vc, stub):
+    stub.props[FM] = {'field': [_field(101, 'team')]}
+    same = _vm(stub, 'vm-1', 'web', {101: 'ci'})
+    other = _vm(stub, 'vm-2', 'web', {101: 'qa'})
+    wrapped = VirtualMachine(_vm(stub, 'vm-3', 'db'), name='db')
+    r = vc.set_attr(iter([same, other, wrapped, 'missing']), 'team', 'ci')
+    assert r == {same: None, other: True, wrapped: True, 'missing': False}
+    assert _set_calls(stub) == [('vm-2', 'ci'), ('vm-3', 'ci')]
+    # Index is updated, so the next call skips all of them
+    assert vc.set_attr([other, wrapped], 'team', 'ci') == {other: None, wrapped: None}
+    assert len(_set_calls(stub)) == 2
+
+
+def test_set_attr_creates_field(vc, stub):
+    vm = _vm(stub, 'vm-1', 'vm1')
+    stub.on(FM, 'AddCustomFieldDef', lambda mo, **kwargs: _field(102, kwargs['name']))
+    assert vc.set_attr(['vm1'], 'owner', 'me') == {'vm1': True}
+    assert stub.count('AddCustomFieldDef') == 1
+    assert _set_calls(stub) == [(vm._moId, 'me')]
+
+
+def test_set_attr_field_not_created(vc, stub, task_results):
+    vm = _vm(stub, 'vm-1', 'vm1')
+
+    def fail(mo, **kwargs):
+        raise vim.fault.DuplicateName(name=kwargs['name'], msg='duplicate')
+
+    stub.on(FM, 'AddCustomFieldDef', fail)
+    r = vc.set_attr(['vm1', vm], 'owner', 'me')
+    assert list(r) == ['vm1', vm]
+    assert [el.fault for el in r.values()] == ['vim.fault.DuplicateName'] * 2
+    assert stub.count('SetField') == 0
@@ -0,0 +1,76 @@
+from pyVmomi import vim
+from fakes import make_vc
+from vmjuggler.cache import InventorySnapshot
+
+
+def _inventory(stub):
+    folder = stub.add(vim.Folder, 'group-v1', name='vm', parent=stub.content.rootFolder)
+    vms = [stub.add(vim.VirtualMachine, f'vm-{i}', name=f'vm{i}', parent=folder) for i in range(3)]
+    return folder, vms
+
+
+def _moids(rows):
+    return sorted(el['moid'] for el in rows)
+
+
+def test_first_call_reports_all(vc, stub):
+    _inventory(stub)
+    r = vc.changes()
+    assert r['full']
+    assert _moids(r['added']) == ['group-v1', 'vm-0', 'vm-1', 'vm-2']
+    assert r['modified'] == [] and r['removed'] == []
+    added = dict((el['moid'], el) for el in r['added'])
+    assert added['vm-1']['type'] == 'vim.VirtualMachine'
+    assert added['vm-1']['props']['name'] == 'vm1'
+
+
+def test_incremental_changes(vc, stub):
+    folder, vms = _inventory(stub)
+    token = vc.changes()['token']
+    r = vc.changes(since=token)
+    assert (r['added'], r['modified'], r['removed']) == ([], [], [])
+    assert r['token'] == token
+    new = stub.add(vim.VirtualMachine, 'vm-9', name='vm9', parent=folder)
+    stub.update(('modify', vms[0], {'name': 'renamed'}), ('modify', vms[1], {'name': 'vm1'}),
+                ('enter', new, {'name': 'vm9', 'parent': folder}), ('leave', vms[2], {}))
+    r = vc.changes(since=token)
+    assert not r['full'] and r['token'] != token
+    assert r['modified'] == [{'moid': 'vm-0', 'type': 'vim.VirtualMachine', 'changed': ['name'],
+                              'props': {'name': 'renamed'}}]  # vm-1 is reported by server, but not changed
+    assert _moids(r['added']) == ['vm-9']
+    assert r['removed'] == [{'moid': 'vm-2', 'type': 'vim.VirtualMachine'}]
+
+
+def test_unknown_token_compares_with_snapshot(vc, stub, tmp_path):
+    path = str(tmp_path / 'inventory.snap')
+    folder, vms = _inventory(stub)
+    token = vc.changes(snapshot_path=path)['token']
+    # Next run of the process: new session, objects changed while nothing watched them
+    stub.props['vm-0']['name'] = 'renamed'
+    stub.remove(vms[2])
+    stub.add(vim.VirtualMachine, 'vm-9', name='vm9', parent=folder)
+    r = make_vc(stub).changes(since=token, snapshot_path=path)
+    assert not r['full']
+    assert [(el['moid'], el['changed']) for el in r['modified']] == [('vm-0', ['name'])]
+    assert _moids(r['added']) == ['vm-9']
+    assert r['removed'] == [{'moid': 'vm-2', 'type': 'vim.VirtualMachine'}]
+    assert len(InventorySnapshot(path).objects) == 4
+
+
+def test_stale_token_without_snapshot(vc, stub):
+    _inventory(stub)
+    vc.changes()
+    r = vc.changes(since='other-session:1')
+    assert r['full']
+    assert len(r['added']) == 4
+
+
+def test_feeds_by_properties(vc, stub):
+    _, vms = _inventory(stub)
+    by_name = vc.changes(obj_type=[vim.VirtualMachine], properties=['name'])
+    by_parent = vc.changes(obj_type=[vim.VirtualMachine], properties=['parent'])
+    assert by_name['token'] != by_parent['token']
+    assert [el['props'] for el in by_name['added']][0] == {'name': 'vm0'}
+    stub.update(('modify', vms[0], {'name': 'renamed'}))
+    r = vc.changes(since=by_name['token'], obj_type=[vim.VirtualMachine], properties=['name'])
+    assert _moids(r['modified']) == ['vm-0']
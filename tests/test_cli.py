@@ -0,0 +1,130 @@
+import io
+import json
+import pytest
+from pyVmomi import vim
+from fakes import make_vc
+from vmjuggler import VCenter, VirtualMachine, cli
+from vmjuggler.helpers import TaskResult
+from vmjuggler.progress import Progress
+
+
+@pytest.fixture
+def attached(stub, monkeypatch):
+    """Worker threads of VCenter.map get connection to the same fake stub"""
+    monkeypatch.setattr(VCenter, 'attach', classmethod(lambda cls, *args: make_vc(stub)))
+
+
+@pytest.fixture
+def exit_codes(monkeypatch):
+    """VirtualMachine.run returns exit code by program name"""
+    codes = {'/bin/true': 0, '/bin/false': 1}
+    monkeypatch.setattr(VirtualMachine, 'run', lambda self, program, **kwargs: codes.get(program))
+
+
+def _ops(*rows):
+    return cli.read_ops(io.StringIO(''.join(json.dumps(el) + '\n' for el in rows)), 'jsonl')
+
+
+def test_read_ops():
+    rows = cli.read_ops(io.StringIO('vm,action,args\nvm1,power_on,\nvm2,run,"{""program"": ""/bin/true""}"\n'),
+                        'csv')
+    assert rows == [{'line': 2, 'vm': 'vm1', 'action': 'power_on', 'args': {}},
+                    {'line': 3, 'vm': 'vm2', 'action': 'run', 'args': {'program': '/bin/true'}}]
+    assert _ops({'vm': 'vm1', 'action': 'reboot'}) == [{'line': 1, 'vm': 'vm1', 'action': 'reboot', 'args': {}}]
+
+
+def test_read_ops_keeps_bad_rows():
+    rows = cli.read_ops(io.StringIO('{"vm": "vm1", "action": "reboot"}\n{"vm": "vm1", \n[1]\n'
+                                    '{"vm": "vm1", "action": "run", "args": "{program"}\n'
+                                    '{"vm": "vm1", "action": "run", "args": [1]}\n'), 'jsonl')
+    assert [el['line'] for el in rows] == [1, 2, 3, 4, 5]
+    assert 'error' not in rows[0]
+    assert [el['error'].split(':')[0] for el in rows[1:]] == ['Invalid JSON', 'Invalid JSON', 'Invalid args',
+                                                              'Invalid args']
+    rows = cli.read_ops(io.StringIO('vm,action,args\nvm1,run,not json\n'), 'csv')
+    assert rows[0]['error'].startswith('Invalid args')
+
+
+def test_succeeded():
+    assert cli._succeeded('run', 0)
+    assert not cli._succeeded('run', 1)
+    assert not cli._succeeded('run', None)
+    assert not cli._succeeded('run', False)
+    assert cli._succeeded('run', TaskResult(True, result=0))
+    assert not cli._succeeded('run', TaskResult(False, result=1))
+    assert cli._succeeded('power_on', True)
+    assert not cli._succeeded('power_on', None)
+    assert not cli._succeeded('upload', TaskResult(False, fault='IOError'))
+
+
+def test_run_ops(vc, stub, attached, exit_codes):
+    stub.add(vim.VirtualMachine, 'vm-1', name='vm1')
+    stub.add(vim.VirtualMachine, 'vm-2', name='vm2')
+    out = io.StringIO()
+    results = cli.run_ops(vc, _ops({'vm': 'vm1', 'action': 'run', 'args': {'program': '/bin/true'}},
+                                   {'vm': 'vm1', 'action': 'run', 'args': {'program': '/bin/false'}},
+                                   {'vm': 'vm2', 'action': 'power_on'},
+                                   {'vm': 'vm3', 'action': 'power_on'},
+                                   {'vm': 'vm2', 'action': 'format_disk'}), out=out)
+    rows = dict((el['line'], el) for el in map(json.loads, out.getvalue().splitlines()))
+    assert dict((k, v['ok']) for k, v in rows.items()) == {1: True, 2: False, 3: True, 4: False, 5: False}
+    assert rows[2]['result'] == 1
+    assert rows[4]['error'] == 'VM "vm3" not found'
+    assert rows[5]['error'] == 'Unknown action "format_disk"'
+    assert sorted(el['line'] for el in results) == [1, 2, 3, 4, 5]
+
+
+def test_run_ops_bad_rows(vc, stub, attached):
+    stub.add(vim.VirtualMachine, 'vm-1', name='vm1')
+    src = '\n'.join(['{"action": "power_on"}', '{"vm": 1, "action": "power_on"}', '{"vm": ["vm1"], "action": "reset"}',
+                     '{"vm": "vm1", "action"', '{"vm": "vm1", "action": "run", "args": "{program"}',
+                     '{"vm": "vm1", "action": "power_on"}'])
+    out = io.StringIO()
+    cli.run_ops(vc, cli.read_ops(io.StringIO(src), 'jsonl'), out=out)
+    rows = dict((el['line'], el) for el in map(json.loads, out.getvalue().splitlines()))
+    assert dict((k, v['ok']) for k, v in rows.items()) == {1: False, 2: False, 3: False, 4: False, 5: False, 6: True}
+    assert rows[1]['error'] == rows[2]['error'] == rows[3]['error'] == 'VM name expected'
+    assert rows[4]['error'].startswith('Invalid JSON')
+    assert rows[5]['error'].startswith('Invalid args')
+
+
+def test_run_ops_counts_rows(vc, stub, attached, exit_codes):
+    stub.add(vim.VirtualMachine, 'vm-1', name='vm1')
+    stub.on('VirtualMachine', 'PowerOnVM_Task', lambda mo, **kwargs: stub.task('error', error=vim.fault.InvalidState()))
+    ops = _ops({'vm': 'vm1', 'action': 'run', 'args': {'program': '/bin/true'}},
+               {'vm': 'vm1', 'action': 'run', 'args': {'program': '/bin/false'}},
+               {'vm': 'vm1', 'action': 'power_on'},
+               {'vm': 'vm1', 'action': 'create_snap', 'args': {'name': 'before'}},
+               {'vm': 'vm2', 'action': 'power_on'})
+    states = []
+    with Progress(total=len(ops), sinks=[]) as tracker:
+        cli.run_ops(vc, ops)
+        states.append(tracker.state())
+    state = states[0]
+    assert (state['total'], state['done'], state['failed'], state['running']) == (5, 2, 3, 0)
+    assert state['percent'] == 100.0
+
+
+def test_main_exit_code(tmp_path, monkeypatch, stub, exit_codes):
+    raw = stub.add(vim.VirtualMachine, 'vm-1', name='vm1')
+    monkeypatch.setattr(VCenter, 'connect', lambda self, exit_on_fault=True: True)
+    monkeypatch.setattr(VCenter, 'disconnect', lambda self: None)
+    monkeypatch.setattr(VCenter, '_fetch_vms', lambda self, vms, props: dict((el, (raw, {'name': el}))
+                                                                             for el in vms if el == 'vm1'))
+    monkeypatch.setattr(VCenter, 'map', lambda self, fn, items, workers=10: [fn(el) for el in items])
+    monkeypatch.setattr('vmjuggler.helpers.Logger.set', staticmethod(lambda: None))
+    src = tmp_path / 'ops.jsonl'
+    output = tmp_path / 'results.jsonl'
+
+    def main(program):
+        src.write_text(json.dumps({'vm': 'vm1', 'action': 'run', 'args': {'program': program}}) + '\n')
+        code = cli.main([str(src), '--host', 'vc.local', '--user', 'admin', '--password', 'secret',
+                         '--output', str(output), '--progress'])
+        return code, json.loads(output.read_text())
+
+    code, row = main('/bin/false')
+    assert code == 1
+    assert row['ok'] is False and row['result'] == 1
+    code, row = main('/bin/true')
+    assert code == 0
+    assert row['ok'] is True and row['result'] == 0
@@ -0,0 +1,87 @@
+import datetime
+from pyVmomi import vim
+from vmjuggler import Datastore
+from vmjuggler.cache import ListingCache, DatastoreFile
+
+Browser = vim.host.DatastoreBrowser
+EPOCH = datetime.datetime(2024, 1, 1)
+
+
+class FakeFs(object):
+    """Datastore tree of {folder path: {entry name: (type, mtime)}}, folders have entries too"""
+
+    def __init__(self, stub, tree):
+        self.stub = stub
+        self.tree = tree
+        self.listed = []
+        browser = Browser('browser-1', stub)
+        self.ds = Datastore(stub.add(vim.Datastore, 'datastore-1', name='ds1', browser=browser,
+                                     **{'summary.url': 'ds:///vmfs/volumes/1/'}))
+        stub.on(browser, 'SearchDatastore_Task', self.search)
+        stub.on(browser, 'SearchDatastoreSubFolders_Task', self.search_sub)
+
+    @staticmethod
+    def _folder(ds_path):
+        return ds_path.split(']', 1)[1].strip().strip('/')
+
+    def _info(self, name, kind, mtime):
+        cls = Browser.FolderInfo if kind == 'folder' else Browser.VmDiskInfo
+        return cls(path=name, fileSize=0, modification=EPOCH + datetime.timedelta(seconds=mtime))
+
+    def search(self, mo, datastorePath, searchSpec):
+        folder = self._folder(datastorePath)
+        self.listed.append(folder)
+        files = [self._info(k, *v) for k, v in sorted(self.tree[folder].items())]
+        return self.stub.task(result=Browser.SearchResults(folderPath=datastorePath, file=files))
+
+    def search_sub(self, mo, datastorePath, searchSpec):
+        start = self._folder(datastorePath)
+        r = []
+        for folder, entries in sorted(self.tree.items()):
+            if folder == start or folder.startswith(f'{start}/') or not start:
+                files = [self._info(k, *v) for k, v in sorted(entries.items()) if v[0] == 'folder']
+                r.append(Browser.SearchResults(folderPath=f'[ds1] {folder}/' if folder else '[ds1]', file=files))
+        return self.stub.task(result=Browser.SearchResults.Array(r))
+
+
+def test_walk_pattern(stub):
+    fs = FakeFs(stub, {'': {'a': ('folder', 1), 'x.vmdk': ('file', 1)}, 'a': {'y.vmdk': ('file', 1)}})
+    found = sorted(el.path for el in fs.ds.walk(pattern='*.vmdk'))
+    assert found == ['a/y.vmdk', 'x.vmdk']
+    assert stub.count('SearchDatastoreSubFolders_Task') == 0
+
+
+def test_walk_cache_sees_nested_change(stub, tmp_path):
+    tree = {'': {'a': ('folder', 1)}, 'a': {'b': ('folder', 1)}, 'a/b': {'x.vmdk': ('file', 1)}}
+    fs = FakeFs(stub, tree)
+    cache = ListingCache(str(tmp_path / 'listing.json'))
+    assert [el.path for el in fs.ds.walk(pattern='*.vmdk', cache=cache)] == ['a/b/x.vmdk']
+    assert sorted(fs.listed) == ['', 'a', 'a/b']
+
+    # New file changes mtime of 'a/b' only, parent 'a' keeps its mtime
+    tree['a/b']['y.vmdk'] = ('file', 5)
+    tree['a']['b'] = ('folder', 5)
+    fs.listed = []
+    assert sorted(el.path for el in fs.ds.walk(pattern='*.vmdk', cache=cache)) == ['a/b/x.vmdk', 'a/b/y.vmdk']
+    assert sorted(fs.listed) == ['', 'a/b']
+
+
+def test_walk_cache_unchanged(stub, tmp_path):
+    fs = FakeFs(stub, {'': {'a': ('folder', 1)}, 'a': {'x.vmdk': ('file', 1)}})
+    cache = ListingCache(str(tmp_path / 'listing.json'))
+    list(fs.ds.walk(cache=cache))
+    fs.listed = []
+    assert [el.path for el in fs.ds.walk(cache=cache)] == ['a', 'a/x.vmdk']
+    assert fs.listed == ['']
+
+
+def test_listing_cache_round_trip(tmp_path):
+    path = str(tmp_path / 'listing.json')
+    cache = ListingCache(path)
+    entries = [DatastoreFile('a/x.vmdk', 'x.vmdk', 10, 100.0, 'vmdisk')]
+    cache.put('ds:///1/', 'a', 100.0, entries)
+    cache.save()
+    loaded = ListingCache(path)
+    assert loaded.get('ds:///1/', 'a', 100.0) == entries
+    assert loaded.get('ds:///1/', 'a', 101.0) is None
+    assert loaded.get('ds:///2/', 'a', 100.0) is None
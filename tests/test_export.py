@@ -0,0 +1,82 @@
+import csv
+import json
+import pytest
+from pyVmomi import vim
+from vmjuggler.export import CsvWriter, ParquetWriter, flatten, get_writer
+
+
+def _inventory(stub):
+    host = stub.add(vim.HostSystem, 'host-1', name='esx1')
+    stub.add(vim.VirtualMachine, 'vm-1', name='vm1', **{'runtime.host': host})
+    stub.add(vim.VirtualMachine, 'vm-2', name='vm2')
+    stub.add(vim.VirtualMachine, 'vm-3', name='vm3', **{'config.hardware': vim.vm.VirtualHardware(numCPU=2,
+                                                                                                   memoryMB=512)})
+
+
+def test_export_csv_columns_from_later_pages(vc, stub, tmp_path):
+    _inventory(stub)
+    path = str(tmp_path / 'vms.csv')
+    assert vc.export(vim.VirtualMachine, ['name', 'runtime.host', 'config.hardware'], path, page_size=2) == 3
+    with open(path) as f:
+        rows = list(csv.DictReader(f))
+    assert [el['name'] for el in rows] == ['vm1', 'vm2', 'vm3']
+    assert rows[0]['runtime.host'] == 'host-1'
+    assert rows[2]['config.hardware.numCPU'] == '2'
+    assert rows[0]['config.hardware.numCPU'] == ''
+    assert stub.page_calls == 2
+    assert not (tmp_path / 'vms.csv.rows').exists()
+
+
+def test_export_jsonl(vc, stub, tmp_path):
+    _inventory(stub)
+    path = str(tmp_path / 'vms.jsonl')
+    vc.export(vim.VirtualMachine, ['name', 'runtime.host'], path, fmt='jsonl')
+    with open(path) as f:
+        rows = [json.loads(el) for el in f]
+    assert rows[0] == {'moid': 'vm-1', 'name': 'vm1', 'runtime.host': 'host-1'}
+    assert rows[1]['runtime.host'] is None
+
+
+def test_csv_writer_empty(tmp_path):
+    path = str(tmp_path / 'empty.csv')
+    w = CsvWriter(path)
+    w.write([])
+    w.close()
+    assert open(path).read() == ''
+
+
+def test_flatten():
+    hw = vim.vm.VirtualHardware(numCPU=4, memoryMB=1024)
+    r = flatten(hw, 'config.hardware')
+    assert r['config.hardware.numCPU'] == 4
+    assert r['config.hardware.device'] == ''
+    assert flatten(['a', 'b'], 'tags') == {'tags': 'a;b'}
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        get_writer(str(tmp_path / 'x'), 'xml')
+
+
+def test_parquet_schema_from_all_pages(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    path = str(tmp_path / 'vms.parquet')
+    w = ParquetWriter(path)
+    w.write([{'name': 'vm1', 'host': None}])
+    w.write([{'name': 'vm2', 'host': 'host-1', 'cpu': 2}])
+    w.close()
+    table = pq.read_table(path)
+    assert table.column_names == ['name', 'host', 'cpu']
+    assert table.to_pylist() == [{'name': 'vm1', 'host': None, 'cpu': None},
+                                 {'name': 'vm2', 'host': 'host-1', 'cpu': 2}]
+    assert [el.name for el in tmp_path.iterdir()] == ['vms.parquet']
+
+
+def test_parquet_type_conflict(tmp_path):
+    pytest.importorskip('pyarrow')
+    w = ParquetWriter(str(tmp_path / 'vms.parquet'))
+    w.write([{'cpu': 2}])
+    w.write([{'cpu': 'two'}])
+    with pytest.raises(ValueError):
+        w.close()
+    assert [el.name for el in tmp_path.iterdir()] == []
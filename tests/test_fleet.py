@@ -0,0 +1,86 @@
+import pytest
+from pyVmomi import vim
+from vmjuggler import VirtualMachine, fleet
+from vmjuggler.fleet import FleetTable
+
+FIELDS = ['name', 'runtime.powerState', 'summary.config.memorySizeMB', 'summary.storage.committed']
+ROWS = [('vm-1', 'web1', 'poweredOn', 4096, 10),
+        ('vm-2', 'web2', None, 2048, None),
+        ('vm-3', 'db1', 'poweredOff', None, 30),
+        ('vm-4', 'db2', 'poweredOn', 8192, 20)]
+
+
+@pytest.fixture(params=['array', 'numpy'])
+def backend(request, monkeypatch):
+    """Run test with both column backends"""
+    if request.param == 'numpy':
+        monkeypatch.setattr(fleet, 'numpy', pytest.importorskip('numpy'))
+    else:
+        monkeypatch.setattr(fleet, 'numpy', None)
+    return request.param
+
+
+def _table(stub=None, rows=ROWS):
+    return FleetTable.build(((vim.VirtualMachine(el[0], stub), dict((k, v) for k, v in zip(FIELDS, el[1:])
+                                                                     if v is not None)) for el in rows),
+                            FIELDS, stub=stub)
+
+
+def test_sort_unset_last(backend):
+    table = _table()
+    assert table.sort('runtime.powerState').column('moid') == ['vm-3', 'vm-1', 'vm-4', 'vm-2']
+    assert table.sort('runtime.powerState', reverse=True).column('moid')[-1] == 'vm-2'
+    assert table.sort('summary.config.memorySizeMB').column('moid') == ['vm-2', 'vm-1', 'vm-4', 'vm-3']
+    assert table.sort('summary.config.memorySizeMB', reverse=True).column('moid') == ['vm-4', 'vm-1', 'vm-2', 'vm-3']
+    assert table.sort('name', reverse=True).column('name') == ['web2', 'web1', 'db2', 'db1']
+
+
+def test_filter_group_sum(backend):
+    table = _table()
+    on = table.where('runtime.powerState', 'poweredOn')
+    assert on.column('name') == ['web1', 'db2']
+    assert table.where('summary.config.memorySizeMB', 4096, op='>=').column('name') == ['web1', 'db2']
+    assert table.where('summary.config.memorySizeMB', None).column('name') == ['db1']
+    assert table.where('name', ['db1', 'web2'], op='in').column('moid') == ['vm-2', 'vm-3']
+    assert table.counts('runtime.powerState') == {'poweredOn': 2, 'poweredOff': 1, None: 1}
+    assert table.sum('summary.config.memorySizeMB') == 14336
+    assert table.sum('summary.storage.committed', by='runtime.powerState') == {'poweredOn': 30, 'poweredOff': 30,
+                                                                               None: 0}
+    assert sorted(table.group_by('runtime.powerState')['poweredOn'].column('moid')) == ['vm-1', 'vm-4']
+    assert table[2] == {'moid': 'vm-3', 'name': 'db1', 'runtime.powerState': 'poweredOff',
+                        'summary.config.memorySizeMB': None, 'summary.storage.committed': 30}
+    with pytest.raises(ValueError):
+        table.sum('name')
+    with pytest.raises(ValueError):
+        table.where('name', 'x', op='~')
+
+
+def test_numeric_columns(backend):
+    rows = [('vm-1', 'a', None, 1, 2 ** 40), ('vm-2', 'b', None, 2.5, 2 ** 70), ('vm-3', 'c', None, 3, None)]
+    table = _table(rows=rows)
+    assert table.column('summary.config.memorySizeMB') == [1.0, 2.5, 3.0]
+    # Too big for integer typecode, kept as float
+    assert table.column('summary.storage.committed') == [float(2 ** 40), float(2 ** 70), None]
+    assert table.sort('summary.storage.committed', reverse=True).column('moid') == ['vm-2', 'vm-1', 'vm-3']
+
+
+def test_integer_typecode():
+    builder = fleet._Builder()
+    for el in (1, 2 ** 40, 3):
+        builder.append(el)
+    assert builder.data.typecode == fleet._int_code
+    builder.append(2 ** 70)
+    assert builder.data.typecode == 'd'
+    assert list(builder.data) == [1.0, float(2 ** 40), 3.0, float(2 ** 70)]
+
+
+def test_fleet_table(vc, stub, backend):
+    for moid, name, state, memory, storage in ROWS:
+        stub.add(vim.VirtualMachine, moid, name=name, **dict(
+            (k, v) for k, v in zip(FIELDS[1:], (state, memory, storage)) if v is not None))
+    table = vc.fleet_table(page_size=2)
+    assert len(table) == 4 and table.nbytes > 0
+    vms = table.where('runtime.powerState', 'poweredOn').objects()
+    assert [type(el) for el in vms] == [VirtualMachine] * 2
+    assert [el.name for el in vms] == ['web1', 'db2']
+    assert [el._moId for el in table.sort('name').objects(raw=True)] == ['vm-3', 'vm-4', 'vm-1', 'vm-2']
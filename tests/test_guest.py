@@ -0,0 +1,101 @@
+from types import SimpleNamespace
+import requests
+from unittest import mock
+from pyVmomi import vim
+from vmjuggler import VirtualMachine
+from vmjuggler.transfer import HttpTransfer
+
+AUTH = {'username': 'root', 'password': 'secret'}
+
+
+def _guest(stub, exit_codes):
+    """Add guest operations managers, programs exit with given codes one by one"""
+    codes = iter(exit_codes)
+    pm = mock.Mock()
+    pm.StartProgramInGuest.side_effect = lambda vm, auth, spec: 100
+    pm.ListProcessesInGuest.side_effect = lambda vm, auth, pids: [SimpleNamespace(endTime=1, exitCode=next(codes))]
+    fm = mock.Mock()
+    fm.InitiateFileTransferToGuest.return_value = 'https://*:443/guestFile?id=1'
+    fm.InitiateFileTransferFromGuest.return_value = SimpleNamespace(url='https://*/guestFile?id=2', size=3)
+    stub.content.guestOperationsManager = SimpleNamespace(processManager=pm, fileManager=fm)
+    return pm, fm
+
+
+def _vms(stub, *names):
+    host = stub.add(vim.HostSystem, 'host-1', name='esx1.local')
+    return [VirtualMachine(stub.add(vim.VirtualMachine, f'vm-{i}', name=name, **{'runtime.host': host}))
+            for i, name in enumerate(names, 1)]
+
+
+def test_run_returns_exit_code(stub):
+    vm, = _vms(stub, 'vm1')
+    pm, _ = _guest(stub, [3])
+    assert vm.run('/bin/false', **AUTH) == 3
+    spec = pm.StartProgramInGuest.call_args[1]['spec']
+    assert spec.programPath == '/bin/false'
+
+
+def test_run_no_wait(stub):
+    vm, = _vms(stub, 'vm1')
+    pm, _ = _guest(stub, [])
+    assert vm.run('/bin/sleep', '100', wait=False, **AUTH) == 0
+    assert not pm.ListProcessesInGuest.called
+
+
+def test_run_process_not_found(stub, task_results):
+    vm, = _vms(stub, 'vm1')
+    pm, _ = _guest(stub, [])
+    pm.ListProcessesInGuest.side_effect = lambda vm, auth, pids: []
+    r = vm.run('/bin/true', timeout=5, poll_interval=0, **AUTH)
+    assert not r and r.result is None and r.fault == 'ProcessNotFound'
+    assert pm.ListProcessesInGuest.call_count == 1
+
+
+def test_run_fault(stub):
+    vm, = _vms(stub, 'vm1')
+    pm, _ = _guest(stub, [])
+    pm.StartProgramInGuest.side_effect = vim.fault.GuestOperationsFault(msg='denied')
+    assert vm.run('/bin/true', **AUTH) is None
+
+
+def test_run_in_guest_keys_by_vm_object(vc, stub):
+    vms = _vms(stub, 'web', 'web', 'db')
+    _guest(stub, [0, 0, 0])
+    r = vc.run_in_guest((el for el in vms), '/bin/true', **AUTH)
+    assert len(r) == 3
+    assert set(r) == set(vms)
+    assert list(r.values()) == [0, 0, 0]
+
+
+def test_upload_fixes_host(stub, tmp_path):
+    vm, = _vms(stub, 'vm1')
+    _, fm = _guest(stub, [])
+    local = tmp_path / 'f.txt'
+    local.write_bytes(b'abc')
+    with mock.patch.object(HttpTransfer, 'upload') as upload:
+        assert vm.upload(str(local), '/tmp/f.txt', **AUTH) is True
+    upload.assert_called_once_with('https://esx1.local:443/guestFile?id=1', str(local))
+    assert fm.InitiateFileTransferToGuest.call_args[1]['fileSize'] == 3
+
+
+def test_download_transfer_error(stub, tmp_path):
+    vm, = _vms(stub, 'vm1')
+    _guest(stub, [])
+    with mock.patch.object(HttpTransfer, 'download', side_effect=requests.ConnectionError('reset')) as download:
+        assert vm.download('/tmp/f.txt', str(tmp_path / 'f.txt'), **AUTH) is False
+    assert download.call_args[0][0] == 'https://esx1.local/guestFile?id=2'
+
+
+def test_upload_to_guest_generator(vc, stub, tmp_path):
+    vms = _vms(stub, 'app', 'app')
+    _guest(stub, [])
+    local = tmp_path / 'f.txt'
+    local.write_bytes(b'abc')
+    with mock.patch.object(HttpTransfer, 'upload'):
+        r = vc.upload_to_guest(iter(vms), str(local), '/tmp/f.txt', **AUTH)
+    assert r == {vms[0]: True, vms[1]: True}
+
+
+def test_fix_host():
+    assert HttpTransfer.fix_host('https://*/x?a=1', 'esx') == 'https://esx/x?a=1'
+    assert HttpTransfer.fix_host('https://esx2/x', 'esx') == 'https://esx2/x'
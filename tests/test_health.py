@@ -0,0 +1,62 @@
+import datetime
+from pyVmomi import vim
+
+NOW = datetime.datetime(2024, 1, 1, 12, 0, 0)
+
+
+def _alarm_state(stub, vm, alarm='alarm-1'):
+    return vim.alarm.AlarmState(key=f'{alarm}.{vm._moId}', entity=vm, alarm=vim.alarm.Alarm(alarm, stub),
+                                overallStatus='red', time=NOW, acknowledged=False)
+
+
+def _vm(stub, moid, status='green', alarms=False):
+    vm = stub.add(vim.VirtualMachine, moid, name=moid.replace('-', ''), overallStatus=status)
+    if alarms:
+        stub.props[moid]['triggeredAlarmState'] = [_alarm_state(stub, vm)]
+    return vm
+
+
+def test_health(vc, stub):
+    stub.add(vim.alarm.Alarm, 'alarm-1', **{'info.name': 'CPU usage'})
+    _vm(stub, 'vm-1', 'red', alarms=True)
+    _vm(stub, 'vm-2')
+    rows = dict((el['moid'], el) for el in vc.health(obj_types=[vim.VirtualMachine]))
+    assert rows['vm-1']['alarms'] == [{'name': 'CPU usage', 'status': 'red', 'time': NOW, 'acknowledged': False}]
+    assert rows['vm-2']['alarms'] == [] and rows['vm-2']['status'] == 'green'
+    assert [el['moid'] for el in vc.health(obj_types=[vim.VirtualMachine], problems_only=True)] == ['vm-1']
+
+
+def test_iter_health_keeps_alarms_of_existing_objects(vc, stub):
+    stub.add(vim.alarm.Alarm, 'alarm-1', **{'info.name': 'CPU usage'})
+    vms = [_vm(stub, f'vm-{i}', 'red', alarms=True) for i in range(3)]
+    feed = vc.iter_health(obj_types=[vim.VirtualMachine], interval=0)
+    first = next(feed)
+    assert sorted(el['moid'] for el in first['changed']) == ['vm-0', 'vm-1', 'vm-2']
+    # Alarm re-triggered by element on all of them, but vm-1 is removed before the arrays are re-fetched
+    stub.missing.add('vm-1')
+    stub.update(*[('modify', el, {f'triggeredAlarmState["alarm-1.{el._moId}"]': None}) for el in vms])
+    update = next(feed)
+    rows = dict((el['moid'], el) for el in update['changed'])
+    assert sorted(rows) == ['vm-0', 'vm-2']
+    assert all(el['alarms'] and el['alarms'][0]['name'] == 'CPU usage' for el in rows.values())
+    stub.update(('leave', vms[1], {}))
+    assert next(feed) == {'changed': [], 'removed': ['vm-1']}
+    feed.close()
+    assert len(stub.destroyed) == 2  # PropertyCollector and its view
+
+
+def test_fetch_vms_skips_removed(vc, stub):
+    vms = [_vm(stub, f'vm-{i}') for i in range(3)]
+    stub.missing.add('vm-1')
+    found = vc._fetch_vms(vms, ['overallStatus'])
+    assert sorted(el._moId for el in found) == ['vm-0', 'vm-2']
+
+
+def test_refresh_cache_skips_removed(vc, stub, tmp_path):
+    vms = [_vm(stub, f'vm-{i}') for i in range(2)]
+    cache = vc.use_cache(str(tmp_path / 'inv.db'))
+    stub.missing.add('vm-1')
+    stub.props['vm-0']['name'] = 'renamed'
+    stub.update(*[('modify', el, {'name': stub.props[el._moId]['name']}) for el in vms])
+    vc.refresh_cache()
+    assert [el[0] for el in cache.lookup(['renamed', 'vm1'])] == ['vm-0', 'vm-1']
@@ -0,0 +1,80 @@
+import datetime
+import pytest
+from pyVmomi import vim
+from vmjuggler import VirtualMachine
+
+
+def _history(stub, create, read, items, collector_type=vim.event.EventHistoryCollector):
+    """Route history collector of the manager to serve items page by page"""
+    collector = collector_type('session[1]collector-1', stub)
+    pages = []
+    created = []
+    left = list(items)
+
+    def create_collector(mo, filter):
+        created.append(filter)
+        return collector
+
+    def read_next(mo, maxCount):
+        pages.append(maxCount)
+        page = left[:maxCount]
+        del left[:maxCount]
+        return page
+    stub.on(create[0], create[1], create_collector)
+    stub.on(collector, read, read_next)
+    return created, pages
+
+
+def _events(count):
+    when = datetime.datetime(2024, 1, 1)
+    return [vim.event.VmPoweredOnEvent(key=i, chainId=i, createdTime=when, userName='admin') for i in range(count)]
+
+
+def test_iter_events_pages(vc, stub):
+    created, pages = _history(stub, ('EventManager', 'CreateCollectorForEvents'), 'ReadNextEvents', _events(5))
+    vm = VirtualMachine(stub.add(vim.VirtualMachine, 'vm-1', name='vm1'))
+    events = list(vc.iter_events(entity=vm, event_types=['VmPoweredOnEvent'], page_size=2, recursive=False))
+    assert [el.key for el in events] == [0, 1, 2, 3, 4]
+    assert pages == [2, 2, 2, 2]
+    spec = created[0]
+    assert spec.entity.entity._moId == 'vm-1' and spec.entity.recursion == 'self'
+    assert spec.eventTypeId == ['VmPoweredOnEvent']
+    assert stub.count('RewindCollector') == 1
+    assert stub.count('DestroyCollector') == 1
+
+
+def test_iter_events_destroyed_on_close(vc, stub):
+    _history(stub, ('EventManager', 'CreateCollectorForEvents'), 'ReadNextEvents', _events(10))
+    events = vc.iter_events(page_size=3)
+    assert next(events).key == 0
+    events.close()
+    assert stub.count('DestroyCollector') == 1
+
+
+def test_iter_events_tail(vc, stub, monkeypatch):
+    items = _events(2)
+    _history(stub, ('EventManager', 'CreateCollectorForEvents'), 'ReadNextEvents', items)
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) > 1:
+            raise KeyboardInterrupt
+    monkeypatch.setattr('vmjuggler.base_objects.time.sleep', sleep)
+    events = vc.iter_events(tail=True, poll_interval=7)
+    assert [next(events).key, next(events).key] == [0, 1]
+    with pytest.raises(KeyboardInterrupt):
+        next(events)
+    assert sleeps == [7, 7]
+    assert stub.count('DestroyCollector') == 1
+
+
+def test_iter_tasks_filter(vc, stub):
+    when = datetime.datetime(2024, 1, 1)
+    items = [vim.TaskInfo(key=f'task-{i}', state='error', queueTime=when) for i in range(3)]
+    created, _ = _history(stub, ('TaskManager', 'CreateCollectorForTasks'), 'ReadNextTasks', items,
+                          vim.TaskHistoryCollector)
+    tasks = list(vc.iter_tasks(begin=when, states=['error']))
+    assert [el.key for el in tasks] == ['task-0', 'task-1', 'task-2']
+    assert created[0].state == ['error']
+    assert created[0].time.timeType == 'queuedTime'
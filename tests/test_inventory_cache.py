@@ -0,0 +1,117 @@
+import threading
+from pyVmomi import vim
+from vmjuggler import VirtualMachine
+from vmjuggler.cache import InventoryCache
+
+
+def _inventory(stub):
+    dc = stub.add(vim.Datacenter, 'datacenter-2', name='dc1', parent=stub.content.rootFolder)
+    folder = stub.add(vim.Folder, 'group-v3', name='vm', parent=dc)
+    vm = stub.add(vim.VirtualMachine, 'vm-4', name='vm1', parent=folder)
+    return dc, folder, vm
+
+
+def test_update_and_lookup(tmp_path):
+    cache = InventoryCache(str(tmp_path / 'inv.db'))
+    assert cache.is_empty()
+    cache.update([('group-d1', 'Datacenters', 'Folder', None), ('datacenter-2', 'dc1', 'Datacenter', 'group-d1'),
+                  ('vm-4', 'vm1', 'VirtualMachine', 'datacenter-2')])
+    assert cache.lookup(['vm1', 'nope']) == [('vm-4', 'vm1', 'VirtualMachine', 'datacenter-2',
+                                              'Datacenters/dc1/vm1')]
+    # Renamed parent changes paths of its children
+    cache.update([('datacenter-2', 'dc2', 'Datacenter', 'group-d1')], removed=['nothing'])
+    assert cache.lookup(['vm1'])[0][4] == 'Datacenters/dc2/vm1'
+    cache.update([], removed=['vm-4'])
+    assert cache.lookup(['vm1']) == []
+    cache.close()
+
+
+def test_update_recalculates_changed_paths_only(tmp_path):
+    cache = InventoryCache(str(tmp_path / 'inv.db'))
+    cache.update([('group-d1', 'Datacenters', 'Folder', None), ('group-h2', 'hosts', 'Folder', 'group-d1'),
+                  ('group-v3', 'vms', 'Folder', 'group-d1'), ('group-v4', 'web', 'Folder', 'group-v3'),
+                  ('vm-5', 'vm1', 'VirtualMachine', 'group-v4'), ('vm-6', 'vm2', 'VirtualMachine', 'group-v3')],
+                 replace=True)
+    with cache._db:  # Paths which must stay as is
+        cache._db.execute("UPDATE objects SET path = 'untouched' WHERE moid IN ('group-h2', 'vm-6')")
+    # Unchanged objects sent again and renamed subtree
+    cache.update([('group-v3', 'vms', 'Folder', 'group-d1'), ('group-v4', 'app', 'Folder', 'group-v3')])
+    paths = dict((el[0], el[4]) for el in cache.lookup(['hosts', 'vms', 'app', 'vm1', 'vm2']))
+    assert paths == {'group-h2': 'untouched', 'group-v3': 'Datacenters/vms', 'group-v4': 'Datacenters/vms/app',
+                     'vm-5': 'Datacenters/vms/app/vm1', 'vm-6': 'untouched'}
+    # Moved object and children of removed one
+    cache.update([('vm-6', 'vm2', 'VirtualMachine', 'group-v4')], removed=['group-v3'])
+    paths = dict((el[0], el[4]) for el in cache.lookup(['app', 'vm1', 'vm2']))
+    assert paths == {'group-v4': 'app', 'vm-5': 'app/vm1', 'vm-6': 'app/vm2'}
+    cache.close()
+
+
+def test_validate_clears_other_vcenter(tmp_path):
+    path = str(tmp_path / 'inv.db')
+    cache = InventoryCache(path)
+    assert not cache.validate('vc-uuid-1')
+    cache.update([('vm-4', 'vm1', 'VirtualMachine', None)])
+    cache.close()
+    cache = InventoryCache(path)
+    assert cache.validate('vc-uuid-1')
+    assert not cache.is_empty()
+    assert not cache.validate('vc-uuid-2')
+    assert cache.is_empty()
+    cache.close()
+
+
+def test_lookup_by_cache(vc, stub, tmp_path):
+    _, _, vm = _inventory(stub)
+    cache = vc.use_cache(str(tmp_path / 'inv.db'))
+    assert cache.lookup(['vm1'])[0][4] == 'Datacenters/dc1/vm/vm1'
+    views = len(stub.views)
+    found = vc.get_vm('vm1')
+    found = found[0] if isinstance(found, list) else found
+    assert isinstance(found, VirtualMachine)
+    assert found.raw_obj._moId == 'vm-4'
+    assert len(stub.views) == views  # Resolved without inventory scan
+
+
+def test_renamed_object_refreshes_cache(vc, stub, tmp_path):
+    _, _, vm = _inventory(stub)
+    vc.use_cache(str(tmp_path / 'inv.db'))
+    stub.props['vm-4']['name'] = 'vm1-new'
+    stub.update(('modify', vm, {'name': 'vm1-new'}))
+    found = vc.get_vm(['vm1-new'])
+    assert [el.raw_obj._moId for el in found] == ['vm-4']
+    assert vc.get_vm(['vm1']) == []
+
+
+def test_stale_cached_object_is_verified(vc, stub, tmp_path):
+    _, folder, vm = _inventory(stub)
+    vc.use_cache(str(tmp_path / 'inv.db'))
+    # Renamed without update seen yet: the cached name must not be trusted
+    stub.props['vm-4']['name'] = 'other'
+    other = stub.add(vim.VirtualMachine, 'vm-5', name='vm1', parent=folder)
+    stub.update(('modify', vm, {'name': 'other'}), ('enter', other, {'name': 'vm1', 'parent': folder}))
+    found = vc.get_vm(['vm1'])
+    assert [el.raw_obj._moId for el in found] == ['vm-5']
+
+
+def test_removed_objects_leave_cache(vc, stub, tmp_path):
+    _, _, vm = _inventory(stub)
+    cache = vc.use_cache(str(tmp_path / 'inv.db'))
+    stub.remove(vm)
+    stub.update(('leave', vm, {}))
+    vc.refresh_cache()
+    assert cache.lookup(['vm1']) == []
+
+
+def test_concurrent_refresh_shares_watch(vc, stub, tmp_path):
+    _inventory(stub)
+    vc.use_cache(str(tmp_path / 'inv.db'))
+    vc._unwatch('inventory')
+    created = stub.count('CreatePropertyCollector')
+    threads = [threading.Thread(target=vc.refresh_cache) for i in range(8)]
+    for el in threads:
+        el.start()
+    for el in threads:
+        el.join()
+    assert stub.count('CreatePropertyCollector') == created + 1
+    vc.disconnect()
+    assert vc._watchers == {}
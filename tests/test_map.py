@@ -0,0 +1,52 @@
+from pyVmomi import vim
+from fakes import FakeStub, make_vc
+from vmjuggler import VCenter, VirtualMachine
+from vmjuggler.base_objects import _rebind
+from vmjuggler.cache import DatastoreFile
+from vmjuggler.netindex import NetworkInfo
+from vmjuggler.refs import ObjectRef
+
+
+def test_rebind_namedtuples(vc, stub):
+    other = make_vc(FakeStub())
+    ref = ObjectRef('vm-1', 'vim.VirtualMachine', 'vc.local')
+    f = DatastoreFile('[ds1] vm1/vm1.vmx', 'vm1.vmx', 10, None, 'file')
+    assert _rebind(ref, other) == ref and isinstance(_rebind(ref, other), ObjectRef)
+    assert _rebind([f, (ref, 1)], other) == [f, (ref, 1)]
+    net = NetworkInfo('network-1', 'net1', 'Network', vim.Network('network-1', stub), None, None, None, 10, [], [])
+    rebound = _rebind(net, other)
+    assert isinstance(rebound, NetworkInfo) and rebound.name == 'net1'
+    assert rebound.obj._stub is other.stub
+
+
+def test_rebind_objects(vc, stub):
+    other = make_vc(FakeStub())
+    raw = vim.VirtualMachine('vm-1', stub)
+    vm = VirtualMachine(raw, name='vm1')
+    r = _rebind({'vm': raw, 'list': [vm]}, other)  # Dicts are returned as is
+    assert r['vm']._stub is stub
+    vm_copy, = _rebind([vm], other)
+    assert vm_copy.raw_obj._stub is other.stub and vm.raw_obj._stub is stub
+    assert vm_copy.name == 'vm1'
+
+
+def test_map_rebinds_results(vc, stub, monkeypatch):
+    vms = [VirtualMachine(stub.add(vim.VirtualMachine, f'vm-{i}', name=f'vm{i}'), name=f'vm{i}') for i in range(3)]
+    worker_stubs = []
+
+    def attach(cls, address, cookie, version):
+        worker = make_vc(FakeStub())
+        worker.stub.props.update(stub.props)
+        worker_stubs.append(worker.stub)
+        return worker
+
+    monkeypatch.setattr(VCenter, 'attach', classmethod(attach))
+
+    def fn(vm):
+        assert vm.raw_obj._stub in worker_stubs
+        return vm.ref, vm.raw_obj, DatastoreFile(f'[ds1] {vm.name}', vm.name, 1, None, 'folder')
+
+    r = vc.map(fn, vms, workers=2)
+    assert [el[0] for el in r] == [el.ref for el in vms]
+    assert all(el[1]._stub is stub for el in r)
+    assert [el[2].name for el in r] == ['vm0', 'vm1', 'vm2']
@@ -0,0 +1,90 @@
+import threading
+import time
+import pytest
+from pyVmomi import vim
+from vmjuggler.helpers import VMJHelper
+
+GB = 1024 ** 3
+
+
+def _hosts(stub, free_gb):
+    cluster = stub.add(vim.ClusterComputeResource, 'domain-c1', name='cluster1')
+    source = stub.add(vim.HostSystem, 'host-0', name='esx0', parent=cluster, **{'runtime.connectionState': 'connected'})
+    targets = [stub.add(vim.HostSystem, f'host-{i}', name=f'esx{i}', parent=cluster,
+                        **{'summary.hardware.memorySize': 64 * GB,
+                           'summary.quickStats.overallMemoryUsage': (64 - free) * 1024,
+                           'runtime.connectionState': 'connected'})
+               for i, free in enumerate(free_gb, 1)]
+    return source, targets
+
+
+def _vm(stub, moid, name, source, memory_gb):
+    return stub.add(vim.VirtualMachine, moid, name=name,
+                    **{'runtime.host': source, 'summary.config.memorySizeMB': memory_gb * 1024})
+
+
+def _targets(stub):
+    return dict((el[0], el[2]['spec'].host._moId) for el in stub.calls if el[1] == 'RelocateVM_Task')
+
+
+def test_schedule_rejects_zero_limit():
+    with pytest.raises(ValueError):
+        VMJHelper.schedule(lambda el: el, [1, 2], keys=lambda el: [('host', el)], limits={'host': 0})
+    with pytest.raises(ValueError):
+        VMJHelper.schedule(lambda el: el, [1, 2], keys=lambda el: [('host', el)], limits={}, workers=0)
+
+
+def test_schedule_limits_per_resource():
+    lock = threading.Lock()
+    running = {'a': 0, 'b': 0}
+    peak = {'a': 0, 'b': 0}
+
+    def run(item):
+        with lock:
+            running[item] += 1
+            peak[item] = max(peak[item], running[item])
+        time.sleep(0.01)
+        with lock:
+            running[item] -= 1
+        return item.upper()
+
+    items = ['a', 'a', 'a', 'b', 'b', 'a']
+    r = VMJHelper.schedule(run, items, keys=lambda el: [('host', el)], limits={'host': 1}, workers=4)
+    assert r == ['A', 'A', 'A', 'B', 'B', 'A']
+    assert peak == {'a': 1, 'b': 1}
+
+
+def test_migrate_fits_memory(vc, stub):
+    source, (small, big) = _hosts(stub, [2, 10])
+    vms = [_vm(stub, 'vm-1', 'vm1', source, 6), _vm(stub, 'vm-2', 'vm2', source, 2),
+           _vm(stub, 'vm-3', 'vm3', source, 8)]
+    r = vc.migrate(el for el in vms)  # No target: nothing to do
+    assert r == dict((el, None) for el in vms)
+    r = vc.migrate(vms, target_host=[small, big])
+    # vm3 takes the big host first, then vm1 fits nowhere and vm2 fits either host with 2 GB left
+    assert r == {vms[0]: False, vms[1]: True, vms[2]: True}
+    targets = _targets(stub)
+    assert sorted(targets) == ['vm-2', 'vm-3'] and targets['vm-3'] == 'host-2'
+
+
+def test_migrate_insufficient_memory_fault(vc, stub, task_results):
+    source, targets = _hosts(stub, [1])
+    vm = _vm(stub, 'vm-1', 'vm1', source, 4)
+    r = vc.migrate([vm, 'missing'], target_host=targets)
+    assert r[vm].fault == 'InsufficientResourcesFault'
+    assert r['missing'].fault == 'NotFound'
+    assert stub.count('RelocateVM_Task') == 0
+
+
+def test_migrate_keys_duplicate_names(vc, stub):
+    source, targets = _hosts(stub, [32])
+    vms = [_vm(stub, 'vm-1', 'web', source, 1), _vm(stub, 'vm-2', 'web', source, 1)]
+    r = vc.migrate(iter(vms), target_host=targets)
+    assert r == {vms[0]: True, vms[1]: True}
+    assert sorted(_targets(stub)) == ['vm-1', 'vm-2']
+
+
+def test_migrate_zero_host_limit(vc, stub):
+    source, targets = _hosts(stub, [32])
+    with pytest.raises(ValueError):
+        vc.migrate([_vm(stub, 'vm-1', 'vm1', source, 1)], target_host=targets, host_limit=0)
@@ -0,0 +1,65 @@
+from pyVmomi import vim
+
+Backing = vim.vm.device.VirtualEthernetCard
+
+
+def _networks(stub):
+    host = stub.add(vim.HostSystem, 'host-1', name='esx1', **{'config.network.portgroup': [
+        vim.host.PortGroup(spec=vim.host.PortGroup.Specification(name='net1', vlanId=10, vswitchName='vSwitch0',
+                                                                 policy=vim.host.NetworkPolicy()))]})
+    net = stub.add(vim.Network, 'network-1', name='net1', vm=[], host=[host])
+    dvs = stub.add(vim.dvs.VmwareDistributedVirtualSwitch, 'dvs-1', name='dvs1', uuid='50 1a')
+    vlan = vim.dvs.VmwareDistributedVirtualSwitch.VlanIdSpec(vlanId=20, inherited=False)
+    pg = stub.add(vim.dvs.DistributedVirtualPortgroup, 'dvportgroup-1', name='pg20', key='dvportgroup-1',
+                  vm=[], host=[host], **{'config.distributedVirtualSwitch': dvs,
+                                         'config.defaultPortConfig': vim.dvs.VmwareDistributedVirtualSwitch.
+                                         VmwarePortConfigPolicy(vlan=vlan)})
+    return host, net, dvs, pg
+
+
+def _vm(stub, moid, name, net=None):
+    devices = [vim.vm.device.VirtualDisk(key=2000)]
+    if net is not None:
+        devices.append(vim.vm.device.VirtualVmxnet3(
+            key=4000, backing=Backing.NetworkBackingInfo(network=net, deviceName=net.name)))
+    return stub.add(vim.VirtualMachine, moid, name=name, **{'config.hardware.device': devices})
+
+
+def test_network_index(vc, stub):
+    host, net, dvs, pg = _networks(stub)
+    vm = _vm(stub, 'vm-1', 'vm1', net)
+    stub.props['network-1']['vm'] = [vm]
+    index = vc.network_index()
+    assert sorted(index.networks) == ['dvportgroup-1', 'network-1']
+    info = index.by_name['net1'][0]
+    assert (info.type, info.vlan, info.key, info.vms, info.hosts) == ('vim.Network', 10, None, ['vm-1'], ['host-1'])
+    info = index.by_key['dvportgroup-1']
+    assert (info.dvs_uuid, info.dvs_name, info.vlan) == ('50 1a', 'dvs1', 20)
+    assert index.by_vm['vm-1'] == [index.networks['network-1']]
+    assert [el.moid for el in index.find(vlan=20, dvs_uuid='50 1a')] == ['dvportgroup-1']
+    assert index.find(name='net1', vlan=20) == []
+
+
+def test_move_nics_to_portgroup(vc, stub):
+    _, net, _, pg = _networks(stub)
+    web = [_vm(stub, 'vm-1', 'web', net), _vm(stub, 'vm-2', 'web', net)]
+    idle = _vm(stub, 'vm-3', 'db')
+    r = vc.move_nics(iter(web + [idle, 'missing']), net, 'pg20')
+    assert r == {web[0]: True, web[1]: True, idle: None, 'missing': False}
+    calls = [el for el in stub.calls if el[1] == 'ReconfigVM_Task']
+    assert sorted(el[0] for el in calls) == ['vm-1', 'vm-2']
+    change, = calls[0][2]['spec'].deviceChange
+    assert change.operation == 'edit' and change.device.key == 4000
+    assert change.device.backing.port.portgroupKey == 'dvportgroup-1'
+    assert change.device.backing.port.switchUuid == '50 1a'
+
+
+def test_move_nics_to_standard_network(vc, stub):
+    _, net, _, pg = _networks(stub)
+    _vm(stub, 'vm-1', 'vm1')
+    port = vim.dvs.PortConnection(portgroupKey='dvportgroup-1', switchUuid='50 1a')
+    stub.props['vm-1']['config.hardware.device'] = [vim.vm.device.VirtualE1000(
+        key=4000, backing=Backing.DistributedVirtualPortBackingInfo(port=port))]
+    assert vc.move_nics(['vm1'], pg, 'net1') == {'vm1': True}
+    change, = [el for el in stub.calls if el[1] == 'ReconfigVM_Task'][0][2]['spec'].deviceChange
+    assert change.device.backing.network == net and change.device.backing.deviceName == 'net1'
@@ -0,0 +1,176 @@
+import os
+import tarfile
+import time
+import pytest
+from pyVmomi import vim, vmodl
+from vmjuggler import VirtualMachine
+from vmjuggler.ovf import NfcLease, OvfSource, write_ova
+from vmjuggler.transfer import HttpTransfer
+
+DESCRIPTOR = '<Envelope><References><File ovf:href="disk1.vmdk"/></References></Envelope>'
+
+
+def _package(tmp_path):
+    folder = tmp_path / 'pkg'
+    folder.mkdir()
+    (folder / 'vm1.ovf').write_text(DESCRIPTOR)
+    (folder / 'disk1.vmdk').write_bytes(b'D' * 3000)
+    (folder / 'disk2.vmdk').write_bytes(b'E' * 10)
+    return folder
+
+
+def _lease(stub, moid='lease-1', urls=(), entity=None, state='ready'):
+    entity = entity if entity is not None else vim.VirtualMachine('vm-0', stub)
+    info = vim.HttpNfcLease.Info(totalDiskCapacityInKB=3, entity=entity,
+                                 deviceUrl=[vim.HttpNfcLease.DeviceUrl(key=key, importKey=key, targetId=target,
+                                                                       url=f'https://*/nfc/{target}', disk=True)
+                                            for key, target in urls])
+    return stub.add(vim.HttpNfcLease, moid, state=state, info=info)
+
+
+def test_write_ova_keeps_order(tmp_path):
+    folder = _package(tmp_path)
+    path = str(tmp_path / 'vm1.ova')
+    write_ova(path, [str(folder / el) for el in ('vm1.ovf', 'disk1.vmdk', 'disk2.vmdk')])
+    with tarfile.open(path) as tar:
+        assert tar.getnames() == ['vm1.ovf', 'disk1.vmdk', 'disk2.vmdk']
+
+
+def test_ova_source_reads_members_in_place(tmp_path):
+    folder = _package(tmp_path)
+    path = str(tmp_path / 'vm1.ova')
+    write_ova(path, [str(folder / el) for el in ('vm1.ovf', 'disk1.vmdk', 'disk2.vmdk')])
+    source = OvfSource(path)
+    assert source.descriptor == DESCRIPTOR
+    assert source.size('disk1.vmdk') == 3000
+    f, size = source.open('disk2.vmdk')
+    with f:
+        assert f.read(size) == b'E' * 10
+
+
+def test_ovf_source(tmp_path):
+    folder = _package(tmp_path)
+    source = OvfSource(str(folder / 'vm1.ovf'))
+    assert source.descriptor == DESCRIPTOR
+    f, size = source.open('disk1.vmdk')
+    with f:
+        assert size == 3000 and f.read(4) == b'DDDD'
+
+
+def test_ova_without_descriptor(tmp_path):
+    folder = _package(tmp_path)
+    path = str(tmp_path / 'bad.ova')
+    write_ova(path, [str(folder / 'disk1.vmdk')])
+    with pytest.raises(ValueError):
+        OvfSource(path)
+
+
+def test_lease_completed(stub):
+    lease = NfcLease(_lease(stub), total=200)
+    with lease:
+        lease.add(50)
+        assert lease.percent == 25
+        lease.add(150)
+        assert lease.percent == 99  # 100 only once completed
+    assert stub.count('HttpNfcLeaseComplete') == 1
+    assert stub.calls[-2][2] == {'percent': 100}
+
+
+def test_lease_aborted_on_error(stub):
+    with pytest.raises(IOError):
+        with NfcLease(_lease(stub)):
+            raise IOError('disk read failed')
+    assert stub.count('HttpNfcLeaseAbort') == 1
+    assert stub.count('HttpNfcLeaseComplete') == 0
+
+
+def test_lease_error_state(stub):
+    raw = _lease(stub, state='error')
+    stub.props['lease-1']['error'] = vmodl.fault.SystemError(reason='no space')
+    with pytest.raises(vmodl.fault.SystemError):
+        with NfcLease(raw):
+            pass
+
+
+def test_lease_keepalive(stub, monkeypatch):
+    monkeypatch.setattr(NfcLease, 'keepalive', 0.01)
+    lease = NfcLease(_lease(stub), total=100)
+    with lease:
+        lease.add(10)
+        deadline = time.time() + 5
+        while not stub.count('HttpNfcLeaseProgress') and time.time() < deadline:
+            time.sleep(0.01)
+    assert {'percent': 10} in [el[2] for el in stub.calls if el[1] == 'HttpNfcLeaseProgress']
+
+
+def test_export_ova(stub, tmp_path, monkeypatch):
+    stub.content.ovfManager = vim.OvfManager('OvfManager', stub)
+    vm = VirtualMachine(stub.add(vim.VirtualMachine, 'vm-1', name='vm1'))
+    lease = _lease(stub, urls=[('disk-0', 'vm1-disk0.vmdk'), ('disk-1', 'vm1-disk1.vmdk')])
+    stub.on(vm.raw_obj, 'ExportVm', lambda mo: lease)
+    stub.on('OvfManager', 'CreateDescriptor',
+            lambda mo, obj, cdp: vim.OvfManager.CreateDescriptorResult(
+                ovfDescriptor=DESCRIPTOR + ''.join(el.path for el in cdp.ovfFiles), error=[]))
+    fetched = []
+
+    def download(url, local_path, cookie=None, progress=None):
+        fetched.append(url)
+        with open(local_path, 'wb') as f:
+            f.write(b'X' * 1024)
+        progress(1024)
+        return 1024
+
+    monkeypatch.setattr(HttpTransfer, 'download', staticmethod(download))
+    dest = str(tmp_path / 'vm1.ova')
+    assert vm.export_ovf(dest)
+    assert sorted(fetched) == ['https://vc.local/nfc/vm1-disk0.vmdk', 'https://vc.local/nfc/vm1-disk1.vmdk']
+    with tarfile.open(dest) as tar:
+        assert tar.getnames() == ['vm1.ovf', 'vm1-disk0.vmdk', 'vm1-disk1.vmdk']
+        assert tar.extractfile('vm1.ovf').read().decode() == DESCRIPTOR + 'vm1-disk0.vmdkvm1-disk1.vmdk'
+    assert os.listdir(str(tmp_path)) == ['vm1.ova']  # Temporary folder removed
+    assert stub.count('HttpNfcLeaseComplete') == 1
+
+
+def test_export_failed_download(stub, tmp_path, monkeypatch):
+    stub.content.ovfManager = vim.OvfManager('OvfManager', stub)
+    vm = VirtualMachine(stub.add(vim.VirtualMachine, 'vm-1', name='vm1'))
+    lease = _lease(stub, urls=[('disk-0', 'vm1-disk0.vmdk')])
+    stub.on(vm.raw_obj, 'ExportVm', lambda mo: lease)
+
+    def download(url, local_path, cookie=None, progress=None):
+        raise IOError('connection reset')
+
+    monkeypatch.setattr(HttpTransfer, 'download', staticmethod(download))
+    assert not vm.export_ovf(str(tmp_path / 'vm1.ova'))
+    assert stub.count('HttpNfcLeaseAbort') == 1
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_import_ova(vc, stub, tmp_path, monkeypatch):
+    stub.content.ovfManager = vim.OvfManager('OvfManager', stub)
+    folder = _package(tmp_path)
+    path = str(tmp_path / 'vm1.ova')
+    write_ova(path, [str(folder / el) for el in ('vm1.ovf', 'disk1.vmdk')])
+    ds = stub.add(vim.Datastore, 'datastore-1', name='ds1')
+    host = stub.add(vim.HostSystem, 'host-1', name='esx1')
+    vm_folder = stub.add(vim.Folder, 'group-v1', name='vm')
+    pool = stub.add(vim.ResourcePool, 'resgroup-1', name='Resources')
+    new_vm = stub.add(vim.VirtualMachine, 'vm-9', name='imported')
+    lease = _lease(stub, urls=[('key-1', 'disk1.vmdk')], entity=new_vm)
+    stub.on('OvfManager', 'CreateImportSpec',
+            lambda mo, **kwargs: vim.OvfManager.CreateImportSpecResult(
+                importSpec=vim.VirtualMachineImportSpec(),
+                fileItem=[vim.OvfManager.FileItem(deviceId='key-1', path='disk1.vmdk', create=False, size=3000)]))
+    stub.on(pool, 'ImportVApp', lambda mo, **kwargs: lease)
+    sent = []
+
+    def upload_stream(url, f, size, cookie=None, method='PUT', headers=None, progress=None):
+        sent.append((url, f.read(size), method, headers))
+        progress(size)
+
+    monkeypatch.setattr(HttpTransfer, 'upload_stream', staticmethod(upload_stream))
+    vm = vc.import_ovf(path, ds, name='imported', host=host, folder=vm_folder, resource_pool=pool)
+    assert vm.raw_obj._moId == 'vm-9' and vm.name == 'imported'
+    assert sent == [('https://vc.local/nfc/disk1.vmdk', b'D' * 3000, 'POST',
+                     {'Content-Type': 'application/x-vnd.vmware-streamVmdk'})]
+    assert stub.count('HttpNfcLeaseComplete') == 1
@@ -0,0 +1,24 @@
+import logging
+import os
+import subprocess
+import sys
+import pytest
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason='Lazy package members need Python 3.7+')
+def test_import_loads_no_heavy_modules():
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import vmjuggler'],
+                         stderr=subprocess.PIPE, universal_newlines=True, check=True,
+                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stderr
+    imported = set(line.split('|')[-1].strip().split('.')[0] for line in out.splitlines() if '|' in line)
+    assert 'vmjuggler' in imported
+    assert not imported & {'pyVmomi', 'pyVim', 'requests'}
+
+
+def test_vcenter_does_not_configure_logging():
+    from vmjuggler import VCenter
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    VCenter('vc.local', 'user', 'password')
+    assert root.handlers == handlers
+    assert root.level == level
@@ -0,0 +1,60 @@
+import pytest
+from pyVmomi import vim
+
+ON, OFF, SUSPENDED = 'poweredOn', 'poweredOff', 'suspended'
+
+
+def _vm(stub, moid, name, state):
+    return stub.add(vim.VirtualMachine, moid, name=name, **{'runtime.powerState': state,
+                                                            'summary.runtime.powerState': state})
+
+
+def _set_state(stub, state):
+    def fn(mo, **kwargs):
+        stub.props[mo._moId]['runtime.powerState'] = state
+        stub.props[mo._moId]['summary.runtime.powerState'] = state
+        return stub.task()
+    return fn
+
+
+def test_reconcile_power(vc, stub):
+    _vm(stub, 'vm-1', 'off', OFF)
+    _vm(stub, 'vm-2', 'on', ON)
+    _vm(stub, 'vm-3', 'same', ON)
+    stub.on('VirtualMachine', 'ShutdownGuest', _set_state(stub, OFF))
+    report = vc.reconcile_power({'off': ON, 'on': OFF, 'same': ON, 'missing': OFF}, poll_interval=0)
+    by_vm = dict((el['vm'], el) for el in report)
+    assert set(by_vm) == {'off', 'on', 'missing'}
+    assert by_vm['off']['action'] == 'power_on' and by_vm['off']['result'] is True
+    assert by_vm['on']['action'] == 'shutdown' and by_vm['on']['result'] is True
+    assert by_vm['missing']['result'] is False and by_vm['missing']['action'] is None
+    assert stub.count('PowerOnVM_Task') == 1
+    assert stub.count('PowerOffVM_Task') == 0
+
+
+def test_reconcile_power_shutdown_timeout(vc, stub):
+    _vm(stub, 'vm-1', 'stuck', ON)
+    report = vc.reconcile_power({'stuck': OFF}, shutdown_timeout=0, poll_interval=0)
+    assert report == [{'vm': 'stuck', 'from': ON, 'to': OFF, 'action': 'power_off', 'result': True}]
+    assert stub.count('ShutdownGuest') == 1
+    assert stub.count('PowerOffVM_Task') == 1
+
+
+def test_reconcile_power_suspend_from_off(vc, stub):
+    _vm(stub, 'vm-1', 'off', OFF)
+    report = vc.reconcile_power({'off': SUSPENDED})
+    assert report[0]['action'] == 'suspend' and report[0]['result'] is False
+    assert stub.count('SuspendVM_Task') == 0
+
+
+def test_reconcile_power_failed_task(vc, stub):
+    _vm(stub, 'vm-1', 'off', OFF)
+    stub.on('VirtualMachine', 'PowerOnVM_Task',
+            lambda mo, **kwargs: stub.task('error', error=vim.fault.InvalidState(msg='x')))
+    assert vc.reconcile_power({'off': ON})[0]['result'] is False
+
+
+def test_reconcile_power_unknown_state(vc, stub):
+    _vm(stub, 'vm-1', 'vm1', OFF)
+    with pytest.raises(ValueError):
+        vc.reconcile_power({'vm1': 'on'})
@@ -0,0 +1,138 @@
+import io
+import pytest
+from unittest import mock
+from pyVmomi import vim
+from vmjuggler import Datastore
+from vmjuggler import progress
+from vmjuggler.helpers import VMJHelper
+from vmjuggler.progress import Progress, TtySink, CallbackSink
+from vmjuggler.transfer import TransferError
+
+
+class Fault(Exception):
+    msg = 'failed'
+
+
+def _ok():
+    return 'ok'
+
+
+def _fail():
+    raise Fault()
+
+
+def _state(tracker):
+    state = tracker.state()
+    return dict((k, state[k]) for k in ('total', 'done', 'failed', 'timed_out', 'running'))
+
+
+def test_eta_never_negative():
+    tracker = Progress(total=1, sinks=[])
+    for el in range(3):
+        tracker.start(el)
+        tracker.finish(el)
+    state = tracker.state()
+    assert state['eta'] == 0.0
+    assert state['percent'] == 100.0
+
+
+def test_items_counted_once_however_many_tasks():
+    def item(el):
+        VMJHelper.do(_ok, (Fault,))
+        VMJHelper.do(_ok, (Fault,))
+        return el
+
+    with Progress(sinks=[]) as tracker:
+        assert VMJHelper.parallel(item, [1, 2, 3], workers=2) == [1, 2, 3]
+    assert _state(tracker) == {'total': 3, 'done': 3, 'failed': 0, 'timed_out': 0, 'running': 0}
+
+
+def test_last_result_of_item_wins():
+    def item(el):
+        VMJHelper.do(_fail, (Fault,))  # e.g. guest shutdown failed and VM is powered off instead
+        if el:
+            VMJHelper.do(_ok, (Fault,))
+
+    with Progress(sinks=[]) as tracker:
+        VMJHelper.parallel(item, [True, False])
+    assert _state(tracker)['done'] == 1
+    assert _state(tracker)['failed'] == 1
+
+
+def test_timeouts_counted_separately(stub):
+    def item(el):
+        if el == 'timeout':
+            return VMJHelper.do_task(lambda: stub.task(), timeout=0)
+        if el == 'guest':
+            return VMJHelper.result(None, timed_out=True)
+        if el == 'error':
+            raise ValueError(el)
+        return VMJHelper.do_task(lambda: stub.task())
+
+    with Progress(sinks=[]) as tracker:
+        with pytest.raises(ValueError):
+            VMJHelper.parallel(item, ['timeout', 'guest', 'ok', 'error'], workers=1)
+    assert _state(tracker) == {'total': 4, 'done': 1, 'failed': 1, 'timed_out': 2, 'running': 0}
+
+
+def test_timed_out_task_result(stub, task_results):
+    with Progress(sinks=[]) as tracker:
+        r = VMJHelper.do_task(lambda: stub.task(), timeout=0)
+    assert r.timed_out
+    assert _state(tracker)['timed_out'] == 1
+
+
+def test_failed_datastore_transfers(stub, tmp_path):
+    ds = Datastore(stub.add(vim.Datastore, 'datastore-1', name='ds1', parent=stub.content.rootFolder))
+    local = tmp_path / 'f.iso'
+    local.write_bytes(b'iso')
+    with Progress(sinks=[]) as tracker:
+        with mock.patch('vmjuggler.transfer.HttpTransfer.upload', side_effect=TransferError('HTTP 500')):
+            VMJHelper.parallel(lambda el: ds.upload(str(local), el), ['a.iso', 'b.iso'])
+        with mock.patch('vmjuggler.transfer.HttpTransfer.download_ranges', side_effect=IOError('disk full')):
+            VMJHelper.parallel(lambda el: ds.download(el, str(tmp_path / el)), ['a.iso'])
+    assert _state(tracker) == {'total': 3, 'done': 0, 'failed': 3, 'timed_out': 0, 'running': 0}
+
+
+def test_nested_parallel_is_part_of_item():
+    def inner(el):
+        return VMJHelper.do(_ok, (Fault,))
+
+    def item(el):
+        return VMJHelper.parallel(inner, range(3))
+
+    with Progress(sinks=[]) as tracker:
+        VMJHelper.parallel(item, ['a', 'b'])
+    assert _state(tracker) == {'total': 2, 'done': 2, 'failed': 0, 'timed_out': 0, 'running': 0}
+
+
+def test_operation_report():
+    tracker = Progress(total=3, sinks=[])
+    with tracker.operation() as op:
+        op.update(50)
+        assert tracker.state()['running'] == 1 and tracker.state()['percent'] == 50 / 3
+        progress.report(False)
+    with tracker.operation():
+        with tracker.operation() as nested:  # Counted as part of the outer one
+            nested.report(None)
+    with tracker.operation():
+        pass
+    assert _state(tracker) == {'total': 3, 'done': 1, 'failed': 1, 'timed_out': 1, 'running': 0}
+    progress.report(False)  # No operation, ignored
+
+
+def test_sinks():
+    stream = io.StringIO()
+    states = []
+    tracker = Progress(total=2, sinks=[TtySink(stream=stream, width=10), CallbackSink(states.append)], interval=0)
+    with tracker:
+        with tracker.operation() as op:
+            op.report(None)
+        with tracker.operation():
+            pass
+        with tracker.operation():
+            pass
+    line = stream.getvalue().split('\r')[-1]
+    assert '[##########] 100.0% 2/2 done, 0 failed, 1 timed out, 0 running' in line
+    assert 'ETA 0:00:00' in line
+    assert states[-1]['timed_out'] == 1
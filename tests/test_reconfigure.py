@@ -0,0 +1,34 @@
+from pyVmomi import vim
+from vmjuggler import VirtualMachine
+
+
+def _vm(stub, moid, name, memory, extra=None):
+    return VirtualMachine(stub.add(vim.VirtualMachine, moid, name=name, **{
+        'config.hardware.memoryMB': memory,
+        'config.extraConfig': [vim.option.OptionValue(key=k, value=v) for k, v in (extra or {}).items()]}))
+
+
+def test_reconfigure_keys_by_item(vc, stub):
+    vms = [_vm(stub, 'vm-1', 'web', 2048), _vm(stub, 'vm-2', 'web', 4096), _vm(stub, 'vm-3', 'db', 1024)]
+    r = vc.reconfigure((el for el in vms + ['missing']), memory_mb=4096)
+    assert r == {vms[0]: True, vms[1]: None, vms[2]: True, 'missing': False}
+    specs = dict((moid, kwargs['spec']) for moid, name, kwargs in stub.calls if name == 'ReconfigVM_Task')
+    assert sorted(specs) == ['vm-1', 'vm-3']
+    assert specs['vm-1'].memoryMB == 4096 and specs['vm-1'].numCPUs is None
+
+
+def test_reconfigure_by_name_extra_config(vc, stub):
+    _vm(stub, 'vm-1', 'a', 1024, extra={'disk.EnableUUID': 'TRUE'})
+    _vm(stub, 'vm-2', 'b', 1024)
+    r = vc.reconfigure(['a', 'b'], extra_config={'disk.EnableUUID': 'TRUE'})
+    assert r == {'a': None, 'b': True}
+    assert stub.count('RetrievePropertiesEx') == 1
+
+
+def test_reconfigure_failure(vc, stub, task_results):
+    vm = _vm(stub, 'vm-1', 'a', 1024)
+    fault = vim.fault.VmConfigFault(msg='bad config')
+    stub.on(vm.raw_obj, 'ReconfigVM_Task', lambda mo, spec: stub.task('error', error=fault))
+    r = vc.reconfigure([vm], memory_mb=2048)
+    assert r[vm].success is False
+    assert r[vm].fault == 'vim.fault.VmConfigFault'
@@ -0,0 +1,42 @@
+import pickle
+import pytest
+from pyVmomi import vim
+from vmjuggler import VirtualMachine, Host, refs
+from vmjuggler.refs import ObjectRef
+
+
+def _ident(vm):
+    return vm
+
+
+def _name(vm):
+    return vm.name
+
+
+def test_ref_pickle_round_trip(stub):
+    vm = VirtualMachine(stub.add(vim.VirtualMachine, 'vm-7', name='vm7'))
+    ref = vm.ref
+    assert ref == ObjectRef('vm-7', 'vim.VirtualMachine', 'vc.local')
+    restored = pickle.loads(pickle.dumps(ref))
+    assert restored == ref and isinstance(restored, ObjectRef)
+
+
+def test_resolve(vc, stub):
+    stub.add(vim.HostSystem, 'host-3', name='esx3')
+    host = vc.resolve(ObjectRef('host-3', 'vim.HostSystem', 'vc.local'))
+    assert isinstance(host, Host)
+    assert host.name == 'esx3'
+    assert host.raw_obj._stub is stub
+
+
+def test_resolve_other_vc(vc):
+    with pytest.raises(ValueError):
+        vc.resolve(ObjectRef('vm-1', 'vim.VirtualMachine', 'other.local'))
+
+
+def test_worker_call(vc, stub, monkeypatch):
+    stub.add(vim.VirtualMachine, 'vm-1', name='vm1')
+    monkeypatch.setattr(refs, '_worker_vc', vc)
+    ref = ObjectRef('vm-1', 'vim.VirtualMachine', 'vc.local')
+    assert refs._worker_call((_name, ref)) == 'vm1'
+    assert refs._worker_call((_ident, ref)) == ref
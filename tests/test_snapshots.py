@@ -0,0 +1,79 @@
+import datetime
+from pyVmomi import vim
+
+NOW = datetime.datetime.now(datetime.timezone.utc)
+FileInfo = vim.vm.FileLayoutEx.FileInfo
+DiskLayout = vim.vm.FileLayoutEx.DiskLayout
+DiskUnit = vim.vm.FileLayoutEx.DiskUnit
+SnapshotLayout = vim.vm.FileLayoutEx.SnapshotLayout
+
+
+def _file(key, name, size):
+    return FileInfo(key=key, name=f'[ds1] vm/{name}', type='diskExtent', size=size)
+
+
+def _disk(*units):
+    return [DiskLayout(key=2000, chain=[DiskUnit(fileKey=list(el)) for el in units])]
+
+
+def _tree(stub, name, days, children=()):
+    snap = vim.vm.Snapshot(f'snapshot-{name}', stub)
+    return vim.vm.SnapshotTree(snapshot=snap, name=name, createTime=NOW - datetime.timedelta(days=days),
+                               childSnapshotList=list(children))
+
+
+def _vm(stub, moid, trees, current, files, disk, snaps):
+    """VM with snapshot trees; snaps is list of (snapshot tree, data key, memory key, disk chain units)"""
+    layout = vim.vm.FileLayoutEx(
+        file=[_file(*el) for el in files], disk=_disk(*disk),
+        snapshot=[SnapshotLayout(key=t.snapshot, dataKey=d, memoryKey=m, disk=_disk(*units))
+                  for t, d, m, units in snaps])
+    info = vim.vm.SnapshotInfo(currentSnapshot=current.snapshot, rootSnapshotList=trees)
+    return stub.add(vim.VirtualMachine, moid, name=moid, snapshot=info, layoutEx=layout)
+
+
+BASE = [(1, 'vm.vmdk', 1), (2, 'vm-flat.vmdk', 1000)]
+
+
+def test_single_snapshot_counts_running_delta(vc, stub):
+    s1 = _tree(stub, 's1', 10)
+    files = BASE + [(3, 'vm-000001.vmdk', 1), (4, 'vm-000001-delta.vmdk', 500), (10, 'vm-s1.vmsn', 20)]
+    _vm(stub, 'vm-1', [s1], s1, files, [(1, 2), (3, 4)], [(s1, 10, -1, [(1, 2)])])
+    stub.add(vim.VirtualMachine, 'vm-2', name='no-snapshots')
+    rows = vc.snapshot_report()
+    assert len(rows) == 1
+    assert rows[0]['size_bytes'] == 521
+    assert rows[0]['current'] is True and rows[0]['depth'] == 1 and rows[0]['datastore'] == 'ds1'
+    assert 9.9 < rows[0]['age_days'] < 10.1
+
+
+def test_snapshot_chain(vc, stub):
+    s2 = _tree(stub, 's2', 5)
+    s1 = _tree(stub, 's1', 10, [s2])
+    files = BASE + [(3, 'vm-000001.vmdk', 1), (4, 'vm-000001-delta.vmdk', 300),
+                    (5, 'vm-000002.vmdk', 1), (6, 'vm-000002-delta.vmdk', 70),
+                    (10, 'vm-s1.vmsn', 20), (11, 'vm-s2.vmsn', 30), (12, 'vm-s2.vmem', 4000)]
+    _vm(stub, 'vm-1', [s1], s2, files, [(1, 2), (3, 4), (5, 6)],
+        [(s1, 10, -1, [(1, 2)]), (s2, 11, 12, [(1, 2), (3, 4)])])
+    rows = dict((el['snapshot'], el) for el in vc.snapshot_report())
+    assert rows['s1']['size_bytes'] == 20
+    assert rows['s2']['size_bytes'] == 30 + 4000 + 301 + 71
+    assert rows['s2']['parent_moid'] == 'snapshot-s1' and rows['s2']['depth'] == 2
+    assert sum(el['size_bytes'] for el in rows.values()) == sum(el[2] for el in files) - 1001
+
+
+def test_cleanup_snapshots(vc, stub):
+    s2 = _tree(stub, 's2', 20)
+    s1 = _tree(stub, 's1', 40, [s2])
+    s3 = _tree(stub, 's3', 1, [])
+    files = BASE + [(10, 'vm-s1.vmsn', 20), (11, 'vm-s2.vmsn', 30), (12, 'vm-s3.vmsn', 40)]
+    _vm(stub, 'vm-1', [s1], s2, files, [(1, 2)], [(s1, 10, -1, [(1, 2)]), (s2, 11, -1, [(1, 2)])])
+    _vm(stub, 'vm-2', [s3], s3, files, [(1, 2)], [(s3, 12, -1, [(1, 2)])])
+
+    planned = vc.cleanup_snapshots(7, dry_run=True)
+    assert [(el['snapshot'], el['result']) for el in planned] == [('s1', None), ('s2', None)]
+    assert stub.count('RemoveSnapshot_Task') == 0
+
+    done = vc.cleanup_snapshots(7)
+    assert [(el['snapshot'], el['result']) for el in done] == [('s1', True), ('s2', True)]
+    assert [el[0] for el in stub.calls if el[1] == 'RemoveSnapshot_Task'] == ['snapshot-s1', 'snapshot-s2']
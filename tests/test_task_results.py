@@ -0,0 +1,113 @@
+import datetime
+import logging
+from types import SimpleNamespace
+from unittest import mock
+from pyVmomi import vim, vmodl
+from vmjuggler import Datastore, VirtualMachine
+from vmjuggler.transfer import TransferError
+from vmjuggler.helpers import TaskResult, VMJHelper
+
+
+def _snapshot_vm(stub, *names):
+    trees = [vim.vm.SnapshotTree(snapshot=vim.vm.Snapshot(f'snapshot-{el}', stub), name=el, description='',
+                                 createTime=datetime.datetime(2024, 1, 1), state='poweredOff',
+                                 childSnapshotList=[]) for el in names]
+    info = vim.vm.SnapshotInfo(currentSnapshot=trees[-1].snapshot, rootSnapshotList=trees)
+    return VirtualMachine(stub.add(vim.VirtualMachine, 'vm-1', name='vm1', snapshot=info))
+
+
+def test_revert_early_failures(stub, task_results):
+    vm = _snapshot_vm(stub, 's1')
+    r = vm.revert()
+    assert isinstance(r, TaskResult) and not r and r.fault == 'InvalidArgument'
+    r = vm.revert('missing')
+    assert isinstance(r, TaskResult) and not r and r.fault == 'NotFound'
+    r = vm.revert('s1')
+    assert isinstance(r, TaskResult) and r and r.moid.startswith('task-')
+
+
+def test_revert_without_task_results(stub):
+    vm = _snapshot_vm(stub, 's1')
+    assert vm.revert('missing') is False
+    assert vm.remove_snap(remove_all=True) is True
+
+
+def test_remove_snap_combines_tasks(stub, task_results):
+    vm = _snapshot_vm(stub, 's1', 's2')
+    stub.on('snapshot-s2', 'RemoveSnapshot_Task',
+            lambda mo, **kwargs: stub.task('error', error=vim.fault.TaskInProgress()))
+    r = vm.remove_snap(remove_all=True)
+    assert isinstance(r, TaskResult) and not r
+    assert r.fault == 'vim.fault.TaskInProgress'
+    assert [el.success for el in r.result] == [True, False]
+    assert r.duration == 2.0
+
+
+def test_snapshot_rename(stub, task_results):
+    vm = _snapshot_vm(stub, 's1')
+    snap = vm.get_snap('s1')[0]
+    r = snap.rename(name='s1-new')
+    assert isinstance(r, TaskResult) and r
+    assert snap.name == 's1-new'
+    assert stub.calls[-1][2] == {'name': 's1-new', 'description': None}
+    stub.on('snapshot-s1', 'RenameSnapshot', mock.Mock(side_effect=vmodl.fault.InvalidArgument(msg='bad')))
+    r = snap.rename(name='')
+    assert not r and r.fault == 'vmodl.fault.InvalidArgument' and snap.name == 's1-new'
+
+
+def test_shutdown_and_guest_operations(stub, task_results, tmp_path):
+    host = stub.add(vim.HostSystem, 'host-1', name='esx1')
+    vm = VirtualMachine(stub.add(vim.VirtualMachine, 'vm-2', name='vm2', **{'runtime.host': host}))
+    pm = mock.Mock()
+    pm.ListProcessesInGuest.return_value = [SimpleNamespace(endTime=1, exitCode=1)]
+    fm = mock.Mock()
+    fm.InitiateFileTransferFromGuest.return_value = SimpleNamespace(url='https://*/guestFile?id=1')
+    stub.content.guestOperationsManager = SimpleNamespace(processManager=pm, fileManager=fm)
+    assert isinstance(vm.shutdown(), TaskResult)
+    r = vm.run('/bin/false', username='root', password='x')
+    assert isinstance(r, TaskResult) and not r and r.result == 1 and r.duration is not None
+    pm.StartProgramInGuest.side_effect = vim.fault.GuestOperationsFault(msg='denied')
+    r = vm.run('/bin/true', username='root', password='x')
+    assert not r and r.fault == 'vim.fault.GuestOperationsFault'
+    with mock.patch('vmjuggler.transfer.HttpTransfer.download'):
+        r = vm.download('/etc/hosts', str(tmp_path / 'hosts'), username='root', password='x')
+    assert isinstance(r, TaskResult) and r
+
+
+def test_datastore_transfers(stub, task_results, tmp_path):
+    ds = Datastore(stub.add(vim.Datastore, 'datastore-1', name='ds1', parent=stub.content.rootFolder))
+    local = tmp_path / 'f.iso'
+    local.write_bytes(b'iso')
+    with mock.patch('vmjuggler.transfer.HttpTransfer.upload', side_effect=TransferError('HTTP 500')):
+        r = ds.upload(str(local), 'iso/f.iso')
+    assert isinstance(r, TaskResult) and not r and r.fault == TransferError.__name__ and r.duration is not None
+    with mock.patch('vmjuggler.transfer.HttpTransfer.download_ranges'):
+        r = ds.download('iso/f.iso', str(tmp_path / 'copy.iso'))
+    assert isinstance(r, TaskResult) and r
+
+
+def test_result_helper():
+    assert VMJHelper.result(3, success=False) == 3
+    VMJHelper.task_results = True
+    try:
+        r = VMJHelper.result(None, timed_out=True)
+    finally:
+        VMJHelper.task_results = False
+    assert not r and r.timed_out and r.fault == 'DeadlineExceeded'
+
+
+def test_stats_of_bulk_results(task_results, caplog):
+    ok = TaskResult(True, started=datetime.datetime(2024, 1, 1), completed=datetime.datetime(2024, 1, 1, 0, 0, 4))
+    failed = TaskResult(False, fault='NotFound')
+    assert TaskResult.stats({'vm1': ok, 'vm2': failed, 'vm3': None})['count'] == 2
+    s = TaskResult.stats([{'vm': 'vm1', 'result': ok}, {'vm': 'vm2', 'result': failed}])
+    assert s['succeeded'] == 1 and s['failed'] == 1 and s['faults'] == {'NotFound': 1}
+    assert s['duration']['max'] == 4.0
+    with caplog.at_level(logging.INFO):
+        VMJHelper.log_stats({'vm1': ok, 'vm2': failed}, 'Reconfiguration')
+    assert 'Reconfiguration: 1 succeeded, 1 failed, 0 timed out' in caplog.text
+
+
+def test_bulk_not_found_is_task_result(vc, stub, task_results):
+    r = vc.reconfigure(['missing'], memory_mb=1024)
+    assert isinstance(r['missing'], TaskResult) and r['missing'].fault == 'NotFound'
@@ -0,0 +1,53 @@
+import pytest
+from pyVmomi import vim
+from vmjuggler import VirtualMachine
+from vmjuggler.helpers import TaskResult, VMJHelper
+
+
+@pytest.fixture
+def vm(stub):
+    return VirtualMachine(stub.add(vim.VirtualMachine, 'vm-1', name='vm1'))
+
+
+def test_do_task_success(stub, vm):
+    assert vm.power_on()
+    assert stub.count('PowerOnVM_Task') == 1
+    assert stub.destroyed[-1].startswith('session[1]pc-')  # Task collector is always destroyed
+
+
+def test_do_task_timeout_cancels(stub, vm):
+    stub.on(vm.raw_obj, 'PowerOnVM_Task', lambda mo, **kwargs: stub.task('running', cancelable=True))
+    assert vm.power_on(timeout=0.05) is None
+    assert stub.count('CancelTask') == 1
+
+
+def test_do_task_timeout_not_cancelable(stub, vm):
+    stub.on(vm.raw_obj, 'PowerOnVM_Task', lambda mo, **kwargs: stub.task('running'))
+    assert vm.power_on(timeout=0.05) is None
+    assert stub.count('CancelTask') == 0
+
+
+def test_do_task_expired_deadline(stub, vm, task_results):
+    r = vm.power_on(timeout=0)
+    assert r.timed_out and r.fault == 'DeadlineExceeded'
+    assert stub.count('PowerOnVM_Task') == 0
+
+
+def test_do_task_failure(stub, vm, task_results):
+    stub.on(vm.raw_obj, 'PowerOffVM_Task', lambda mo: stub.task('error', error=vim.fault.InvalidPowerState()))
+    r = vm.power_off()
+    assert isinstance(r, TaskResult) and not r and not r.timed_out
+    assert r.fault == 'vim.fault.InvalidPowerState'
+
+
+def test_do_task_timeout_result(stub, vm, task_results):
+    stub.on(vm.raw_obj, 'PowerOnVM_Task', lambda mo, **kwargs: stub.task('running'))
+    r = vm.power_on(timeout=0.05)
+    assert r.timed_out and not r and r.moid.startswith('task-')
+
+
+def test_deadline_helpers():
+    assert VMJHelper.deadline(None) is None and VMJHelper.remaining(None) is None
+    assert VMJHelper.remaining(VMJHelper.deadline(-1)) == 0
+    assert 0 < VMJHelper.remaining(VMJHelper.deadline(10)) <= 10
+    assert VMJHelper.outcome(None) is None and VMJHelper.outcome('success') is True
@@ -0,0 +1,99 @@
+import io
+import os
+import pytest
+from vmjuggler.transfer import HttpTransfer, TransferError
+
+DATA = bytes(bytearray(range(256))) * 4  # 1024 bytes
+
+
+class Response(object):
+    def __init__(self, status, body, headers=None):
+        self.status_code = status
+        self.headers = headers or {}
+        self._body = body
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self._body), chunk_size):
+            yield self._body[i:i + chunk_size]
+
+    def close(self):
+        pass
+
+
+class Session(object):
+    """Serves DATA, answers ranged parts with given status and drops 'short' bytes of every part"""
+
+    def __init__(self, part_status=206, short=0):
+        self.part_status = part_status
+        self.short = short
+        self.ranges = []
+
+    def get(self, url, headers=None, stream=False):
+        first, last = [int(el) for el in headers['Range'].split('=')[1].split('-')]
+        if (first, last) == (0, 0):
+            return Response(206, DATA[:1], {'Content-Range': f'bytes 0-0/{len(DATA)}'})
+        self.ranges.append((first, last))
+        if self.part_status != 206:
+            return Response(self.part_status, DATA)
+        return Response(206, DATA[first:last + 1 - self.short])
+
+
+@pytest.fixture
+def session(monkeypatch):
+    def use(s):
+        monkeypatch.setattr(HttpTransfer, 'session', classmethod(lambda cls: s))
+        monkeypatch.setattr(HttpTransfer, 'part_size', 256)
+        monkeypatch.setattr(HttpTransfer, 'chunk_size', 100)
+        return s
+    return use
+
+
+def test_download_ranges(session, tmp_path):
+    s = session(Session())
+    path = str(tmp_path / 'disk.vmdk')
+    assert HttpTransfer.download_ranges('https://vc/folder/disk.vmdk', path, workers=2) == len(DATA)
+    assert open(path, 'rb').read() == DATA
+    assert sorted(s.ranges) == [(0, 255), (256, 511), (512, 767), (768, 1023)]
+    assert not os.path.exists(f'{path}.part')
+
+
+def test_download_ranges_ignored_range(session, tmp_path):
+    session(Session(part_status=200))
+    path = str(tmp_path / 'disk.vmdk')
+    with pytest.raises(TransferError):
+        HttpTransfer.download_ranges('https://vc/folder/disk.vmdk', path, workers=1)
+    assert open(f'{path}.part').read().count('"done": []') == 1
+
+
+def test_download_ranges_short_part_resumed(session, tmp_path):
+    session(Session(short=10))
+    path = str(tmp_path / 'disk.vmdk')
+    with pytest.raises(TransferError):
+        HttpTransfer.download_ranges('https://vc/folder/disk.vmdk', path, workers=1)
+    s = session(Session())
+    assert HttpTransfer.download_ranges('https://vc/folder/disk.vmdk', path, workers=1) == len(DATA)
+    assert open(path, 'rb').read() == DATA
+    assert len(s.ranges) == 4
+
+
+def test_upload_stream_reads_size_only(monkeypatch):
+    sent = {}
+
+    class UploadSession(object):
+        def request(self, method, url, data=None, headers=None):
+            sent['body'] = data.read()
+            sent['headers'] = headers
+            return Response(200, b'')
+
+    monkeypatch.setattr(HttpTransfer, 'session', classmethod(lambda cls: UploadSession()))
+    progress = []
+    f = io.BytesIO(DATA)
+    f.seek(10)
+    HttpTransfer.upload_stream('https://vc/x', f, 20, cookie='c=1', progress=progress.append)
+    assert sent['body'] == DATA[10:30]
+    assert sent['headers']['Content-Length'] == '20'
+    assert sent['headers']['Cookie'] == 'c=1'
+    assert progress == [20]
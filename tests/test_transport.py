@@ -0,0 +1,90 @@
+import datetime
+import gzip
+import json
+import pytest
+from pyVmomi import vim, SoapStubAdapter
+from vmjuggler.transport import Recorder, Replayer
+
+RESPONSE = (b'<?xml version="1.0" encoding="UTF-8"?>'
+            b'<soapenv:Envelope xmlns:soapenc="http://schemas.xmlsoap.org/soap/encoding/" '
+            b'xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" '
+            b'xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+            b'<soapenv:Body><CurrentTimeResponse xmlns="urn:vim25">'
+            b'<returnval>2024-01-01T12:00:0%dZ</returnval>'
+            b'</CurrentTimeResponse></soapenv:Body></soapenv:Envelope>')
+
+
+class Connection(object):
+    """HTTP connection answering every request with the next canned response"""
+
+    def __init__(self, server):
+        self.server = server
+        self.sock = None
+
+    def request(self, method, url, body=None, headers=None):
+        self.server.requests.append(body)
+
+    def getresponse(self):
+        body = RESPONSE % len(self.server.requests)
+        return Resp(body)
+
+    def close(self):
+        pass
+
+
+class Resp(object):
+    status = 200
+    reason = 'OK'
+
+    def __init__(self, body):
+        self._body = body
+
+    def getheader(self, name, default=None):
+        return {'content-type': 'text/xml; charset=utf-8'}.get(name.lower(), default)
+
+    def read(self, size=-1):
+        body, self._body = self._body, b''
+        return body
+
+
+class Server(object):
+    def __init__(self):
+        self.requests = []
+
+    def stub(self):
+        stub = SoapStubAdapter(host='vc.local', version='vim.version.version13')
+        stub.scheme = lambda host, **kwargs: Connection(self)
+        return stub
+
+
+def test_record_and_replay(tmp_path):
+    path = str(tmp_path / 'calls.jsonl.gz')
+    server = Server()
+    stub = server.stub()
+    recorder = Recorder(path)
+    recorder.install(stub)
+    si = vim.ServiceInstance('ServiceInstance', stub)
+    recorded = [si.CurrentTime(), si.CurrentTime()]
+    recorder.close()
+    assert [el.second for el in recorded] == [1, 2]
+
+    with gzip.open(path, 'rt') as f:
+        lines = [json.loads(el) for el in f]
+    assert lines[0] == {'version': 'vim.version.version13'}
+    assert len(lines) == 3 and lines[1]['key'] == lines[2]['key']
+
+    replayer = Replayer(path)
+    si = replayer.connect('vc.local')
+    replayed = [si.CurrentTime(), si.CurrentTime(), si.CurrentTime()]
+    assert replayed == recorded + recorded[-1:]  # The last response is served again once recording is over
+    assert len(server.requests) == 2
+    assert isinstance(replayed[0], datetime.datetime)
+
+
+def test_replay_unknown_request(tmp_path):
+    path = str(tmp_path / 'calls.jsonl.gz')
+    with gzip.open(path, 'wt') as f:
+        f.write(json.dumps({'version': 'vim.version.version13'}) + '\n')
+    si = Replayer(path).connect('vc.local')
+    with pytest.raises(KeyError):
+        si.CurrentTime()
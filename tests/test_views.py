@@ -0,0 +1,67 @@
+from pyVmomi import vim
+from vmjuggler import VCenter, Host
+
+
+def _vms(stub, count=3):
+    return [stub.add(vim.VirtualMachine, f'vm-{i}', name=f'vm{i}') for i in range(count)]
+
+
+def test_view_reused(vc, stub):
+    _vms(stub)
+    vc._get_vc_objects([vim.VirtualMachine], name='vm1', get_all=False)
+    vc._get_vc_objects([vim.VirtualMachine], get_all=True)
+    list(vc._retrieve([vim.VirtualMachine], ['name']))
+    assert stub.count('CreateContainerView') == 1
+    assert stub.destroyed == []
+
+
+def test_view_in_use_is_not_expired(vc, stub):
+    _vms(stub)
+    stub.add(vim.HostSystem, 'host-1', name='esx1')
+    vc.view_ttl = -1  # Every idle view is expired by the next lookup
+    pages = vc._retrieve([vim.VirtualMachine], ['name'], page_size=1)
+    first = next(pages)
+    vc._get_vc_objects([vim.HostSystem], get_all=True)
+    assert stub.destroyed == []
+    assert [first[1]['name']] + [props['name'] for _, props in pages] == ['vm0', 'vm1', 'vm2']
+    # Idle once all pages are fetched
+    vc._get_vc_objects([vim.HostSystem], get_all=True)
+    assert len(stub.destroyed) == 1
+
+
+def test_idle_view_expired(vc, stub):
+    _vms(stub)
+    vc._get_vc_objects([vim.VirtualMachine], get_all=True)
+    vc.view_ttl = -1
+    vc._get_vc_objects([vim.HostSystem], get_all=True)
+    assert len(stub.destroyed) == 1
+    assert list(vc._views) == [('group-d1', ('vim.HostSystem',), True)]
+
+
+def test_disconnect_destroys_views(vc, stub, monkeypatch):
+    monkeypatch.setattr('pyVim.connect.Disconnect', lambda si: None)
+    vc._get_vc_objects([vim.VirtualMachine], get_all=True)
+    vc._get_vc_objects([vim.HostSystem], get_all=True)
+    vc.disconnect()
+    assert len(stub.destroyed) == 2
+
+
+def test_object_vc_destroys_views(stub):
+    host = Host(stub.add(vim.HostSystem, 'host-1', name='esx1'))
+    with host._vc() as vc:
+        vc._get_vc_objects([vim.VirtualMachine], get_all=True)
+        assert stub.destroyed == []
+    assert len(stub.destroyed) == 1
+
+
+def test_evacuate_destroys_views(stub, monkeypatch):
+    target = stub.add(vim.HostSystem, 'host-2', name='esx2')
+    host = Host(stub.add(vim.HostSystem, 'host-1', name='esx1', vm=[stub.add(vim.VirtualMachine, 'vm-1')]))
+
+    def migrate(self, vms, target_host, **kwargs):
+        self._get_vc_objects([vim.HostSystem], get_all=True)
+        return {}
+
+    monkeypatch.setattr(VCenter, 'migrate', migrate)
+    assert host.evacuate(targets=[target]) == {}
+    assert len(stub.destroyed) == 1
@@ -1,5 +1,5 @@
 #!/usr/bin/env python
-# -*- coding: future_fstrings -*-
+# -*- coding: utf-8 -*-
 
 # MIT License
 #
@@ -36,17 +36,48 @@ __copyright__ = "Copyright (c) 2018 Alexandr Malygin"
 __license__ = "MIT"
 __version__ = "0.1.1"
 
-import logging
-from .base_objects import VCenter, BaseVCObject, VirtualMachine, Datacenter, Folder, VApp, Network, Datastore, Host
-from .base_objects import VMSnapshot
-from .helpers import Logger
-from .exceptions import WrongObjectTypeError
+import sys
 
-if __name__ == '__main__':
-    exit(0)
+# Public names and modules they live in. Modules are imported on first access to the name,
+# so "import vmjuggler" doesn't load pyVmomi and doesn't touch logging configuration.
+_lazy = {
+    'VCenter': 'base_objects',
+    'BaseVCObject': 'base_objects',
+    'VirtualMachine': 'base_objects',
+    'Datacenter': 'base_objects',
+    'Folder': 'base_objects',
+    'VApp': 'base_objects',
+    'Network': 'base_objects',
+    'Datastore': 'base_objects',
+    'Host': 'base_objects',
+    'VMSnapshot': 'base_objects',
+    'Logger': 'helpers',
+    'TaskResult': 'helpers',
+    'Progress': 'progress',
+    'FleetTable': 'fleet',
+    'WrongObjectTypeError': 'exceptions',
+}
 
-Logger.log_level = logging.INFO
-Logger.set()
+__all__ = list(_lazy)
 
 
+def __getattr__(name):
+    if name not in _lazy:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    import importlib
+    value = getattr(importlib.import_module('.' + _lazy[name], __name__), name)
+    globals()[name] = value
+    return value
 
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy))
+
+
+if sys.version_info < (3, 7):  # Module level __getattr__ is not supported, import everything at once
+    from .base_objects import VCenter, BaseVCObject, VirtualMachine, Datacenter, Folder, VApp, Network, Datastore, Host
+    from .base_objects import VMSnapshot
+    from .helpers import Logger, TaskResult
+    from .progress import Progress
+    from .fleet import FleetTable
+    from .exceptions import WrongObjectTypeError
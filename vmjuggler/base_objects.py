@@ -25,13 +25,39 @@
 
 from __future__ import print_function
 from functools import wraps  # used by sphinx to pick up docstring from decorated methods properly
+from contextlib import contextmanager
 import logging
 import atexit
-from pyVim.connect import SmartConnectNoSSL, Disconnect
-from pyVmomi import vim, vmodl
-from .helpers import VMJHelper
+import calendar
+import copy
+import datetime
+import fnmatch
+import multiprocessing
+import os
+import shutil
+import ssl
+import tempfile
+import threading
+import time
+import uuid
+from multiprocessing.pool import ThreadPool
+from pyVmomi import vim, vmodl, VmomiSupport, SoapStubAdapter
+from .helpers import VMJHelper, TaskResult
+from . import progress
+from .cache import DatastoreFile
+from .refs import ObjectRef, _worker_init, _worker_call
 from .exceptions import WrongObjectTypeError
 
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    from urllib.parse import quote, urlencode
+except ImportError:
+    from urllib import quote, urlencode
+
 
 class VCenter(object):
     """
@@ -42,6 +68,8 @@ class VCenter(object):
     :param str password: User password.
     """
 
+    view_ttl = 600  #: Seconds the unused container view is kept in the pool before it's destroyed.
+
     def __init__(self, address, username, password,):
         self._raw_global = None
         self._return_single = False
@@ -50,6 +78,17 @@ class VCenter(object):
         self._password = password
         self.si = None  #: ServiceInstance. Populated once connected to VMWare VCenter.
         self.content = None  #: "content" of ServiceInstance. Populated once connected to VMWare VCenter.
+        self._attached = False  # Attached to session of another VCenter object, see attach()
+        self._transport = None  # Recorder or Replayer passed to connect()
+        self._inventory = None  # InventoryCache enabled by use_cache()
+        self._watchers = {}  # key -> [PropertyCollector, ContainerView, version], see _watch()
+        self._watchers_lock = threading.Lock()
+        self._feeds = {}  # key -> (token prefix, InventorySnapshot), see changes()
+        self._alarm_names = {}  # Alarm moId -> name, see _alarm_names_for()
+        self._fields = {}  # Custom field key -> name, see refresh_attrs()
+        self._attrs = {}  # VM moId -> (raw object, name, {custom field name: value}), see refresh_attrs()
+        self._views = {}  # (root moId, type names, recursive) -> [ContainerView, last used time, users], see _view()
+        self._views_lock = threading.Lock()
     
     class Decor(object):
         @staticmethod
@@ -76,23 +115,35 @@ class VCenter(object):
 
             return wrapper
 
-    def connect(self, exit_on_fault=True):
+    def connect(self, exit_on_fault=True, transport=None):
         """
         Connect to VCenter.
 
         Currently doesn't use certificate, as it not used in the most installations or self-signed used.
 
         :param bool exit_on_fault: Perform exit on connection fault if True, otherwise returns None.
+        :param transport: :class:`vmjuggler.transport.Recorder` to record all calls made through the connection
+                          or :class:`vmjuggler.transport.Replayer` to serve calls from recording without network.
         :return: VMWare ServiceInstance object or None in case of connection fault.
         """
+        from pyVim.connect import SmartConnectNoSSL, Disconnect
+        from .transport import Replayer
         logging.info(f'Connecting to {self._address} ...')
         try:
-            si = SmartConnectNoSSL(host=self._address,
-                                   user=self._username,
-                                   pwd=self._password)
+            if isinstance(transport, Replayer):
+                si = transport.connect(self._address)
+                self._attached = True  # There is no real session to close
+            else:
+                si = SmartConnectNoSSL(host=self._address,
+                                       user=self._username,
+                                       pwd=self._password)
+                atexit.register(Disconnect, si)
+                if transport is not None:
+                    transport.install(si._stub)
+                    atexit.register(transport.close)
             self.si = si
             self.content = si.RetrieveServiceContent()
-            atexit.register(Disconnect, si)
+            self._transport = transport
             logging.info(f'Connected to {self._address}')
             return si
 
@@ -111,12 +162,115 @@ class VCenter(object):
 
     def disconnect(self):
         """Close connection with VCenter."""
+        from pyVim.connect import Disconnect
+        with self._watchers_lock:
+            keys = list(self._watchers)
+        for key in keys:
+            self._unwatch(key)
+        self._feeds = {}
+        self._destroy_views()
         if self.si:
-            Disconnect(self.si)
+            if not self._attached:  # Attached objects share session with the owner, so it's not closed
+                Disconnect(self.si)
+            if self._transport is not None:
+                self._transport.close()
+                self._transport = None
             self.si = None
             logging.info(f'Disconnected from {self._address}')
         return 0
 
+    @classmethod
+    def attach(cls, address, cookie, version):
+        """
+        Create VCenter object attached to existing session.
+
+        Used to share the session with other processes or threads without one more login.
+        The session is not closed by :meth:`disconnect` of attached object.
+
+        :param str address: VCenter address or IP.
+        :param str cookie: Session cookie.
+        :param str version: API version of the session.
+        :return: VCenter object.
+        """
+        vc = cls(address, None, None)
+        stub = SoapStubAdapter(host=address, port=443, version=version, sslContext=ssl._create_unverified_context())
+        stub.cookie = cookie
+        vc.si = vim.ServiceInstance('ServiceInstance', stub)
+        vc.content = vc.si.RetrieveContent()
+        vc._attached = True
+        return vc
+
+    @property
+    def _session(self):
+        """Arguments for :meth:`attach` to join current session."""
+        return self._address, self.si._stub.cookie, self.si._stub.version
+
+    def resolve(self, ref):
+        """
+        Turn reference back to vmjuggler object bound to this connection.
+
+        :param vmjuggler.refs.ObjectRef ref: Object reference.
+        :return: vmjuggler object of type matching the reference, e.g. vmjuggler.VirtualMachine.
+        """
+        if ref.vc != self._address:
+            raise ValueError(f'Reference to "{ref.moid}" belongs to VCenter "{ref.vc}", not "{self._address}"')
+        raw = VmomiSupport.GetVmodlType(ref.obj_type)(ref.moid, self.si._stub)
+        return _wrap(raw)
+
+    def map_processes(self, fn, objects, workers=None, chunksize=1):
+        """
+        Call function for every object in pool of worker processes.
+
+        Every worker joins the current session, so there is no extra login. Objects are passed to workers
+        as :class:`vmjuggler.refs.ObjectRef` and turned back to vmjuggler objects there.
+        Function and its results have to be picklable, vmjuggler objects in results are returned as references.
+
+        :param fn: Module level function which takes single vmjuggler object.
+        :param list objects: vmjuggler objects or references.
+        :param int workers: Number of processes. Number of CPUs if not set.
+        :param int chunksize: Number of objects sent to worker at once.
+        :return: List of results in the same order as objects.
+        """
+        refs = [el.ref if isinstance(el, BaseVCObject) else el for el in objects]
+        pool = multiprocessing.Pool(workers, initializer=_worker_init, initargs=self._session)
+        try:
+            return pool.map(_worker_call, [(fn, el) for el in refs], chunksize=chunksize)
+        finally:
+            pool.close()
+            pool.join()
+
+    def map(self, fn, objects, workers=10):
+        """
+        Call function for every object in pool of threads, every thread with own connection.
+
+        All objects of the connection share single SOAP stub, so concurrent calls through it are serialized
+        and may get mixed up. Here every worker thread gets own stub attached to the same session,
+        see :meth:`attach`, and objects are rebound to the stub of the thread before the call.
+        vmjuggler and raw managed objects in results are rebound back to this connection.
+
+        :param fn: Function which takes single vmjuggler or raw managed object.
+        :param list objects: vmjuggler objects or raw managed objects.
+        :param int workers: Number of threads.
+        :return: List of results in the same order as objects. The first exception raised by function is re-raised.
+        """
+        local = threading.local()
+        lock = threading.Lock()
+        attached = []
+        session = self._session
+
+        def call(obj):
+            if getattr(local, 'vc', None) is None:
+                local.vc = VCenter.attach(*session)
+                with lock:
+                    attached.append(local.vc)
+            return _rebind(fn(_rebind(obj, local.vc)), self)
+
+        try:
+            return VMJHelper.parallel(call, objects, workers=workers)
+        finally:
+            for vc in attached:
+                vc.si._stub.DropConnections()
+
     @property
     def raw_global(self):
         """
@@ -206,10 +360,12 @@ class VCenter(object):
         :param: return_type: The Class the output will be converted to.
         :return: List of objects.
         """
-        root = root if root else self.content.rootFolder
-        obj_view = self.content.viewManager.CreateContainerView(root, obj_type, recursive)
-        obj_list = obj_view.view
-        obj_view.Destroy()
+        if self._inventory is not None and not get_all and name is not None and root is None and recursive:
+            r = self._get_cached(obj_type, name)
+            return [return_type(el, name=n) for el, n in r] if return_type is not None else [el for el, n in r]
+
+        with self._view(obj_type, root, recursive) as view:
+            obj_list = view.view
 
         r = []
         if get_all:
@@ -234,8 +390,629 @@ class VCenter(object):
             r = rn
         return r
 
+    @contextmanager
+    def _view(self, obj_type, root=None, recursive=True):
+        """
+        Use container view from the pool, create it if not exists.
+
+        Views are kept per root, set of types and recursive flag and reused by all lookups.
+        Views are counted while in use, only idle views unused for :attr:`view_ttl` seconds are destroyed.
+
+        :param list obj_type: List of object's types in the view.
+        :param root: The folder to start looking from. Default 'si.content.rootFolder' used if not specified.
+        :param bool recursive: Include objects recursively or not.
+        :return: Context manager which yields vim.view.ContainerView object.
+        """
+        root = root if root else self.content.rootFolder
+        key = (root._moId, tuple(sorted(el.__name__ for el in obj_type)), recursive)
+        now = time.time()
+        with self._views_lock:
+            expired = [k for k, (view, used, users) in self._views.items()
+                       if k != key and not users and now - used > self.view_ttl]
+            expired = [self._views.pop(k)[0] for k in expired]
+            if key not in self._views:
+                self._views[key] = [self.content.viewManager.CreateContainerView(root, obj_type, recursive), now, 0]
+            entry = self._views[key]
+            entry[2] += 1
+        for el in expired:
+            self._destroy_view(el)
+        try:
+            yield entry[0]
+        finally:
+            with self._views_lock:
+                entry[1] = time.time()
+                entry[2] -= 1
+
+    @staticmethod
+    def _destroy_view(view):
+        """Destroy container view, ignore if it's already destroyed."""
+        try:
+            view.Destroy()
+        except vmodl.fault.ManagedObjectNotFound:  # Already gone with the session
+            pass
+
+    def _destroy_views(self):
+        """Destroy all pooled container views."""
+        with self._views_lock:
+            views = [el[0] for el in self._views.values()]
+            self._views = {}
+        if self.si:
+            for el in views:
+                self._destroy_view(el)
+
+    def use_cache(self, path):
+        """
+        Enable persistent inventory cache.
+
+        Once enabled, get_* methods resolve names by the cache instead of inventory scan.
+        Found objects are verified by single bulk call, cache is refreshed if any of them was renamed or removed
+        or if any name is not found. Cache filled for another VCenter is cleared.
+
+        :param str path: Path to the cache file. Created if not exists.
+        :return: vmjuggler.cache.InventoryCache object.
+        """
+        from .cache import InventoryCache
+        self._inventory = InventoryCache(path)
+        if not self._inventory.validate(self.content.about.instanceUuid) or self._inventory.is_empty():
+            self.refresh_cache()
+        return self._inventory
+
+    def refresh_cache(self):
+        """
+        Bring inventory cache up to date.
+
+        The first call in the process fetches name and parent of all managed entities by bulk call,
+        next calls fetch only changes made since previous call by PropertyCollector versioned updates.
+
+        :return: n/a
+        """
+        if self._watch_version('inventory') is None:
+            # The root folder is not in the view, but it's needed to build paths
+            root = self.content.rootFolder
+            self._inventory.update([(root._moId, root.name, type(root).__name__, None)], replace=True)
+        changed, removed = self._watch('inventory', [vim.ManagedEntity], ['name', 'parent'])
+        # Modified objects come with changed properties only, fetch the rest
+        partial = [obj for obj, props in changed.values() if 'name' not in props or 'parent' not in props]
+        found = self._retrieve_existing(['name', 'parent'], partial)
+        for obj, props in found:
+            changed[obj._moId][1].update(props)
+        for moid in set(el._moId for el in partial) - set(obj._moId for obj, props in found):
+            changed.pop(moid)  # Removed meanwhile, reported by the next call
+        objects = [(moid, props.get('name'), type(obj).__name__, props['parent']._moId if props.get('parent') else None)
+                   for moid, (obj, props) in changed.items()]
+        self._inventory.update(objects, removed=removed)
+        logging.debug(f'Inventory cache updated: {len(objects)} changed, {len(removed)} removed')
+
+    def refresh_attrs(self):
+        """
+        Bring index of VMs' custom attributes up to date.
+
+        The first call fetches custom attribute values of all VMs by bulk call, next calls fetch only VMs
+        changed since previous call. Called by :meth:`get_vm` and :meth:`set_attr`, so selection by attributes
+        is an in-memory lookup once the index is built.
+
+        :return: n/a
+        """
+        fm = self.content.customFieldsManager
+        self._fields = dict((el.key, el.name) for el in (fm.field if fm else None) or [])
+        changed, removed = self._watch('attrs', [vim.VirtualMachine], ['name', 'customValue'])
+        for moid in removed:
+            self._attrs.pop(moid, None)
+        for moid, (obj, props) in changed.items():
+            _, name, values = self._attrs.get(moid, (obj, None, {}))
+            if 'name' in props:
+                name = props['name']
+            if 'customValue' in props:
+                values = dict((el.key, getattr(el, 'value', None)) for el in props['customValue'] or [])
+            self._attrs[moid] = (obj, name, values)
+        logging.debug(f'Attributes index updated: {len(changed)} changed, {len(removed)} removed')
+
+    def _field_key(self, attr):
+        """Custom field key by name, None if there is no such field"""
+        for key, name in self._fields.items():
+            if name == attr:
+                return key
+        return None
+
+    def _select_by_attrs(self, attrs, name=None):
+        """
+        Find VMs by custom attributes values using attributes index.
+
+        :param dict attrs: Dict of {attribute name: value}. VM must match all of them.
+        :param str name: VM name or list of names to select from.
+        :return: List of (raw object, name) tuples.
+        """
+        self.refresh_attrs()
+        keys = dict((attr, self._field_key(attr)) for attr in attrs)
+        if None in keys.values():
+            return []
+        names = None if name is None else set([name] if isinstance(name, str) else name)
+        return [(obj, vm_name) for obj, vm_name, values in self._attrs.values()
+                if (names is None or vm_name in names) and all(values.get(keys[k]) == v for k, v in attrs.items())]
+
+    def set_attr(self, vms, attr, value, workers=10):
+        """
+        Set custom attribute value of many VMs.
+
+        The attribute is created if not exists. VMs which already have the value according to attributes index
+        are skipped, others are updated concurrently.
+
+        :param list vms: VM names, vmjuggler.VirtualMachine or raw vim.VirtualMachine objects.
+        :param str attr: Attribute name.
+        :param str value: Attribute value. Empty string clears the value.
+        :param int workers: Max number of concurrent updates.
+        :return: Dict of {item of vms: True on success, False on failure, None if skipped}.
+        """
+        vms = list(vms)
+        fm = self.content.customFieldsManager
+        self.refresh_attrs()
+        key = self._field_key(attr)
+        if key is None:
+            try:
+                key = fm.AddCustomFieldDef(name=attr, moType=vim.VirtualMachine).key
+                self._fields[key] = attr
+            except (vim.fault.DuplicateName, vim.fault.InvalidPrivilege) as e:
+                logging.info(f'Error: {e.msg}')
+                return dict((el, VMJHelper.result(False, fault=e)) for el in vms)
+        by_name = {}
+        for moid, (obj, name, values) in self._attrs.items():
+            by_name.setdefault(name, moid)
+        r = {}
+        keys = []
+        todo = []
+        for el in vms:
+            moid = by_name.get(el) if isinstance(el, str) else \
+                el.raw_obj._moId if isinstance(el, BaseVCObject) else el._moId
+            if moid not in self._attrs:
+                logging.info(f'VM "{el if isinstance(el, str) else el.name}" not found')
+                r[el] = VMJHelper.result(False, fault='NotFound')
+                continue
+            obj, name, values = self._attrs[moid]
+            if values.get(key, '') == value:
+                r[el] = None
+            else:
+                keys.append(el)
+                todo.append(moid)
+
+        def set_value(moid):
+            obj, name, values = self._attrs[moid]
+            ok = VMJHelper.do(fm.SetField, (vmodl.RuntimeFault, vmodl.fault.InvalidArgument),
+                              entity=obj, key=key, value=value)
+            if ok:
+                values[key] = value
+            return VMJHelper.outcome(ok)
+
+        results = VMJHelper.parallel(set_value, todo, workers=workers)
+        r.update(zip(keys, results))
+        logging.info(f'Attribute "{attr}" set for {len(todo)} VMs, {len(vms) - len(todo)} skipped or not found')
+        VMJHelper.log_stats(r, f'Attribute "{attr}" update')
+        return r
+
+    def changes(self, since=None, obj_type=None, properties=None, snapshot_path=None):
+        """
+        Find objects added, removed or modified since previous call.
+
+        Within the session changes are fetched by PropertyCollector versioned updates, so if nothing changed
+        the call costs single request. If token is not given, expired or belongs to another session,
+        all objects are fetched and compared with the compact hashed snapshot saved at 'snapshot_path'
+        by previous call, see :class:`vmjuggler.cache.InventorySnapshot`. Without snapshot all objects
+        are reported as added.
+        Only the latest token is valid: changes between older token and the latest one can't be reported again.
+
+        :param str since: Token returned by previous call.
+        :param list obj_type: List of object's types to track. Default [vim.ManagedEntity].
+        :param list properties: List of property paths to track. Default ['name', 'parent'].
+        :param str snapshot_path: Path to the snapshot file to compare with and update.
+        :return: Dict with keys:
+                 'token' - token to pass to the next call,
+                 'full' - True if there was nothing to compare with,
+                 'added' - list of {'moid', 'type', 'props': {property path: value}} dicts,
+                 'modified' - list of {'moid', 'type', 'changed': [property paths], 'props': {changed path: value}},
+                 'removed' - list of {'moid', 'type'} dicts.
+        """
+        obj_type = obj_type or [vim.ManagedEntity]
+        properties = properties or ['name', 'parent']
+        key = f'changes:{",".join(sorted(el.__name__ for el in obj_type))}:{",".join(sorted(properties))}'
+        feed = self._feeds.get(key)
+        version = self._watch_version(key)
+        incremental = feed is not None and version is not None and since == f'{feed[0]}:{version}'
+        if not incremental:
+            from .cache import InventorySnapshot
+            self._unwatch(key)
+            feed = (uuid.uuid4().hex, InventorySnapshot(snapshot_path))
+            self._feeds[key] = feed
+        prefix, snapshot = feed
+        full = not incremental and not snapshot.objects
+        changed, removed = self._watch(key, obj_type, properties)
+        if not incremental:
+            removed = [el for el in snapshot.objects if el not in changed]
+        r = {'full': full, 'added': [], 'modified': [], 'removed': []}
+        for moid in removed:
+            r['removed'].append({'moid': moid, 'type': snapshot.remove(moid)})
+        for moid, (obj, props) in changed.items():
+            type_name = type(obj).__name__
+            new, paths = snapshot.update(moid, type_name, props, complete=not incremental)
+            if new:
+                r['added'].append({'moid': moid, 'type': type_name, 'props': props})
+            elif paths:
+                r['modified'].append({'moid': moid, 'type': type_name, 'changed': paths,
+                                      'props': dict((el, props.get(el)) for el in paths)})
+        if changed or removed:
+            snapshot.save()
+        r['token'] = f'{prefix}:{self._watch_version(key)}'
+        logging.debug(f'Changes: {len(r["added"])} added, {len(r["modified"])} modified, {len(r["removed"])} removed')
+        return r
+
+    _health_props = ['name', 'overallStatus', 'triggeredAlarmState', 'configIssue']
+
+    def _alarm_names_for(self, states):
+        """
+        Resolve names of triggered alarms, unknown ones are fetched by single bulk call and cached.
+
+        :param list states: List of vim.alarm.AlarmState objects.
+        :return: n/a
+        """
+        missing = dict((el.alarm._moId, el.alarm) for el in states if el.alarm._moId not in self._alarm_names)
+        for obj, props in self._retrieve(None, ['info.name'], objects=list(missing.values())):
+            self._alarm_names[obj._moId] = props.get('info.name')
+
+    def _health_row(self, obj, props):
+        """Build health table row"""
+        return {'moid': obj._moId,
+                'type': type(obj).__name__,
+                'name': props.get('name'),
+                'status': props.get('overallStatus'),
+                'alarms': [{'name': self._alarm_names.get(el.alarm._moId, el.alarm._moId),
+                            'status': el.overallStatus,
+                            'time': el.time,
+                            'acknowledged': bool(el.acknowledged)} for el in props.get('triggeredAlarmState') or []],
+                'issues': [el.fullFormattedMessage or type(el).__name__ for el in props.get('configIssue') or []]}
+
+    def health(self, obj_types=None, root=None, problems_only=False):
+        """
+        Collect health state of many objects at once.
+
+        Overall status, triggered alarms and configuration issues of all objects are fetched by single traversal.
+        Alarm names are cached, so only alarms not seen before are fetched.
+
+        :param list obj_types: List of object's types. Default [vim.HostSystem, vim.VirtualMachine, vim.Datastore].
+        :param root: The folder to start looking from. Default 'si.content.rootFolder' used if not specified.
+        :param bool problems_only: If set, only objects which status is not green are returned.
+        :return: List of dicts with 'moid', 'type', 'name', 'status' ('green', 'yellow', 'red' or 'gray'),
+                 'alarms' (list of {'name', 'status', 'time', 'acknowledged'}) and 'issues' (list of messages) keys.
+        """
+        obj_types = obj_types or [vim.HostSystem, vim.VirtualMachine, vim.Datastore]
+        objects = list(self._retrieve(obj_types, self._health_props, root=root))
+        self._alarm_names_for([el for obj, props in objects for el in props.get('triggeredAlarmState') or []])
+        rows = [self._health_row(obj, props) for obj, props in objects]
+        if problems_only:
+            rows = [el for el in rows if el['status'] != vim.ManagedEntity.Status.green]
+        return rows
+
+    def iter_health(self, obj_types=None, interval=30):
+        """
+        Watch health state of many objects.
+
+        The first item has all objects, the next ones only objects which health changed.
+        Changes are fetched by PropertyCollector versioned updates, which wait on VCenter side
+        up to 'interval' seconds, so quiet intervals cost single request.
+        The PropertyCollector is destroyed once generator is closed.
+
+        :param list obj_types: List of object's types. Default [vim.HostSystem, vim.VirtualMachine, vim.Datastore].
+        :param int interval: Max time in seconds to wait for changes per request.
+        :return: Generator of dicts with 'changed' (list of rows, see :meth:`health`) and 'removed' (list of moIds)
+                 keys. Never ends.
+        """
+        obj_types = obj_types or [vim.HostSystem, vim.VirtualMachine, vim.Datastore]
+        key = f'health:{uuid.uuid4().hex}'
+        state = {}
+        wait = 0
+        try:
+            while True:
+                changed, removed = self._watch(key, obj_types, self._health_props, wait=wait)
+                wait = interval
+                if not changed and not removed:
+                    continue
+                for moid in removed:
+                    state.pop(moid, None)
+                for moid, (obj, props) in changed.items():
+                    state.setdefault(moid, (obj, {}))[1].update(props)
+                self._alarm_names_for([el for moid in changed
+                                       for el in state[moid][1].get('triggeredAlarmState') or []])
+                yield {'changed': [self._health_row(*state[moid]) for moid in changed], 'removed': removed}
+        finally:
+            self._unwatch(key)
+
+    def _watch_version(self, key):
+        """Version of the data seen by the watch, None if there is no such watch, see :meth:`_watch`."""
+        with self._watchers_lock:
+            return self._watchers[key][2] if key in self._watchers else None
+
+    def _unwatch(self, key):
+        """Destroy PropertyCollector of the watch, see :meth:`_watch`."""
+        with self._watchers_lock:
+            entry = self._watchers.pop(key, None)
+        if entry is not None:
+            pc, view, _ = entry
+            pc.DestroyPropertyCollector()
+            view.Destroy()
+
+    def _watch(self, key, obj_type, properties, wait=0):
+        """
+        Fetch changes of objects' properties made since previous call with the same key.
+
+        Every key has own PropertyCollector, so only its version is needed to get the changes.
+        The first call returns all objects, next calls return only objects changed since previous call
+        with changed properties only.
+
+        :param str key: Name of the watch.
+        :param list obj_type: List of object's types to watch.
+        :param list properties: List of property paths to watch.
+        :param int wait: Max time in seconds to wait for changes if there are none yet.
+        :return: Tuple ({moId: (raw object, {property path: value})}, [moIds of removed objects]).
+        """
+        pc_vmodl = vmodl.query.PropertyCollector
+        with self._watchers_lock:
+            entry = self._watchers.get(key) or self._new_watch(key, obj_type, properties)
+            pc, view, version = entry
+        changed = {}
+        removed = []
+        partial = set()  # Paths of arrays changed by element, e.g. 'triggeredAlarmState["alarm-1.vm-2"]'
+        while True:
+            update = pc.WaitForUpdatesEx(version, pc_vmodl.WaitOptions(maxWaitSeconds=wait))
+            wait = 0
+            if update is None:
+                break
+            version = update.version
+            for fs in update.filterSet:
+                for el in fs.objectSet:
+                    if el.kind == 'leave':
+                        removed.append(el.obj._moId)
+                        changed.pop(el.obj._moId, None)
+                        continue
+                    props = changed.setdefault(el.obj._moId, (el.obj, {}))[1]
+                    for change in el.changeSet:
+                        path = change.name.split('[', 1)[0]
+                        if path != change.name:
+                            partial.add(path)
+                            props.setdefault(path, None)
+                        else:
+                            props[change.name] = change.val
+            if not update.truncated:
+                break
+        if partial:
+            # Fetch whole arrays changed by element
+            objects = [obj for obj, props in changed.values() if partial & set(props)]
+            found = self._retrieve_existing(list(partial), objects)
+            for obj, props in found:
+                target = changed[obj._moId][1]
+                for path in partial & set(target):
+                    target[path] = props.get(path)
+            # Removed meanwhile, reported by the next call
+            for moid in set(el._moId for el in objects) - set(obj._moId for obj, props in found):
+                changed.pop(moid, None)
+        with self._watchers_lock:
+            entry[2] = version
+        return changed, removed
+
+    def _new_watch(self, key, obj_type, properties):
+        """
+        Create PropertyCollector of the watch, see :meth:`_watch`. Must be called with watchers lock held.
+
+        :param str key: Name of the watch.
+        :param list obj_type: List of object's types to watch.
+        :param list properties: List of property paths to watch.
+        :return: List [PropertyCollector, ContainerView, version].
+        """
+        pc_vmodl = vmodl.query.PropertyCollector
+        pc = self.content.propertyCollector.CreatePropertyCollector()
+        view = self.content.viewManager.CreateContainerView(self.content.rootFolder, obj_type, True)
+        traverse = pc_vmodl.TraversalSpec(name='traverseView', path='view', skip=False, type=vim.view.ContainerView)
+        spec = pc_vmodl.FilterSpec(objectSet=[pc_vmodl.ObjectSpec(obj=view, skip=True, selectSet=[traverse])],
+                                   propSet=[pc_vmodl.PropertySpec(type=el, all=False, pathSet=properties)
+                                            for el in obj_type])
+        pc.CreateFilter(spec, True)
+        self._watchers[key] = [pc, view, '']
+        return self._watchers[key]
+
+    def _get_cached(self, obj_type, name):
+        """
+        Find objects by name using inventory cache.
+
+        :param list obj_type: List of object's types to find.
+        :param str name: The name or list of names of objects to find.
+        :return: List of (raw object, name) tuples.
+        """
+        names = [name] if isinstance(name, str) else list(name)
+        types = tuple(obj_type) if obj_type else (vim.ManagedEntity,)
+        for fresh in (False, True):
+            found = {}
+            for moid, el_name, el_type, _, _ in self._inventory.lookup(names):
+                cls = VmomiSupport.GetVmodlType(el_type)
+                if el_name not in found and issubclass(cls, types):
+                    found[el_name] = cls(moid, self.si._stub)
+            r = [(found[el], el) for el in names if el in found]
+            if fresh:
+                return r
+            if len(found) == len(set(names)):
+                try:
+                    actual = dict((obj._moId, props.get('name'))
+                                  for obj, props in self._retrieve(None, ['name'], objects=[el[0] for el in r]))
+                except vmodl.fault.ManagedObjectNotFound:
+                    actual = {}
+                if all(actual.get(obj._moId) == el_name for obj, el_name in r):
+                    return r
+            self.refresh_cache()
+
+    def _retrieve(self, obj_type, properties, root=None, recursive=True, objects=None, page_size=1000):
+        """
+        Fetch properties of many objects at once by PropertyCollector.
+
+        Objects are fetched by pages, so only single page is kept in memory.
+
+        :param list obj_type: List of object's types to fetch, e.g. [vim.VirtualMachine].
+        :param list properties: List of property paths, e.g. ['name', 'runtime.powerState'].
+        :param root: The folder to start looking from. Default 'si.content.rootFolder' used if not specified.
+        :param bool recursive: Find objects recursively or not.
+        :param list objects: Raw objects to fetch properties for. The 'obj_type' and 'root' are ignored if set.
+        :param int page_size: Max number of objects fetched per call.
+        :return: Generator of (raw object, {property path: value}) tuples. Unset properties are missing in dict.
+        """
+        vmodl_pc = vmodl.query.PropertyCollector
+        if objects is not None:
+            objects = [el.raw_obj if isinstance(el, BaseVCObject) else el for el in objects]
+            if not objects:
+                return
+            obj_set = [vmodl_pc.ObjectSpec(obj=el, skip=False) for el in objects]
+            for el in self._paged(list(set(type(el) for el in objects)), properties, obj_set, page_size):
+                yield el
+        else:
+            # The view is held until the last page is fetched, so it's not expired meanwhile
+            with self._view(obj_type, root, recursive) as view:
+                traverse = vmodl_pc.TraversalSpec(name='traverseView', path='view', skip=False,
+                                                  type=vim.view.ContainerView)
+                obj_set = [vmodl_pc.ObjectSpec(obj=view, skip=True, selectSet=[traverse])]
+                for el in self._paged(obj_type, properties, obj_set, page_size):
+                    yield el
+
+    def _paged(self, obj_type, properties, obj_set, page_size):
+        """
+        Fetch properties by pages, see :meth:`_retrieve`.
+
+        :param list obj_type: List of object's types to fetch.
+        :param list properties: List of property paths.
+        :param list obj_set: List of vmodl.query.PropertyCollector.ObjectSpec objects.
+        :param int page_size: Max number of objects fetched per call.
+        :return: Generator of (raw object, {property path: value}) tuples.
+        """
+        vmodl_pc = vmodl.query.PropertyCollector
+        prop_set = [vmodl_pc.PropertySpec(type=el, pathSet=properties, all=False) for el in obj_type]
+        spec = vmodl_pc.FilterSpec(objectSet=obj_set, propSet=prop_set)
+        pc = self.content.propertyCollector
+        result = None
+        try:
+            result = pc.RetrievePropertiesEx([spec], vmodl_pc.RetrieveOptions(maxObjects=page_size))
+            while result:
+                for el in result.objects:
+                    yield el.obj, dict((prop.name, prop.val) for prop in el.propSet)
+                if not result.token:
+                    break
+                result = pc.ContinueRetrievePropertiesEx(result.token)
+        finally:
+            if result and result.token:
+                pc.CancelRetrievePropertiesEx(result.token)
+
+    def _retrieve_existing(self, properties, objects):
+        """
+        Fetch properties of given objects, skipping objects removed meanwhile.
+
+        Single missing object fails the whole bulk call, so it's dropped and the call is repeated.
+
+        :param list properties: List of property paths.
+        :param list objects: Raw objects to fetch properties for.
+        :return: List of (raw object, {property path: value}) tuples of existing objects.
+        """
+        objects = list(objects)
+        while objects:
+            try:
+                return list(self._retrieve(None, properties, objects=objects))
+            except vmodl.fault.ManagedObjectNotFound as e:
+                missing = getattr(e.obj, '_moId', None)
+                left = [el for el in objects if el._moId != missing]
+                if len(left) == len(objects):  # Can't tell which one is missing
+                    raise
+                objects = left
+        return []
+
+    def _fetch_vms(self, vms, properties):
+        """
+        Fetch properties of many VMs by single bulk call.
+
+        :param list vms: VM names, vmjuggler.VirtualMachine or raw vim.VirtualMachine objects.
+        :param list properties: List of property paths. The 'name' is always fetched.
+        :return: Dict of {item of vms: (raw object, {property path: value})}. Not found VMs are missing.
+        """
+        properties = list(set(['name'] + properties))
+        names = [el for el in vms if isinstance(el, str)]
+        objects = [el for el in vms if not isinstance(el, str)]
+        r = {}
+        if names:
+            wanted = set(names)
+            for obj, props in self._retrieve([vim.VirtualMachine], properties):
+                if props.get('name') in wanted and props['name'] not in r:
+                    r[props['name']] = (obj, props)
+        if objects:
+            raw = dict((el.raw_obj._moId if isinstance(el, BaseVCObject) else el._moId, el) for el in objects)
+            for obj, props in self._retrieve_existing(properties, [el.raw_obj if isinstance(el, BaseVCObject) else el
+                                                                   for el in objects]):
+                r[raw[obj._moId]] = (obj, props)
+        return r
+
+    def export(self, obj_type, fields, path, fmt='csv', root=None, page_size=1000):
+        """
+        Export properties of all objects of given type to file.
+
+        Properties are fetched page by page in bulk and every page is written at once, so memory use
+        doesn't depend on inventory size. Data objects are flattened to "property.subproperty" columns,
+        managed objects are replaced by moId, see :func:`vmjuggler.export.flatten`.
+
+        :param obj_type: Object's type or list of types, e.g. vim.VirtualMachine.
+        :param list fields: List of property paths, e.g. ['name', 'runtime.powerState', 'config.hardware'].
+        :param str path: Output file path.
+        :param str fmt: Output format: 'csv', 'jsonl' or 'parquet'. Parquet requires "pyarrow" package.
+        :param root: The folder to start looking from.
+        :param int page_size: Number of objects fetched and written at once.
+        :return: Number of exported objects.
+        """
+        from .export import flatten, get_writer
+        obj_type = obj_type if isinstance(obj_type, list) else [obj_type]
+        writer = get_writer(path, fmt)
+        cnt = 0
+        page = []
+        try:
+            for obj, props in self._retrieve(obj_type, fields, root=root, page_size=page_size):
+                row = {'moid': obj._moId}
+                for field in fields:
+                    row.update(flatten(props.get(field), field))
+                page.append(row)
+                if len(page) == page_size:
+                    writer.write(page)
+                    cnt += len(page)
+                    page = []
+            writer.write(page)
+            cnt += len(page)
+        finally:
+            writer.close()
+        logging.info(f'Exported {cnt} objects to {path}')
+        return cnt
+
+    def fleet_table(self, fields=None, obj_type=vim.VirtualMachine, root=None, page_size=1000):
+        """
+        Fetch properties of all objects of given type to compact column-oriented table.
+
+        Properties are fetched page by page in bulk and stored in typed arrays right away, no wrapper objects
+        are created. Use the table to filter, group and sort the objects and :meth:`vmjuggler.fleet.FleetTable.objects`
+        to get vmjuggler objects for selected rows only.
+
+        :param list fields: List of property paths. Default is name, power state, host, CPU, memory and used storage
+                            of VMs. The 'name' is always fetched.
+        :param obj_type: Object's type, e.g. vim.HostSystem.
+        :param root: The folder to start looking from.
+        :param int page_size: Number of objects fetched at once.
+        :return: :class:`vmjuggler.fleet.FleetTable` object.
+        """
+        from .fleet import FleetTable
+        if fields is None:
+            fields = ['runtime.powerState', 'runtime.host', 'summary.config.numCpu', 'summary.config.memorySizeMB',
+                      'summary.storage.committed']
+        fields = ['name'] + [el for el in fields if el != 'name']
+        table = FleetTable.build(self._retrieve([obj_type], fields, root=root, page_size=page_size), fields,
+                                 stub=self.si._stub, obj_type=obj_type)
+        logging.info(f'Fetched {len(table)} objects to table, {table.nbytes} bytes')
+        return table
+
     @Decor.single_object
-    def get_vm(self, name=None, root=None, get_all=False, raw=False):
+    def get_vm(self, name=None, root=None, get_all=False, raw=False, attrs=None):
         """
         Get the VM by name or list of all VMs.
 
@@ -243,11 +1020,16 @@ class VCenter(object):
         :param str root: The folder to start looking from.
         :param bool get_all: The 'name' ignored and all objects of specified types are returned if set to True.
         :param bool raw: The raw objects will be returned if set otherwise 'vmjuggler.VirtualMachine' type.
+        :param dict attrs: Custom attributes to select VMs by, e.g. {'team': 'ci'}. VMs must match all of them
+                           and the 'name' if set. The 'root' and 'get_all' are ignored, see :meth:`refresh_attrs`.
         :return: List of objects.
         """
         obj_type = [vim.VirtualMachine]
         return_type = VirtualMachine
         return_type = self._get_return_type(return_type, raw)
+        if attrs is not None:
+            r = self._select_by_attrs(attrs, name)
+            return [return_type(el, name=n) for el, n in r] if return_type is not None else [el for el, n in r]
         obj_list = self._get_vc_objects(obj_type, root=root, name=name, get_all=get_all, return_type=return_type)
         return obj_list
 
@@ -370,6 +1152,740 @@ class VCenter(object):
         obj_list = self._get_vc_objects(obj_type, root=root, name=name, get_all=get_all, return_type=return_type)
         return obj_list
 
+    def run_in_guest(self, vms, program, arguments='', username=None, password=None, workers=10, **kwargs):
+        """
+        Run program inside guest OS of many VMs concurrently.
+
+        :param list vms: List of vmjuggler.VirtualMachine objects.
+        :param str program: Absolute path to the program.
+        :param str arguments: Program arguments.
+        :param str username: Guest OS user name.
+        :param str password: Guest OS user password.
+        :param int workers: Max number of VMs processed at the same time.
+        :param kwargs: Other arguments of :meth:`VirtualMachine.run`.
+        :return: Dict of {VM object passed: exit code}. Exit code is None if program failed to start or finish.
+        """
+        vms = list(vms)
+
+        def run(vm):
+            return vm.run(program, arguments=arguments, username=username, password=password, **kwargs)
+        r = dict(zip(vms, VMJHelper.parallel(run, vms, workers=workers)))
+        VMJHelper.log_stats(r, f'Program "{program}" run')
+        return r
+
+    def upload_to_guest(self, vms, local_path, guest_path, username=None, password=None, workers=10):
+        """
+        Upload local file to guest OS of many VMs concurrently.
+
+        :param list vms: List of vmjuggler.VirtualMachine objects.
+        :param str local_path: Path to the local file.
+        :param str guest_path: Absolute path to the file in guest OS.
+        :param str username: Guest OS user name.
+        :param str password: Guest OS user password.
+        :param int workers: Max number of VMs processed at the same time.
+        :return: Dict of {VM object passed: True on success, otherwise False}.
+        """
+        vms = list(vms)
+
+        def upload(vm):
+            return vm.upload(local_path, guest_path, username=username, password=password)
+        r = dict(zip(vms, VMJHelper.parallel(upload, vms, workers=workers)))
+        VMJHelper.log_stats(r, f'Upload of "{local_path}"')
+        return r
+
+    def walk_datastores(self, datastores, path='', pattern='*', cache=None, workers=8):
+        """
+        Walk through many datastores concurrently.
+
+        Entries are yielded as soon as any datastore returns them, so order between datastores is not defined.
+
+        :param list datastores: List of vmjuggler.Datastore objects.
+        :param str path: Folder to start from. Datastore root if empty.
+        :param str pattern: Shell-style pattern files should match, e.g. "*.vmdk".
+        :param vmjuggler.cache.ListingCache cache: Cache of previous listings.
+        :param int workers: Max number of datastores walked at the same time.
+        :return: Generator of (datastore name, DatastoreFile) tuples.
+        """
+        datastores = list(datastores)
+        if not datastores:
+            return
+        q = queue.Queue()
+        done = object()
+        stop = threading.Event()
+
+        def walk(ds):
+            try:
+                for el in ds.walk(path, pattern=pattern, cache=cache):
+                    if stop.is_set():
+                        break
+                    q.put((ds.name, el))
+            finally:
+                q.put(done)
+
+        pool = ThreadPool(min(workers, len(datastores)))
+        res = pool.map_async(walk, datastores, chunksize=1)
+        remaining = len(datastores)
+        try:
+            while remaining:
+                el = q.get()
+                if el is done:
+                    remaining -= 1
+                else:
+                    yield el
+            res.get()  # re-raise worker exception if any
+        finally:
+            stop.set()
+            pool.close()
+            pool.join()
+            if cache is not None:
+                cache.save()
+
+    @staticmethod
+    def _history_entity(entity, recursive):
+        """Build ByEntity part of history filter"""
+        if entity is None:
+            return None
+        entity = entity.raw_obj if isinstance(entity, BaseVCObject) else entity
+        recursion = 'all' if recursive else 'self'
+        return entity, recursion
+
+    @staticmethod
+    def _read_history(create, read, page_size, tail, poll_interval):
+        """
+        Create history collector, read it page by page and destroy it once done.
+
+        :param create: Function to create EventHistoryCollector or TaskHistoryCollector.
+        :param str read: Name of collector's method to read next page.
+        :param int page_size: Max number of items fetched per call.
+        :param bool tail: If set, wait for new items once all existing are read.
+        :param int poll_interval: Interval in seconds between polls for new items in tail mode.
+        :return: Generator of items.
+        """
+        collector = create()
+        try:
+            collector.RewindCollector()
+            while True:
+                page = getattr(collector, read)(page_size)
+                if page:
+                    for el in page:
+                        yield el
+                elif tail:
+                    time.sleep(poll_interval)
+                else:
+                    break
+        finally:
+            collector.DestroyCollector()
+
+    def iter_events(self, entity=None, begin=None, end=None, event_types=None, recursive=True, page_size=100,
+                    tail=False, poll_interval=5):
+        """
+        Iterate over events from VCenter event history.
+
+        Events are fetched by pages, so only single page is kept in memory.
+        The history collector is destroyed once iteration finished or generator is closed.
+
+        :param entity: Object to get events for, e.g. vmjuggler.VirtualMachine or vmjuggler.Host. All if not set.
+        :param datetime begin: Fetch events created after this time.
+        :param datetime end: Fetch events created before this time.
+        :param list event_types: List of event type names to fetch, e.g. ['VmPoweredOnEvent'].
+        :param bool recursive: If set, events of entity's children are fetched too.
+        :param int page_size: Max number of events fetched per call. Not more than 1000.
+        :param bool tail: If set, wait for new events once all existing are read. Generator never ends.
+        :param int poll_interval: Interval in seconds between polls for new events in tail mode.
+        :return: Generator of vim.event.Event objects from the oldest to the newest.
+        """
+        spec = vim.event.EventFilterSpec()
+        by_entity = self._history_entity(entity, recursive)
+        if by_entity:
+            spec.entity = vim.event.EventFilterSpec.ByEntity(entity=by_entity[0], recursion=by_entity[1])
+        if begin or end:
+            spec.time = vim.event.EventFilterSpec.ByTime(beginTime=begin, endTime=end)
+        if event_types:
+            spec.eventTypeId = event_types
+        create = lambda: self.content.eventManager.CreateCollectorForEvents(spec)
+        return self._read_history(create, 'ReadNextEvents', page_size, tail, poll_interval)
+
+    def iter_tasks(self, entity=None, begin=None, end=None, states=None, recursive=True, page_size=100,
+                   tail=False, poll_interval=5):
+        """
+        Iterate over tasks from VCenter task history.
+
+        Tasks are fetched by pages, so only single page is kept in memory.
+        The history collector is destroyed once iteration finished or generator is closed.
+
+        :param entity: Object to get tasks for, e.g. vmjuggler.VirtualMachine or vmjuggler.Host. All if not set.
+        :param datetime begin: Fetch tasks queued after this time.
+        :param datetime end: Fetch tasks queued before this time.
+        :param list states: List of task states to fetch, e.g. ['error'].
+        :param bool recursive: If set, tasks of entity's children are fetched too.
+        :param int page_size: Max number of tasks fetched per call. Not more than 1000.
+        :param bool tail: If set, wait for new tasks once all existing are read. Generator never ends.
+        :param int poll_interval: Interval in seconds between polls for new tasks in tail mode.
+        :return: Generator of vim.TaskInfo objects from the oldest to the newest.
+        """
+        spec = vim.TaskFilterSpec()
+        by_entity = self._history_entity(entity, recursive)
+        if by_entity:
+            spec.entity = vim.TaskFilterSpec.ByEntity(entity=by_entity[0], recursion=by_entity[1])
+        if begin or end:
+            spec.time = vim.TaskFilterSpec.ByTime(timeType='queuedTime', beginTime=begin, endTime=end)
+        if states:
+            spec.state = states
+        create = lambda: self.content.taskManager.CreateCollectorForTasks(spec)
+        return self._read_history(create, 'ReadNextTasks', page_size, tail, poll_interval)
+
+    def reconfigure(self, vms, workers=10, deadline=None, **changes):
+        """
+        Reconfigure many VMs.
+
+        The config spec is built once. Current configuration of all VMs is fetched by single bulk call
+        and VMs which already have desired configuration are skipped. Changes are applied concurrently.
+        Device changes can't be compared, so VMs are never skipped if 'device_changes' is passed.
+
+        :param list vms: VM names or vmjuggler.VirtualMachine objects.
+        :param int workers: Max number of VMs reconfigured at the same time.
+        :param float deadline: Max time in seconds for the whole batch. Not finished tasks are cancelled if possible.
+        :param changes: Changes, see :meth:`VirtualMachine.reconfigure`.
+        :return: Dict of {item of vms: True on success, False on failure, None if skipped or deadline expired}.
+                 :class:`vmjuggler.helpers.TaskResult` instead of True/False if :attr:`VMJHelper.task_results` is set.
+        """
+        vms = list(vms)
+        end = VMJHelper.deadline(deadline)
+        spec = VirtualMachine._config_spec(**changes)
+        props = [VirtualMachine._reconfig_props[el] for el in changes if el in VirtualMachine._reconfig_props]
+        actual = self._fetch_vms(vms, props)
+        r = {}
+        keys = []
+        todo = []
+        for key in vms:
+            if key not in actual:
+                logging.info(f'VM "{key if isinstance(key, str) else key.name}" not found')
+                r[key] = VMJHelper.result(False, fault='NotFound')
+            elif VirtualMachine._config_matches(actual[key][1], changes):
+                r[key] = None
+            else:
+                keys.append(key)
+                todo.append(VirtualMachine(actual[key][0], name=actual[key][1]['name']))
+
+        def reconfigure(vm):
+            return VMJHelper.outcome(vm._reconfigure(spec, timeout=VMJHelper.remaining(end)))
+
+        results = VMJHelper.parallel(reconfigure, todo, workers=workers)
+        r.update(zip(keys, results))
+        logging.info(f'Reconfigured {len(todo)} VMs, {len(vms) - len(todo)} skipped or not found')
+        VMJHelper.log_stats(r, 'Reconfiguration')
+        return r
+
+    def migrate(self, vms, target_host=None, target_datastore=None, host_limit=4, datastore_limit=8, workers=32,
+                deadline=None, on_progress=None):
+        """
+        Migrate many VMs by vMotion and/or Storage vMotion.
+
+        Placement of VMs and capacity of targets are fetched by bulk calls and the whole plan is built before
+        the first migration starts. If several targets are given, every VM goes to the host with most free memory
+        or to the datastore with most free space, counting VMs already planned there. Only hosts with free memory
+        for the whole VM memory are chosen. VMs which are already on one of the targets are skipped.
+        Migrations run concurrently, but not more than 'host_limit' at once per source or target host
+        and not more than 'datastore_limit' Storage vMotions per source or target datastore.
+
+        :param list vms: VM names, vmjuggler.VirtualMachine or raw vim.VirtualMachine objects.
+        :param target_host: Host name, vmjuggler.Host object or list of them. Host isn't changed if not specified.
+        :param target_datastore: Datastore name, vmjuggler.Datastore object or list of them.
+                                 Storage isn't changed if not specified.
+        :param int host_limit: Max number of concurrent migrations per host.
+        :param int datastore_limit: Max number of concurrent Storage vMotions per datastore.
+        :param int workers: Max number of concurrent migrations in total.
+        :param float deadline: Max time in seconds for the whole batch. Not finished tasks are cancelled if possible.
+        :param on_progress: Callback function called with (VM name, result) once every migration is finished.
+        :return: Dict of {item of vms: True on success, False on failure, None if skipped or deadline expired}.
+                 :class:`vmjuggler.helpers.TaskResult` instead of True/False if :attr:`VMJHelper.task_results` is set.
+        """
+        vms = list(vms)
+        end = VMJHelper.deadline(deadline)
+
+        def as_list(value, obj_type):
+            value = value if isinstance(value, (list, tuple)) else [value] if value is not None else []
+            return [self._raw_arg(el, obj_type) for el in value]
+
+        hosts = as_list(target_host, vim.HostSystem)
+        datastores = as_list(target_datastore, vim.Datastore)
+        actual = self._fetch_vms(vms, ['runtime.host', 'datastore', 'summary.config.memorySizeMB',
+                                       'summary.storage.committed'])
+
+        host_free = {}
+        host_parent = {}
+        sources = set(props['runtime.host'] for obj, props in actual.values() if props.get('runtime.host'))
+        for obj, props in self._retrieve(None, ['parent', 'summary.hardware.memorySize',
+                                                'summary.quickStats.overallMemoryUsage', 'runtime.connectionState',
+                                                'runtime.inMaintenanceMode'], objects=list(sources) + hosts):
+            host_parent[obj] = props.get('parent')
+            if obj in hosts and props.get('runtime.connectionState') == vim.HostSystem.ConnectionState.connected \
+                    and not props.get('runtime.inMaintenanceMode'):
+                used = (props.get('summary.quickStats.overallMemoryUsage') or 0) * 1024 * 1024
+                host_free[obj] = (props.get('summary.hardware.memorySize') or 0) - used
+        ds_free = {}
+        for obj, props in self._retrieve(None, ['summary.freeSpace', 'summary.accessible', 'summary.maintenanceMode'],
+                                         objects=datastores):
+            if props.get('summary.accessible') and props.get('summary.maintenanceMode', 'normal') == 'normal':
+                ds_free[obj] = props.get('summary.freeSpace') or 0
+
+        r = {}
+        plan = []
+        # The biggest VMs are placed first while there is the most room to choose from
+        order = sorted(vms, key=lambda el: -(actual[el][1].get('summary.config.memorySizeMB') or 0)
+                       if el in actual else 0)
+        pools = {}
+        for key in order:
+            if key not in actual:
+                name = key if isinstance(key, str) else key.name
+                logging.info(f'VM "{name}" not found')
+                r[key] = VMJHelper.result(False, fault='NotFound')
+                continue
+            obj, props = actual[key]
+            name = props['name']
+            source = props.get('runtime.host')
+            host = datastore = pool = None
+            if hosts and source not in hosts:
+                memory = (props.get('summary.config.memorySizeMB') or 0) * 1024 * 1024
+                fits = [el for el in host_free if host_free[el] >= memory]
+                if not fits:
+                    logging.info(f'Not enough free memory on target hosts for VM "{name}"')
+                    r[key] = VMJHelper.result(False, fault='InsufficientResourcesFault')
+                    continue
+                host = max(fits, key=host_free.get)
+                host_free[host] -= memory
+                if host_parent.get(host) != host_parent.get(source):
+                    if host not in pools:
+                        pools[host] = host_parent[host].resourcePool
+                    pool = pools[host]
+            if datastores and not set(props.get('datastore') or []) <= set(datastores):
+                size = props.get('summary.storage.committed') or 0
+                fits = [el for el in ds_free if ds_free[el] >= size]
+                if not fits:
+                    logging.info(f'Not enough free space on target datastores for VM "{name}"')
+                    r[key] = VMJHelper.result(False, fault='InsufficientResourcesFault')
+                    continue
+                datastore = max(fits, key=ds_free.get)
+                ds_free[datastore] -= size
+            if host is None and datastore is None:
+                r[key] = None
+                continue
+            resources = [('host', el._moId) for el in (source, host) if el is not None]
+            if datastore is not None:
+                resources += [('datastore', el._moId) for el in list(props.get('datastore') or []) + [datastore]]
+            plan.append((key, VirtualMachine(obj, name=name),
+                         vim.vm.RelocateSpec(host=host, datastore=datastore, pool=pool), resources))
+        logging.info(f'Migrating {len(plan)} VMs, {len(vms) - len(plan)} skipped or failed to plan')
+
+        lock = threading.Lock()
+        done = [0]
+
+        def migrate(item):
+            _, vm, spec, _ = item
+            result = VMJHelper.outcome(vm._relocate(spec, timeout=VMJHelper.remaining(end)))
+            with lock:
+                done[0] += 1
+                logging.info(f'Migration of VM "{vm.name}" finished ({done[0]}/{len(plan)})')
+            if on_progress is not None:
+                on_progress(vm.name, result)
+            return result
+
+        results = VMJHelper.schedule(migrate, plan, keys=lambda item: item[3],
+                                     limits={'host': host_limit, 'datastore': datastore_limit}, workers=workers)
+        r.update(zip([el[0] for el in plan], results))
+        VMJHelper.log_stats(r, 'Migration')
+        return r
+
+    def network_index(self):
+        """
+        Build index of all networks.
+
+        Networks, distributed port groups, distributed switches and port groups of standard switches are fetched
+        by four bulk calls regardless of inventory size.
+        VLAN of standard port group is taken from the first host which has it.
+
+        :return: :class:`vmjuggler.netindex.NetworkIndex` object.
+        """
+        from .netindex import NetworkIndex, NetworkInfo
+        switches = dict((obj._moId, props) for obj, props in self._retrieve([vim.DistributedVirtualSwitch],
+                                                                            ['name', 'uuid']))
+        portgroups = dict((obj._moId, props) for obj, props in self._retrieve(
+            [vim.dvs.DistributedVirtualPortgroup], ['key', 'config.distributedVirtualSwitch', 'config.defaultPortConfig']))
+        vlans = {}
+        for obj, props in self._retrieve([vim.HostSystem], ['config.network.portgroup']):
+            for el in props.get('config.network.portgroup') or []:
+                vlans.setdefault(el.spec.name, el.spec.vlanId)
+        networks = []
+        for obj, props in self._retrieve([vim.Network], ['name', 'vm', 'host']):
+            key = dvs_uuid = dvs_name = None
+            vlan = vlans.get(props.get('name'))
+            if obj._moId in portgroups:
+                pg = portgroups[obj._moId]
+                key = pg.get('key')
+                dvs = pg.get('config.distributedVirtualSwitch')
+                dvs_uuid = switches.get(dvs._moId, {}).get('uuid') if dvs else None
+                dvs_name = switches.get(dvs._moId, {}).get('name') if dvs else None
+                vlan_spec = getattr(pg.get('config.defaultPortConfig'), 'vlan', None)
+                vlan = vlan_spec.vlanId if isinstance(vlan_spec, vim.dvs.VmwareDistributedVirtualSwitch.VlanIdSpec) \
+                    else None
+            networks.append(NetworkInfo(obj._moId, props.get('name'), type(obj).__name__, obj, key, dvs_uuid, dvs_name,
+                                        vlan, [el._moId for el in props.get('vm') or []],
+                                        [el._moId for el in props.get('host') or []]))
+        logging.info(f'Indexed {len(networks)} networks')
+        return NetworkIndex(networks)
+
+    def move_nics(self, vms, from_net, to_net, workers=10, deadline=None):
+        """
+        Reconnect NICs of many VMs from one network to another.
+
+        Devices of all VMs are fetched by single bulk call, VMs are reconfigured concurrently.
+        Both standard networks and distributed port groups are supported as source and target.
+
+        :param list vms: VM names, vmjuggler.VirtualMachine or raw vim.VirtualMachine objects.
+        :param from_net: Network name, vmjuggler.Network or raw object to move NICs from.
+        :param to_net: Network name, vmjuggler.Network or raw object to move NICs to.
+        :param int workers: Max number of VMs reconfigured at the same time.
+        :param float deadline: Max time in seconds for the whole batch. Not finished tasks are cancelled if possible.
+        :return: Dict of {item of vms: True on success, False on failure, None if VM has no NICs in 'from_net'
+                 or deadline expired}.
+        """
+        vms = list(vms)
+        end = VMJHelper.deadline(deadline)
+        nets = [self._raw_arg(from_net, vim.Network), self._raw_arg(to_net, vim.Network)]
+        info = dict((obj._moId, props) for obj, props in self._retrieve(None, ['name'], objects=nets))
+        dv_nets = [el for el in nets if isinstance(el, vim.dvs.DistributedVirtualPortgroup)]
+        for obj, props in self._retrieve(None, ['key', 'config.distributedVirtualSwitch'], objects=dv_nets):
+            info[obj._moId].update(props)
+        source, target = [info[el._moId] for el in nets]
+        nic_backing = vim.vm.device.VirtualEthernetCard
+        if isinstance(nets[1], vim.dvs.DistributedVirtualPortgroup):
+            port = vim.dvs.PortConnection(portgroupKey=target['key'],
+                                          switchUuid=target['config.distributedVirtualSwitch'].uuid)
+            backing = nic_backing.DistributedVirtualPortBackingInfo(port=port)
+        else:
+            backing = nic_backing.NetworkBackingInfo(network=nets[1], deviceName=target['name'])
+
+        def attached(nic):
+            if isinstance(nic.backing, nic_backing.DistributedVirtualPortBackingInfo):
+                return nic.backing.port.portgroupKey == source.get('key')
+            if isinstance(nic.backing, nic_backing.NetworkBackingInfo):
+                return nic.backing.network == nets[0] or nic.backing.deviceName == source['name']
+            return False
+
+        actual = self._fetch_vms(vms, ['config.hardware.device'])
+        r = {}
+        keys = []
+        todo = []
+        for key in vms:
+            if key not in actual:
+                logging.info(f'VM "{key if isinstance(key, str) else key.name}" not found')
+                r[key] = VMJHelper.result(False, fault='NotFound')
+                continue
+            obj, props = actual[key]
+            changes = []
+            for dev in props.get('config.hardware.device') or []:
+                if isinstance(dev, vim.vm.device.VirtualEthernetCard) and attached(dev):
+                    dev.backing = backing
+                    changes.append(vim.vm.device.VirtualDeviceSpec(
+                        operation=vim.vm.device.VirtualDeviceSpec.Operation.edit, device=dev))
+            if changes:
+                keys.append(key)
+                todo.append((VirtualMachine(obj, name=props['name']), vim.vm.ConfigSpec(deviceChange=changes)))
+            else:
+                r[key] = None
+
+        def move(item):
+            vm, spec = item
+            return VMJHelper.outcome(vm._reconfigure(spec, timeout=VMJHelper.remaining(end)))
+
+        results = VMJHelper.parallel(move, todo, workers=workers)
+        r.update(zip(keys, results))
+        logging.info(f'NICs moved for {len(todo)} VMs, {len(vms) - len(todo)} skipped or not found')
+        VMJHelper.log_stats(r, 'NIC move')
+        return r
+
+    def snapshot_report(self, root=None):
+        """
+        Return age, depth and on-disk size of all VM snapshots.
+
+        Snapshot trees and disk layouts are fetched by two bulk calls for all VMs, the first finds VMs
+        which have snapshots and the second fetches disk layout of those VMs only.
+        Snapshot size is size of its memory/state files plus disk files added to the chain after parent snapshot,
+        or after base disks for the root snapshot. Disk files written since the current snapshot was taken
+        are counted to the current snapshot, so removing it frees about its size.
+
+        :param root: The folder to start looking from.
+        :return: List of dicts with "vm", "vm_moid", "snapshot", "snapshot_moid", "parent_moid", "created",
+                 "age_days", "depth", "size_bytes", "datastore" and "current" keys.
+        """
+        trees = dict((obj._moId, (obj, props)) for obj, props in
+                     self._retrieve([vim.VirtualMachine], ['name', 'snapshot'], root=root) if props.get('snapshot'))
+        layouts = dict((obj._moId, props.get('layoutEx')) for obj, props in
+                       self._retrieve(None, ['layoutEx'], objects=[el[0] for el in trees.values()]))
+        rows = []
+        for moid, (obj, props) in trees.items():
+            layout = layouts.get(moid)
+            files = dict((el.key, el) for el in layout.file) if layout else {}
+            snap_layouts = dict((el.key._moId, el) for el in layout.snapshot) if layout else {}
+            current = props['snapshot'].currentSnapshot._moId if props['snapshot'].currentSnapshot else None
+
+            def chain(snap_moid):
+                sl = snap_layouts.get(snap_moid)
+                return set(key for disk in sl.disk for unit in disk.chain for key in unit.fileKey) if sl else set()
+
+            disks = layout.disk if layout else []
+            base = set(key for disk in disks if disk.chain for key in disk.chain[0].fileKey)
+            running = set(key for disk in disks for unit in disk.chain for key in unit.fileKey)
+            running -= set().union(*[chain(el) for el in snap_layouts])  # Deltas written since current snapshot
+
+            def walk(tree_list, depth, parent):
+                for el in tree_list:
+                    snap_moid = el.snapshot._moId
+                    sl = snap_layouts.get(snap_moid)
+                    own = set([sl.dataKey, sl.memoryKey]) if sl else set()
+                    own |= chain(snap_moid) - (chain(parent) if parent else base)
+                    if snap_moid == current:
+                        own |= running
+                    own = [files[key] for key in own if key in files]
+                    data_file = files.get(sl.dataKey) if sl else None
+                    age = datetime.datetime.now(el.createTime.tzinfo) - el.createTime
+                    rows.append({'vm': props['name'],
+                                 'vm_moid': moid,
+                                 'snapshot': el.name,
+                                 'snapshot_moid': snap_moid,
+                                 'parent_moid': parent,
+                                 'created': el.createTime,
+                                 'age_days': age.total_seconds() / 86400,
+                                 'depth': depth,
+                                 'size_bytes': sum(f.size or 0 for f in own),
+                                 'datastore': data_file.name[1:data_file.name.index(']')] if data_file else None,
+                                 'current': snap_moid == current})
+                    walk(el.childSnapshotList, depth + 1, snap_moid)
+
+            walk(props['snapshot'].rootSnapshotList, 1, None)
+        return rows
+
+    def cleanup_snapshots(self, older_than_days, per_datastore=2, consolidate=True, dry_run=False, workers=10,
+                          root=None, deadline=None):
+        """
+        Remove snapshots older than given age.
+
+        Snapshots of the same VM are removed one by one from the oldest. Number of VMs cleaned up at the same
+        time on single datastore is limited by 'per_datastore', so consolidation doesn't overload the storage.
+
+        :param float older_than_days: Remove snapshots created earlier than this number of days ago.
+        :param int per_datastore: Max number of VMs cleaned up at the same time on single datastore.
+        :param bool consolidate: If set, disk images will be consolidated after snapshot removed.
+        :param bool dry_run: If set, nothing is removed, only the list of snapshots to remove is returned.
+        :param int workers: Max number of VMs cleaned up at the same time overall.
+        :param root: The folder to start looking from.
+        :param float deadline: Max time in seconds for the whole cleanup. Not finished tasks are cancelled if possible.
+        :return: List of dicts with "vm", "snapshot", "datastore", "size_bytes" and "result" keys.
+                 The "result" is None in dry run mode or if deadline expired.
+        """
+        end = VMJHelper.deadline(deadline)
+        by_vm = {}
+        for el in self.snapshot_report(root=root):
+            if el['age_days'] > older_than_days:
+                by_vm.setdefault(el['vm_moid'], []).append(el)
+        jobs = [sorted(el, key=lambda x: x['created']) for el in by_vm.values()]
+        limits = dict((el[0]['datastore'], threading.BoundedSemaphore(per_datastore)) for el in jobs)
+
+        def cleanup(snaps):
+            r = []
+            with limits[snaps[0]['datastore']]:
+                for el in snaps:
+                    res = None
+                    if not dry_run:
+                        logging.info(f'Removing snapshot "{el["snapshot"]}" of VM "{el["vm"]}"...')
+                        task = vim.vm.Snapshot(el['snapshot_moid'], self.si._stub).RemoveSnapshot_Task
+                        res = VMJHelper.outcome(VMJHelper.do_task(task, catch_exception=[vim.fault.TaskInProgress],
+                                                     show_progress=False, timeout=VMJHelper.remaining(end),
+                                                     removeChildren=False,
+                                                     consolidate=consolidate))
+                    r.append({'vm': el['vm'], 'snapshot': el['snapshot'], 'datastore': el['datastore'],
+                              'size_bytes': el['size_bytes'], 'result': res})
+            if not dry_run:
+                # The VM is counted once by progress tracker, so failed removal must not be hidden by the next one
+                progress.report(next((el['result'] for el in r if el['result'] is None or not el['result']
+                                      or getattr(el['result'], 'timed_out', False)), True))
+            return r
+
+        report = [el for r in VMJHelper.parallel(cleanup, jobs, workers=workers) for el in r]
+        VMJHelper.log_stats(report, 'Snapshot removal')
+        return report
+
+    def reconcile_power(self, desired, shutdown_timeout=300, poll_interval=5, workers=10, deadline=None):
+        """
+        Bring VMs to desired power states.
+
+        Actual states of all VMs are fetched by single bulk call and only VMs which state differs are touched.
+        Transitions are run concurrently. Powered on VMs are shut down gracefully first and powered off
+        if guest OS doesn't stop within 'shutdown_timeout' or VMware Tools are not available.
+
+        :param dict desired: Dict of {VM name or vmjuggler.VirtualMachine: "poweredOn", "poweredOff" or "suspended"}.
+        :param int shutdown_timeout: Max time in seconds to wait for guest OS shutdown.
+        :param int poll_interval: Interval in seconds between power state checks during shutdown.
+        :param int workers: Max number of concurrent transitions.
+        :param float deadline: Max time in seconds for the whole batch. Result of expired transitions is None.
+        :return: List of changes. Every change is dict with "vm", "from", "to", "action" and "result" keys.
+        """
+        states = (vim.VirtualMachine.PowerState.poweredOn, vim.VirtualMachine.PowerState.poweredOff,
+                  vim.VirtualMachine.PowerState.suspended)
+        end = VMJHelper.deadline(deadline)
+        actual = self._fetch_vms(list(desired), ['runtime.powerState'])
+        report = []
+        todo = []
+        for key, target in desired.items():
+            name = key if isinstance(key, str) else key.name
+            if target not in states:
+                raise ValueError(f'Unknown power state "{target}" for VM "{name}"')
+            if key not in actual:
+                report.append({'vm': name, 'from': None, 'to': target, 'action': None,
+                               'result': VMJHelper.result(False, fault='NotFound')})
+                logging.info(f'VM "{name}" not found')
+                continue
+            obj, props = actual[key]
+            state = props.get('runtime.powerState')
+            if state != target:
+                todo.append((VirtualMachine(obj, name=props['name']), state, target))
+
+        def transit(item):
+            vm, state, target = item
+            started = datetime.datetime.utcnow()
+            r = {'vm': vm.name, 'from': state, 'to': target, 'action': None, 'result': False}
+            if target == vim.VirtualMachine.PowerState.poweredOn:
+                r['action'] = 'power_on'
+                r['result'] = VMJHelper.outcome(vm.power_on(timeout=VMJHelper.remaining(end)))
+            elif target == vim.VirtualMachine.PowerState.suspended:
+                r['action'] = 'suspend'
+                if state == vim.VirtualMachine.PowerState.poweredOn:
+                    r['result'] = VMJHelper.outcome(vm.suspend(timeout=VMJHelper.remaining(end)))
+                else:
+                    logging.info(f'VM "{vm.name}" can\'t be suspended from "{state}" state')
+                    r['result'] = VMJHelper.result(False, fault='InvalidPowerState')
+            elif state == vim.VirtualMachine.PowerState.poweredOn and vm.shutdown():
+                r['action'] = 'shutdown'
+                left = VMJHelper.remaining(end)
+                wait_end = time.time() + (shutdown_timeout if left is None else min(shutdown_timeout, left))
+                while time.time() < wait_end:
+                    if vm.state == vim.VirtualMachine.PowerState.poweredOff:
+                        r['result'] = VMJHelper.result(True, started=started)
+                        return r
+                    time.sleep(poll_interval)
+                logging.info(f'VM "{vm.name}" is not shut down in {shutdown_timeout}s, powering off')
+                r['action'] = 'power_off'
+                r['result'] = VMJHelper.outcome(vm.power_off(timeout=VMJHelper.remaining(end)))
+            else:
+                r['action'] = 'power_off'
+                r['result'] = VMJHelper.outcome(vm.power_off(timeout=VMJHelper.remaining(end)))
+            return r
+
+        report.extend(VMJHelper.parallel(transit, todo, workers=workers))
+        logging.info(f'Reconciled {len(desired)} VMs, {len(todo)} changes')
+        VMJHelper.log_stats(report, 'Power state change')
+        return report
+
+    def _raw_arg(self, value, obj_type):
+        """
+        Turn argument given as name or vmjuggler object to raw object.
+
+        :param value: Object name, vmjuggler object or raw object.
+        :param obj_type: Type of the object to find by name.
+        :return: Raw object or None if value is None.
+        :raise: ValueError if object is not found by name.
+        """
+        if isinstance(value, BaseVCObject):
+            return value.raw_obj
+        if isinstance(value, str):
+            r = self._get_vc_objects([obj_type], name=value, get_all=False)
+            if not r:
+                raise ValueError(f'{obj_type.__name__} "{value}" not found')
+            return r[0]
+        return value
+
+    def import_ovf(self, src, datastore, name=None, host=None, folder=None, resource_pool=None, network_map=None,
+                   disk_provisioning=None, workers=4):
+        """
+        Import VM from OVF package or OVA archive.
+
+        Disks are streamed concurrently over pooled connections straight from the package files,
+        '.ova' is never extracted. The lease is kept alive by progress updates during transfer.
+
+        :param str src: Path to the '.ovf' or '.ova' file.
+        :param datastore: Datastore name or vmjuggler.Datastore object to place VM on.
+        :param str name: VM name. Default name from the descriptor used if not specified.
+        :param host: Host name or vmjuggler.Host object. Any connected host of the datastore used if not specified.
+        :param folder: Folder name or vmjuggler.Folder object. VM folder of the datastore's datacenter used
+                       if not specified.
+        :param resource_pool: vmjuggler.VApp object or raw vim.ResourcePool. Root resource pool of the host used
+                              if not specified.
+        :param dict network_map: Dict of {network name in descriptor: network name or vmjuggler.Network object}.
+        :param str disk_provisioning: Disk provisioning type, e.g. 'thin'. Taken from descriptor if not specified.
+        :param int workers: Max number of files uploaded at the same time.
+        :return: vmjuggler.VirtualMachine object on success, otherwise None.
+        """
+        from .ovf import NfcLease, OvfSource
+        from .transfer import HttpTransfer, TransferError
+        logging.info(f'Importing "{src}"...')
+        try:
+            source = OvfSource(src)
+            descriptor = source.descriptor
+            ds = self._raw_arg(datastore, vim.Datastore)
+            host = self._raw_arg(host, vim.HostSystem)
+            if host is None:
+                hosts = [el.key for el in ds.host if el.mountInfo.accessible and
+                         el.key.runtime.connectionState == vim.HostSystem.ConnectionState.connected]
+                if not hosts:
+                    raise ValueError(f'No connected hosts for Datastore "{ds.name}"')
+                host = hosts[0]
+            folder = self._raw_arg(folder, vim.Folder)
+            if folder is None:
+                dc = ds.parent
+                while not isinstance(dc, vim.Datacenter):
+                    dc = dc.parent
+                folder = dc.vmFolder
+            pool = self._raw_arg(resource_pool, vim.ResourcePool) or host.parent.resourcePool
+            om = self.content.ovfManager
+            if name is None:
+                name = om.ParseDescriptor(descriptor, vim.OvfManager.ParseDescriptorParams()).defaultEntityName
+            mapping = [vim.OvfManager.NetworkMapping(name=k, network=self._raw_arg(v, vim.Network))
+                       for k, v in (network_map or {}).items()]
+            params = vim.OvfManager.CreateImportSpecParams(entityName=name, hostSystem=host, networkMapping=mapping,
+                                                           diskProvisioning=disk_provisioning)
+            spec = om.CreateImportSpec(descriptor, pool, ds, params)
+            if spec.error:
+                raise spec.error[0]
+            for el in spec.warning or []:
+                logging.info(f'Warning: {el.msg}')
+            items = spec.fileItem or []
+            addr = self._address
+
+            with NfcLease(pool.ImportVApp(spec.importSpec, folder, host),
+                          total=sum(source.size(el.path) for el in items)) as lease:
+                urls = dict((el.importKey, el.url) for el in lease.info.deviceUrl)
+
+                def send(item):
+                    headers = {'Content-Type': 'application/x-vnd.vmware-streamVmdk'} \
+                        if item.path.lower().endswith('.vmdk') else None
+                    f, size = source.open(item.path)
+                    with f:
+                        HttpTransfer.upload_stream(HttpTransfer.fix_host(urls[item.deviceId], addr), f, size,
+                                                   cookie=self.si._stub.cookie.split(';')[0],
+                                                   method='PUT' if item.create else 'POST',
+                                                   headers=headers, progress=lease.add)
+
+                VMJHelper.parallel(send, items, workers=workers)
+                vm = lease.info.entity
+            logging.info(f'VM "{name}" imported')
+            return VirtualMachine(vm, name=name)
+        except vmodl.MethodFault as e:
+            logging.info(f'Error: {e.msg}')
+            return None
+        except (ValueError, KeyError, TransferError, IOError, OSError) as e:
+            logging.info(f'Error: {e}')
+            return None
+
     def create_vm(self):
         """
         Create new VM.
@@ -385,14 +1901,16 @@ class BaseVCObject(object):
     Base object for vmjuggler objects.
 
     :param vc_object: Raw VMWare ManagedObject
+    :param str name: Object's name if already known, fetched from VCenter otherwise.
     """
 
     _raw_obj = None  #: Raw object. Populated once instance created.
     _name = None  #: Object's name. Populated once instance created.
+    _content = None  #: ServiceContent of VCenter the object belongs to. Populated on first use.
 
-    def __init__(self, vc_object):
+    def __init__(self, vc_object, name=None):
         self._raw_obj = vc_object
-        self._name = vc_object.name
+        self._name = name if name is not None else vc_object.name
         self._ex = [vmodl.RuntimeFault]  # To keep common catchable exceptions
 
     @property
@@ -405,7 +1923,45 @@ class BaseVCObject(object):
         """Object's name. Populated once instance created."""
         return self._name
 
-    def _do(self, task, catch_exception=None):
+    @property
+    def ref(self):
+        """Picklable reference to the object, see :class:`vmjuggler.refs.ObjectRef`."""
+        return ObjectRef(self.raw_obj._moId, type(self.raw_obj).__name__, self.raw_obj._stub.host.rsplit(':', 1)[0])
+
+    @property
+    def content(self):
+        """ServiceContent of VCenter the object belongs to."""
+        if self._content is None:
+            self._content = vim.ServiceInstance('ServiceInstance', self.raw_obj._stub).RetrieveContent()
+        return self._content
+
+    @contextmanager
+    def _vc(self):
+        """
+        VCenter object sharing connection with the object. Used to run bulk operations.
+
+        Container views created by the VCenter object are destroyed on exit of 'with' block.
+        """
+        vc = VCenter(self.raw_obj._stub.host.rsplit(':', 1)[0], None, None)
+        vc.si = vim.ServiceInstance('ServiceInstance', self.raw_obj._stub)
+        vc.content = self.content
+        vc._attached = True
+        try:
+            yield vc
+        finally:
+            vc._destroy_views()
+
+    @property
+    def _cookie(self):
+        """VCenter session cookie to use for HTTP requests."""
+        return self.raw_obj._stub.cookie.split(';')[0]
+
+    @property
+    def _http_host(self):
+        """VCenter address in form host:port."""
+        return self.raw_obj._stub.host
+
+    def _do(self, task, catch_exception=None, **kwargs):
         """
         Execute task and catch passed exceptions.
 
@@ -413,15 +1969,12 @@ class BaseVCObject(object):
 
         :param vim.Task task: The method to execute.
         :param list catch_exception: List of possible exceptions to catch.
-        :return: True on success, False if any listed exception occurred
+        :param kwargs: Method arguments.
+        :return: True on success, False if any listed exception occurred.
+                 :class:`vmjuggler.helpers.TaskResult` if :attr:`VMJHelper.task_results` is set.
         """
         ex = tuple(set(self._ex + catch_exception)) if isinstance(catch_exception, list) else tuple(self._ex)
-        try:
-            task()
-            return True
-        except ex as e:
-            logging.info(f'Error: {e.msg}')
-            return False
+        return VMJHelper.do(task, ex, **kwargs)
 
 
 class VirtualMachine(BaseVCObject):
@@ -431,14 +1984,15 @@ class VirtualMachine(BaseVCObject):
     Wrapper for vim.VirtualMachine
 
     :param vim.VirtualMachine vc_object: Raw VMWare ManagedObject
+    :param str name: Object's name if already known, fetched from VCenter otherwise.
     """
-    def __init__(self, vc_object):
+    def __init__(self, vc_object, name=None):
         expect = vim.VirtualMachine  # Allowed object type
         # Object specific exceptions to catch
         common_exceptions = [vmodl.fault.NotSupported,
                              vim.fault.TaskInProgress, vim.fault.InvalidState, vim.fault.InvalidPowerState]
         if isinstance(vc_object, expect):
-            super(VirtualMachine, self).__init__(vc_object)
+            super(VirtualMachine, self).__init__(vc_object, name=name)
             self._ex = list(set(self._ex + common_exceptions))
         else:
             raise WrongObjectTypeError(self.__class__.__name__, expect.__name__)
@@ -525,21 +2079,25 @@ class VirtualMachine(BaseVCObject):
             indent = ' '*sn['level']
             print(f'{indent}|{sn["snap"]}')
 
-    def revert(self, snapshot_name=None, current=False):
+    def revert(self, snapshot_name=None, current=False, timeout=None):
         """
         Revert to snapshot.
 
         :param str snapshot_name: Snapshot name.
         :param bool current: Revert to current snapshot if set. The 'name' is ignored.
-        :return: True on success, otherwise False.
+        :param float timeout: Max time in seconds to wait for the task. Task is cancelled if possible once expired.
+        :return: True on success, None if timeout expired, otherwise False.
         """
         if snapshot_name is None and not current:
             logging.info('Either "snapshot_name" or "current" parameter should be specified.')
-            return False
+            return VMJHelper.result(False, fault='InvalidArgument')
         sn = self.get_snap(name=snapshot_name, current=current, raw=False)
-        return sn[0].revert() if len(sn) == 1 else False
+        if len(sn) != 1:
+            logging.info(f'Error: {len(sn)} snapshots "{snapshot_name}" found on VM "{self.name}", expected one')
+            return VMJHelper.result(False, fault='NotFound')
+        return sn[0].revert(timeout=timeout)
 
-    def create_snap(self, name, description=None, memory=True, quiesce=False):
+    def create_snap(self, name, description=None, memory=True, quiesce=False, timeout=None):
         """
         Create snapshot.
 
@@ -547,16 +2105,19 @@ class VirtualMachine(BaseVCObject):
         :param str description: Snapshot description.
         :param bool memory: If set, the memory will be included to snapshot.
         :param bool quiesce: If set, the quiesce snapshot will be created.
-        :return: True on success, otherwise False
+        :param float timeout: Max time in seconds to wait for the task. Task is cancelled if possible once expired.
+        :return: True on success, None if timeout expired, otherwise False
         """
         logging.info(f'Creating snapshot "{name}" for VM "{self.name}"...')
         ex = [vim.fault.InvalidName]
         ex = list(set(self._ex + ex))
         task = self.raw_obj.CreateSnapshot_Task
-        r = VMJHelper.do_task(task, catch_exception=ex, name=name, description=description, memory=memory, quiesce=quiesce)
+        r = VMJHelper.do_task(task, catch_exception=ex, timeout=timeout,
+                              name=name, description=description, memory=memory, quiesce=quiesce)
         return r
 
-    def remove_snap(self, name=None, current=False, remove_all=False, remove_children=False, consolidate=False):
+    def remove_snap(self, name=None, current=False, remove_all=False, remove_children=False, consolidate=False,
+                    timeout=None):
         """
         Remove snapshot or all snapshots.
 
@@ -565,16 +2126,23 @@ class VirtualMachine(BaseVCObject):
         :param bool remove_all: If set, all snapshots will be removed, "name" and "current" parameters are ignored.
         :param bool remove_children: If set, children snapshots will be removed along with parent.
         :param bool consolidate: If set, the consolidation will be performed.
-        :return: True on success, False if any of snapshots failed to be removed.
+        :param float timeout: Max time in seconds to remove all snapshots. Running task is cancelled if possible once expired.
+        :return: True on success, None if timeout expired, False if any of snapshots failed to be removed.
+                 Single TaskResult for all removed snapshots if :attr:`VMJHelper.task_results` is set,
+                 see :meth:`vmjuggler.helpers.TaskResult.combine`.
         """
         if name is None and not current and not remove_all:
             logging.info('Either "snapshot_name" or "current" or "remove_all" parameter should be specified.')
-            return False
+            return VMJHelper.result(False, fault='InvalidArgument')
 
         sn = self.get_snap(name=name, current=current, get_all=remove_all, raw=False)
+        deadline = VMJHelper.deadline(timeout)
+        results = [el.remove(remove_children=remove_children, consolidate=consolidate,
+                             timeout=VMJHelper.remaining(deadline)) for el in sn]
+        if VMJHelper.task_results:
+            return TaskResult.combine(results) if results else VMJHelper.result(True)
         r = True
-        for el in sn:
-            pr = el.remove(remove_children=remove_children, consolidate=consolidate)
+        for pr in results:
             r = pr if not pr else r
         return r
 
@@ -588,26 +2156,28 @@ class VirtualMachine(BaseVCObject):
         r = self.raw_obj.summary.runtime.powerState
         return r
 
-    def power_on(self):
+    def power_on(self, timeout=None):
         """
         Power On VM.
 
-        :return: True on success, otherwise False.
+        :param float timeout: Max time in seconds to wait for the task. Task is cancelled if possible once expired.
+        :return: True on success, None if timeout expired, otherwise False.
         """
         logging.info(f'Powering on VM "{self.name}" ...')
         task = self.raw_obj.PowerOnVM_Task
-        r = VMJHelper.do_task(task, catch_exception=self._ex)
+        r = VMJHelper.do_task(task, catch_exception=self._ex, timeout=timeout)
         return r
 
-    def power_off(self):
+    def power_off(self, timeout=None):
         """
         Power Off VM.
 
-        :return: True on success, otherwise False.
+        :param float timeout: Max time in seconds to wait for the task. Task is cancelled if possible once expired.
+        :return: True on success, None if timeout expired, otherwise False.
         """
         logging.info(f'Powering on VM "{self.name}" ...')
         task = self.raw_obj.PowerOffVM_Task
-        r = VMJHelper.do_task(task, catch_exception=self._ex)
+        r = VMJHelper.do_task(task, catch_exception=self._ex, timeout=timeout)
         return r
 
     def shutdown(self):
@@ -635,17 +2205,18 @@ class VirtualMachine(BaseVCObject):
         r = self._do(task, catch_exception=ex)
         return r
 
-    def suspend(self):
+    def suspend(self, timeout=None):
         """
         Suspend VM.
 
-        :return: True on success, otherwise False.
+        :param float timeout: Max time in seconds to wait for the task. Task is cancelled if possible once expired.
+        :return: True on success, None if timeout expired, otherwise False.
         """
         logging.info(f'Suspending VM "{self.name}"...')
         ex = [vim.fault.TaskInProgress, vim.fault.ToolsUnavailable]
         ex = list(set(self._ex + ex))
         task = self.raw_obj.SuspendVM_Task
-        r = VMJHelper.do_task(task, catch_exception=ex)
+        r = VMJHelper.do_task(task, catch_exception=ex, timeout=timeout)
         return r
 
     def reboot(self):
@@ -657,23 +2228,309 @@ class VirtualMachine(BaseVCObject):
         logging.info(f'Rebooting VM "{self.name}"...')
         ex = [vim.fault.TaskInProgress, vim.fault.ToolsUnavailable]
         ex = list(set(self._ex + ex))
-        task = self.raw_obj.SRebootGuest
+        task = self.raw_obj.RebootGuest
         r = self._do(task, catch_exception=ex)
         return r
 
-    def reset(self):
+    def reset(self, timeout=None):
         """
         Reset VM power.
 
-        :return: True on success, otherwise False.
+        :param float timeout: Max time in seconds to wait for the task. Task is cancelled if possible once expired.
+        :return: True on success, None if timeout expired, otherwise False.
         """
         logging.info(f'Resetting VM "{self.name}"...')
         ex = [vim.fault.TaskInProgress]
         ex = list(set(self._ex + ex))
         task = self.raw_obj.ResetVM_Task
-        r = VMJHelper.do_task(task, catch_exception=ex)
+        r = VMJHelper.do_task(task, catch_exception=ex, timeout=timeout)
+        return r
+
+    #: Arguments of :meth:`reconfigure` and VM properties they change
+    _reconfig_props = {'cpus': 'config.hardware.numCPU',
+                       'cores_per_socket': 'config.hardware.numCoresPerSocket',
+                       'memory_mb': 'config.hardware.memoryMB',
+                       'cpu_reservation_mhz': 'config.cpuAllocation.reservation',
+                       'memory_reservation_mb': 'config.memoryAllocation.reservation',
+                       'extra_config': 'config.extraConfig'}
+
+    @staticmethod
+    def _config_spec(cpus=None, cores_per_socket=None, memory_mb=None, cpu_reservation_mhz=None,
+                     memory_reservation_mb=None, extra_config=None, device_changes=None):
+        """Build config spec from changes, see :meth:`reconfigure`"""
+        spec = vim.vm.ConfigSpec()
+        if cpus is not None:
+            spec.numCPUs = cpus
+        if cores_per_socket is not None:
+            spec.numCoresPerSocket = cores_per_socket
+        if memory_mb is not None:
+            spec.memoryMB = memory_mb
+        if cpu_reservation_mhz is not None:
+            spec.cpuAllocation = vim.ResourceAllocationInfo(reservation=cpu_reservation_mhz)
+        if memory_reservation_mb is not None:
+            spec.memoryAllocation = vim.ResourceAllocationInfo(reservation=memory_reservation_mb)
+        if extra_config:
+            spec.extraConfig = [vim.option.OptionValue(key=k, value=v) for k, v in extra_config.items()]
+        if device_changes:
+            spec.deviceChange = device_changes
+        return spec
+
+    @classmethod
+    def _config_matches(cls, props, changes):
+        """
+        Check if VM already has configuration requested by changes.
+
+        :param dict props: VM properties fetched for :attr:`_reconfig_props`.
+        :param dict changes: Changes, see :meth:`reconfigure`.
+        :return: bool
+        """
+        for key, value in changes.items():
+            if value is None:
+                continue
+            if key == 'device_changes':
+                return False
+            actual = props.get(cls._reconfig_props[key])
+            if key == 'extra_config':
+                actual = dict((el.key, el.value) for el in actual or [])
+                if any(str(actual.get(k, '')) != str(v) for k, v in value.items()):
+                    return False
+            elif actual != value:
+                return False
+        return True
+
+    def _reconfigure(self, spec, timeout=None):
+        """Apply config spec"""
+        logging.info(f'Reconfiguring VM "{self.name}"...')
+        ex = [vim.fault.InvalidName, vim.fault.DuplicateName, vim.fault.InsufficientResourcesFault,
+              vim.fault.VmConfigFault, vim.fault.ConcurrentAccess, vim.fault.FileFault, vmodl.fault.InvalidArgument]
+        ex = list(set(self._ex + ex))
+        task = self.raw_obj.ReconfigVM_Task
+        r = VMJHelper.do_task(task, catch_exception=ex, timeout=timeout, spec=spec)
+        return r
+
+    def reconfigure(self, cpus=None, cores_per_socket=None, memory_mb=None, cpu_reservation_mhz=None,
+                    memory_reservation_mb=None, extra_config=None, device_changes=None, timeout=None):
+        """
+        Reconfigure VM.
+
+        Only passed parameters are changed.
+
+        :param int cpus: Number of virtual CPUs.
+        :param int cores_per_socket: Number of cores per CPU socket.
+        :param int memory_mb: Memory size in MB.
+        :param int cpu_reservation_mhz: CPU reservation in MHz.
+        :param int memory_reservation_mb: Memory reservation in MB.
+        :param dict extra_config: Advanced settings to set, e.g. {'disk.EnableUUID': 'TRUE'}. Empty value removes key.
+        :param list device_changes: List of vim.vm.device.VirtualDeviceSpec objects.
+        :param float timeout: Max time in seconds to wait for the task. Task is cancelled if possible once expired.
+        :return: True on success, None if timeout expired, otherwise False.
+        """
+        spec = self._config_spec(cpus=cpus, cores_per_socket=cores_per_socket, memory_mb=memory_mb,
+                                 cpu_reservation_mhz=cpu_reservation_mhz, memory_reservation_mb=memory_reservation_mb,
+                                 extra_config=extra_config, device_changes=device_changes)
+        return self._reconfigure(spec, timeout=timeout)
+
+    def _relocate(self, spec, timeout=None):
+        """Apply relocate spec"""
+        logging.info(f'Migrating VM "{self.name}"...')
+        ex = [vim.fault.MigrationFault, vim.fault.InvalidState, vim.fault.InsufficientResourcesFault,
+              vim.fault.InvalidDatastore, vim.fault.VmConfigFault, vim.fault.FileFault, vim.fault.TaskInProgress,
+              vim.fault.Timedout, vmodl.fault.InvalidArgument]
+        ex = list(set(self._ex + ex))
+        task = self.raw_obj.RelocateVM_Task
+        r = VMJHelper.do_task(task, catch_exception=ex, timeout=timeout, spec=spec)
         return r
 
+    def relocate(self, host=None, datastore=None, resource_pool=None, timeout=None):
+        """
+        Migrate VM to another host and/or datastore by vMotion and/or Storage vMotion.
+
+        :param host: vmjuggler.Host or raw vim.HostSystem object. Host isn't changed if not specified.
+        :param datastore: vmjuggler.Datastore or raw vim.Datastore object. Storage isn't changed if not specified.
+        :param resource_pool: vmjuggler.VApp or raw vim.ResourcePool object. Required if host is in another cluster.
+        :param float timeout: Max time in seconds to wait for the task. Task is cancelled if possible once expired.
+        :return: True on success, None if timeout expired, otherwise False.
+        """
+        raw = [el.raw_obj if isinstance(el, BaseVCObject) else el for el in (host, datastore, resource_pool)]
+        spec = vim.vm.RelocateSpec(host=raw[0], datastore=raw[1], pool=raw[2])
+        return self._relocate(spec, timeout=timeout)
+
+    @staticmethod
+    def _guest_auth(username, password):
+        """Guest OS credentials object"""
+        return vim.vm.guest.NamePasswordAuthentication(username=username, password=password)
+
+    @property
+    def _guest_ex(self):
+        """Exceptions to catch during guest operations"""
+        ex = [vim.fault.GuestOperationsFault, vim.fault.FileFault, vim.fault.TaskInProgress]
+        return tuple(set(self._ex + ex))
+
+    def upload(self, local_path, guest_path, username=None, password=None, overwrite=True):
+        """
+        Upload local file to guest OS.
+
+        The file is streamed to ESXi host by chunks and never loaded into memory.
+
+        :param str local_path: Path to the local file.
+        :param str guest_path: Absolute path to the file in guest OS.
+        :param str username: Guest OS user name.
+        :param str password: Guest OS user password.
+        :param bool overwrite: If set, the existing file will be overwritten.
+        :return: True on success, otherwise False.
+        """
+        from .transfer import HttpTransfer, TransferError
+        logging.info(f'Uploading "{local_path}" to VM "{self.name}"...')
+        fm = self.content.guestOperationsManager.fileManager
+        started = datetime.datetime.utcnow()
+        try:
+            url = fm.InitiateFileTransferToGuest(vm=self.raw_obj,
+                                                 auth=self._guest_auth(username, password),
+                                                 guestFilePath=guest_path,
+                                                 fileAttributes=vim.vm.guest.FileManager.FileAttributes(),
+                                                 fileSize=os.path.getsize(local_path),
+                                                 overwrite=overwrite)
+            HttpTransfer.upload(HttpTransfer.fix_host(url, self.raw_obj.runtime.host.name), local_path)
+            return VMJHelper.result(True, started=started)
+        except self._guest_ex as e:
+            logging.info(f'Error: {e.msg}')
+            return VMJHelper.result(False, started=started, fault=e)
+        except TransferError as e:
+            logging.info(f'Error: {e}')
+            return VMJHelper.result(False, started=started, fault=e)
+
+    def download(self, guest_path, local_path, username=None, password=None):
+        """
+        Download file from guest OS.
+
+        The file is streamed from ESXi host by chunks and never loaded into memory.
+
+        :param str guest_path: Absolute path to the file in guest OS.
+        :param str local_path: Path to the local file. Overwritten if exists.
+        :param str username: Guest OS user name.
+        :param str password: Guest OS user password.
+        :return: True on success, otherwise False.
+        """
+        from .transfer import HttpTransfer, TransferError
+        logging.info(f'Downloading "{guest_path}" from VM "{self.name}"...')
+        fm = self.content.guestOperationsManager.fileManager
+        started = datetime.datetime.utcnow()
+        try:
+            info = fm.InitiateFileTransferFromGuest(vm=self.raw_obj,
+                                                    auth=self._guest_auth(username, password),
+                                                    guestFilePath=guest_path)
+            HttpTransfer.download(HttpTransfer.fix_host(info.url, self.raw_obj.runtime.host.name), local_path)
+            return VMJHelper.result(True, started=started)
+        except self._guest_ex as e:
+            logging.info(f'Error: {e.msg}')
+            return VMJHelper.result(False, started=started, fault=e)
+        except TransferError as e:
+            logging.info(f'Error: {e}')
+            return VMJHelper.result(False, started=started, fault=e)
+
+    def run(self, program, arguments='', username=None, password=None, cwd=None, env=None, wait=True,
+            timeout=None, poll_interval=1):
+        """
+        Run program inside guest OS.
+
+        :param str program: Absolute path to the program.
+        :param str arguments: Program arguments.
+        :param str username: Guest OS user name.
+        :param str password: Guest OS user password.
+        :param str cwd: Working directory.
+        :param dict env: Environment variables.
+        :param bool wait: If set, wait for the program to finish, otherwise return once started.
+        :param int timeout: Max time in seconds to wait for the program to finish.
+        :param int poll_interval: Interval in seconds between program state checks.
+        :return: Exit code if waited, 0 if not. None if program failed to start, not finished in time
+                 or its exit code is unknown. TaskResult with exit code as result
+                 if :attr:`VMJHelper.task_results` is set, it succeeded if exit code is 0.
+        """
+        logging.info(f'Running "{program} {arguments}" on VM "{self.name}"...')
+        pm = self.content.guestOperationsManager.processManager
+        auth = self._guest_auth(username, password)
+        spec = vim.vm.guest.ProcessManager.ProgramSpec(programPath=program,
+                                                       arguments=arguments,
+                                                       workingDirectory=cwd,
+                                                       envVariables=[f'{k}={v}' for k, v in env.items()] if env else None)
+        started = datetime.datetime.utcnow()
+        try:
+            pid = pm.StartProgramInGuest(vm=self.raw_obj, auth=auth, spec=spec)
+            if not wait:
+                return VMJHelper.result(0, success=True, started=started)
+            deadline = VMJHelper.deadline(timeout)
+            while True:
+                procs = pm.ListProcessesInGuest(vm=self.raw_obj, auth=auth, pids=[pid])
+                if not procs:  # Exited long ago and already forgotten by VMware Tools
+                    logging.info(f'Program on VM "{self.name}" is not found, exit code is unknown')
+                    return VMJHelper.result(None, started=started, fault='ProcessNotFound')
+                proc = procs[0]
+                if proc.endTime is not None:
+                    logging.info(f'Program on VM "{self.name}" exited with code {proc.exitCode}')
+                    return VMJHelper.result(proc.exitCode, success=proc.exitCode == 0, started=started)
+                if VMJHelper.remaining(deadline) == 0:
+                    logging.info(f'Program on VM "{self.name}" is not finished in {timeout}s')
+                    return VMJHelper.result(None, started=started, timed_out=True)
+                time.sleep(poll_interval)
+        except self._guest_ex as e:
+            logging.info(f'Error: {e.msg}')
+            return VMJHelper.result(None, started=started, fault=e)
+
+    def export_ovf(self, dest, workers=4):
+        """
+        Export VM to OVF package or OVA archive.
+
+        VM must be powered off. Disks are streamed to local files concurrently over pooled connections,
+        the lease is kept alive by progress updates during transfer.
+        OVA descriptor must precede disks but can be built only once disk sizes are known,
+        so for '.ova' files are exported to temporary folder next to it first and then streamed to the archive.
+
+        :param str dest: Folder to export OVF package to or path to the '.ova' file.
+        :param int workers: Max number of disks downloaded at the same time.
+        :return: True on success, otherwise False.
+        """
+        from .ovf import NfcLease, write_ova
+        from .transfer import HttpTransfer, TransferError
+        logging.info(f'Exporting VM "{self.name}" to "{dest}"...')
+        ova = dest.lower().endswith('.ova')
+        folder = None
+        started = datetime.datetime.utcnow()
+        try:
+            folder = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(dest))) if ova else dest
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+            host = self._http_host.rsplit(':', 1)[0]
+            with NfcLease(self.raw_obj.ExportVm()) as lease:
+                lease.total = (lease.info.totalDiskCapacityInKB or 0) * 1024
+
+                def fetch(device):
+                    size = HttpTransfer.download(HttpTransfer.fix_host(device.url, host),
+                                                 os.path.join(folder, device.targetId),
+                                                 cookie=self._cookie, progress=lease.add)
+                    return vim.OvfManager.OvfFile(deviceId=device.key, path=device.targetId, size=size)
+
+                files = VMJHelper.parallel(fetch, [el for el in lease.info.deviceUrl if el.disk], workers=workers)
+                params = vim.OvfManager.CreateDescriptorParams(name=self.name, ovfFiles=files)
+                result = self.content.ovfManager.CreateDescriptor(obj=self.raw_obj, cdp=params)
+                if result.error:
+                    raise result.error[0]
+            ovf_path = os.path.join(folder, f'{self.name}.ovf')
+            with open(ovf_path, 'w') as f:
+                f.write(result.ovfDescriptor)
+            if ova:
+                write_ova(dest, [ovf_path] + [os.path.join(folder, el.path) for el in files])
+            logging.info(f'VM "{self.name}" exported')
+            return VMJHelper.result(True, started=started)
+        except vmodl.MethodFault as e:
+            logging.info(f'Error: {e.msg}')
+            return VMJHelper.result(False, started=started, fault=e)
+        except (TransferError, IOError, OSError) as e:
+            logging.info(f'Error: {e}')
+            return VMJHelper.result(False, started=started, fault=e)
+        finally:
+            if ova and folder is not None:
+                shutil.rmtree(folder, ignore_errors=True)
+
 
 class Datacenter(BaseVCObject):
     """
@@ -682,12 +2539,13 @@ class Datacenter(BaseVCObject):
     Wrapper for vim.Datacenter
 
     :param vim.Datacenjter vc_object: Raw VMWare ManagedObject
+    :param str name: Object's name if already known, fetched from VCenter otherwise.
     """
-    def __init__(self, vc_object):
+    def __init__(self, vc_object, name=None):
         expect = vim.Datacenter
         common_exceptions = []
         if isinstance(vc_object, expect):
-            super(Datacenter, self).__init__(vc_object)
+            super(Datacenter, self).__init__(vc_object, name=name)
             self._ex = list(set(self._ex + common_exceptions))
         else:
             raise WrongObjectTypeError(self.__class__.__name__, expect.__name__)
@@ -700,12 +2558,13 @@ class Folder(BaseVCObject):
     Wrapper for vim.Folder
 
     :param vim.Folder vc_object: Raw VMWare ManagedObject
+    :param str name: Object's name if already known, fetched from VCenter otherwise.
     """
-    def __init__(self, vc_object):
+    def __init__(self, vc_object, name=None):
         expect = vim.Folder
         common_exceptions = []
         if isinstance(vc_object, expect):
-            super(Folder, self).__init__(vc_object)
+            super(Folder, self).__init__(vc_object, name=name)
             self._ex = list(set(self._ex + common_exceptions))
         else:
             raise WrongObjectTypeError(self.__class__.__name__, expect.__name__)
@@ -718,12 +2577,13 @@ class VApp(BaseVCObject):
     Wrapper for vim.VApp
 
     :param vim.VApp vc_object: Raw VMWare ManagedObject
+    :param str name: Object's name if already known, fetched from VCenter otherwise.
     """
-    def __init__(self, vc_object):
+    def __init__(self, vc_object, name=None):
         expect = vim.VirtualApp
         common_exceptions = []
         if isinstance(vc_object, expect):
-            super(VApp, self).__init__(vc_object)
+            super(VApp, self).__init__(vc_object, name=name)
             self._ex = list(set(self._ex + common_exceptions))
         else:
             raise WrongObjectTypeError(self.__class__.__name__, expect.__name__)
@@ -736,12 +2596,13 @@ class Network(BaseVCObject):
     Wrapper for vim.Network
 
     :param vim.Network vc_object: Raw VMWare ManagedObject
+    :param str name: Object's name if already known, fetched from VCenter otherwise.
     """
-    def __init__(self, vc_object):
+    def __init__(self, vc_object, name=None):
         expect = vim.Network
         common_exceptions = []
         if isinstance(vc_object, expect):
-            super(Network, self).__init__(vc_object)
+            super(Network, self).__init__(vc_object, name=name)
             self._ex = list(set(self._ex + common_exceptions))
         else:
             raise WrongObjectTypeError(self.__class__.__name__, expect.__name__)
@@ -754,16 +2615,172 @@ class Datastore(BaseVCObject):
     Wrapper for vim.Datastore
 
     :param vim.Datastore vc_object: Raw VMWare ManagedObject
+    :param str name: Object's name if already known, fetched from VCenter otherwise.
     """
-    def __init__(self, vc_object):
+    def __init__(self, vc_object, name=None):
         expect = vim.Datastore
         common_exceptions = []
         if isinstance(vc_object, expect):
-            super(Datastore, self).__init__(vc_object)
+            super(Datastore, self).__init__(vc_object, name=name)
             self._ex = list(set(self._ex + common_exceptions))
         else:
             raise WrongObjectTypeError(self.__class__.__name__, expect.__name__)
 
+    @staticmethod
+    def _search_spec():
+        """Search spec to list single folder with file details"""
+        browser = vim.host.DatastoreBrowser
+        details = browser.FileInfo.Details(fileType=True, fileSize=True, modification=True, fileOwner=False)
+        query = [browser.FolderQuery(), browser.VmDiskQuery(), browser.IsoImageQuery(), browser.VmConfigQuery(),
+                 browser.TemplateVmConfigQuery(), browser.VmLogQuery(), browser.VmNvramQuery(),
+                 browser.VmSnapshotQuery(), browser.FloppyImageQuery(), browser.Query()]
+        return browser.SearchSpec(details=details, query=query, sortFoldersFirst=True)
+
+    @staticmethod
+    def _timestamp(dt):
+        """Convert datetime to POSIX timestamp"""
+        return calendar.timegm(dt.utctimetuple()) + dt.microsecond / 1e6 if dt else None
+
+    def _list(self, folder):
+        """
+        List single datastore folder.
+
+        :param str folder: Folder path relative to the datastore root.
+        :return: List of DatastoreFile.
+        """
+        ds_path = f'[{self.name}] {folder}'
+        task = self.raw_obj.browser.SearchDatastore_Task(datastorePath=ds_path, searchSpec=self._search_spec())
+        try:
+            VMJHelper.wait_task(task)
+        except vim.fault.FileNotFound:
+            logging.info(f'Folder "{ds_path}" not found')
+            return []
+        r = []
+        for f in task.info.result.file:
+            f_type = f.__class__.__name__.split('.')[-1]
+            f_type = f_type[:-len('Info')].lower() if f_type.endswith('Info') else f_type.lower()
+            f_path = f'{folder.rstrip("/")}/{f.path}' if folder else f.path
+            r.append(DatastoreFile(f_path, f.path, f.fileSize, self._timestamp(f.modification), f_type))
+        return r
+
+    def _url(self, remote_path):
+        """
+        URL of the file on datastore provided by VCenter '/folder' HTTP endpoint.
+
+        :param str remote_path: Path to the file relative to the datastore root.
+        :return: str
+        """
+        dc_path = []
+        parent = self.raw_obj.parent
+        while parent is not None and not isinstance(parent, vim.Datacenter):
+            parent = parent.parent
+        while parent is not None and parent != self.content.rootFolder:
+            dc_path.insert(0, parent.name)
+            parent = parent.parent
+        query = urlencode({'dcPath': '/'.join(dc_path), 'dsName': self.name})
+        return f'https://{self._http_host}/folder/{quote(remote_path.lstrip("/"))}?{query}'
+
+    def download(self, remote_path, local_path, workers=4, resume=True):
+        """
+        Download file from datastore.
+
+        Large files are downloaded by several parallel byte ranges over pooled connections,
+        see :meth:`vmjuggler.transfer.HttpTransfer.download_ranges`.
+
+        :param str remote_path: Path to the file relative to the datastore root.
+        :param str local_path: Path to the local file.
+        :param int workers: Number of parallel ranges.
+        :param bool resume: If set, continue previously interrupted download.
+        :return: True on success, otherwise False.
+        """
+        from .transfer import HttpTransfer, TransferError
+        logging.info(f'Downloading "[{self.name}] {remote_path}" to "{local_path}"...')
+        started = datetime.datetime.utcnow()
+        try:
+            HttpTransfer.download_ranges(self._url(remote_path), local_path, cookie=self._cookie,
+                                         workers=workers, resume=resume)
+            return VMJHelper.result(True, started=started)
+        except (TransferError, IOError, OSError) as e:
+            logging.info(f'Error: {e}')
+            return VMJHelper.result(False, started=started, fault=e)
+
+    def upload(self, local_path, remote_path):
+        """
+        Upload file to datastore.
+
+        The file is streamed by chunks and never loaded into memory.
+        The '/folder' endpoint accepts the whole file in single request only, so upload can't be resumed.
+
+        :param str local_path: Path to the local file.
+        :param str remote_path: Path to the file relative to the datastore root. Overwritten if exists.
+        :return: True on success, otherwise False.
+        """
+        from .transfer import HttpTransfer, TransferError
+        logging.info(f'Uploading "{local_path}" to "[{self.name}] {remote_path}"...')
+        started = datetime.datetime.utcnow()
+        try:
+            HttpTransfer.upload(self._url(remote_path), local_path, cookie=self._cookie)
+            return VMJHelper.result(True, started=started)
+        except (TransferError, IOError, OSError) as e:
+            logging.info(f'Error: {e}')
+            return VMJHelper.result(False, started=started, fault=e)
+
+    def _folder_mtimes(self, folder):
+        """
+        Modification time of every folder under the folder, fetched by single recursive search.
+
+        :param str folder: Folder path relative to the datastore root.
+        :return: Dict of {folder path: POSIX timestamp}.
+        """
+        browser = vim.host.DatastoreBrowser
+        details = browser.FileInfo.Details(fileType=True, fileSize=False, modification=True, fileOwner=False)
+        spec = browser.SearchSpec(details=details, query=[browser.FolderQuery()])
+        prefix = f'[{self.name}]'
+        task = self.raw_obj.browser.SearchDatastoreSubFolders_Task(datastorePath=f'{prefix} {folder}',
+                                                                   searchSpec=spec)
+        try:
+            VMJHelper.wait_task(task)
+        except vim.fault.FileNotFound:
+            return {}
+        r = {}
+        for res in task.info.result or []:
+            parent = res.folderPath[len(prefix):].strip().strip('/') if res.folderPath.startswith(prefix) else ''
+            for f in res.file or []:
+                r[f'{parent}/{f.path}' if parent else f.path] = self._timestamp(f.modification)
+        return r
+
+    def walk(self, path='', pattern='*', cache=None):
+        """
+        Walk through datastore folders recursively.
+
+        Folders are listed one by one and entries are yielded as soon as folder listing is received.
+        If cache is given, modification times of all folders are fetched first by single recursive folder search,
+        and the folder is not listed again while its own modification time is the same. Folder modification time
+        changes once its entries are added, removed or renamed, but not when existing file is rewritten in place.
+
+        :param str path: Folder to start from. Datastore root if empty.
+        :param str pattern: Shell-style pattern files should match, e.g. "*.vmdk".
+        :param vmjuggler.cache.ListingCache cache: Cache of previous listings.
+        :return: Generator of DatastoreFile.
+        """
+        key = self.raw_obj.summary.url
+        start = path.strip('/')
+        mtimes = self._folder_mtimes(start) if cache is not None else {}
+        folders = [start]
+        while folders:
+            folder = folders.pop()
+            mtime = mtimes.get(folder)  # Start folder mtime is unknown, so it's always listed
+            entries = cache.get(key, folder, mtime) if mtime is not None else None
+            if entries is None:
+                entries = self._list(folder)
+                if mtime is not None:
+                    cache.put(key, folder, mtime, entries)
+            for el in entries:
+                if el.type == 'folder':
+                    folders.append(el.path)
+                if fnmatch.fnmatch(el.name, pattern):
+                    yield el
+
 
 class Host(BaseVCObject):
     """
@@ -772,16 +2789,42 @@ class Host(BaseVCObject):
     Wrapper for vim.Host
 
     :param vim.Host vc_object: Raw VMWare ManagedObject
+    :param str name: Object's name if already known, fetched from VCenter otherwise.
     """
-    def __init__(self, vc_object):
+    def __init__(self, vc_object, name=None):
         expect = vim.HostSystem
         common_exceptions = []
         if isinstance(vc_object, expect):
-            super(Host, self).__init__(vc_object)
+            super(Host, self).__init__(vc_object, name=name)
             self._ex = list(set(self._ex + common_exceptions))
         else:
             raise WrongObjectTypeError(self.__class__.__name__, expect.__name__)
 
+    def evacuate(self, targets=None, host_limit=4, workers=32, deadline=None, on_progress=None):
+        """
+        Migrate all VMs from the host by vMotion, e.g. before maintenance.
+
+        VMs are spread over target hosts by free memory, see :meth:`VCenter.migrate`.
+
+        :param list targets: Host names or vmjuggler.Host objects to migrate VMs to.
+                             Other hosts of the same cluster used if not specified.
+        :param int host_limit: Max number of concurrent migrations per host.
+        :param int workers: Max number of concurrent migrations in total.
+        :param float deadline: Max time in seconds for the whole batch. Not finished tasks are cancelled if possible.
+        :param on_progress: Callback function called with (VM name, result) once every migration is finished.
+        :return: Dict of {raw vim.VirtualMachine object: True on success, False on failure, None if deadline expired}.
+        """
+        if targets is None:
+            targets = [el for el in self.raw_obj.parent.host if el != self.raw_obj]
+        if not targets:
+            logging.info(f'No target hosts to evacuate Host "{self.name}" to')
+            return {}
+        vms = list(self.raw_obj.vm)
+        logging.info(f'Evacuating {len(vms)} VMs from Host "{self.name}"...')
+        with self._vc() as vc:
+            return vc.migrate(vms, target_host=targets, host_limit=host_limit, workers=workers, deadline=deadline,
+                              on_progress=on_progress)
+
 
 class VMSnapshot(BaseVCObject):
     """
@@ -817,18 +2860,20 @@ class VMSnapshot(BaseVCObject):
                   \rState:       {self.state}"""
         print(msg)
 
-    def remove(self, remove_children=False, consolidate=False):
+    def remove(self, remove_children=False, consolidate=False, timeout=None):
         """
         Remove snapshot.
 
         :param bool remove_children: If set, the children snapshots will be removed too.
         :param bool consolidate: If set, disk images will be consolidated after snapshot removed.
-        :return: True on success, otherwise False
+        :param float timeout: Max time in seconds to wait for the task. Task is cancelled if possible once expired.
+        :return: True on success, None if timeout expired, otherwise False
         """
         task = self.snap.RemoveSnapshot_Task
         ex = [vim.fault.TaskInProgress]
         logging.info(f'Removing snapshot {self.name}...')
-        r = VMJHelper.do_task(task, catch_exception=ex, removeChildren=remove_children, consolidate=consolidate)
+        r = VMJHelper.do_task(task, catch_exception=ex, timeout=timeout,
+                              removeChildren=remove_children, consolidate=consolidate)
         return r
 
     def rename(self, name=None, description=None):
@@ -841,24 +2886,65 @@ class VMSnapshot(BaseVCObject):
         """
         logging.info(f'Renaming snapshot "{self.name}" to "{name if  name else self.name}",'
                      f' with description "{description if description else self.description}"...')
-        try:
-            self.snap.RenameSnapshot(name=name, description=description)
+        r = self._do(self.snap.RenameSnapshot, catch_exception=[vmodl.fault.InvalidArgument, vim.fault.InvalidName],
+                     name=name, description=description)
+        if r:
             logging.info('Done')
-            self.name = name if name else self.name
-            return True
-        except vim.fault.InvalidArgument as e:
-            logging.info(f'Error: {e.msg}')
-            return False
+            self._name = name if name else self._name
+            self.description = description if description else self.description
+        return r
 
-    def revert(self, suppress_power_on=False):
+    def revert(self, suppress_power_on=False, timeout=None):
         """
         Revert snapshot.
 
         :param bool suppress_power_on:  If set, VM will not be powered on in case snapshot was created in VM powered on state.
-        :return: True on success, otherwise False
+        :param float timeout: Max time in seconds to wait for the task. Task is cancelled if possible once expired.
+        :return: True on success, None if timeout expired, otherwise False
         """
         task = self.snap.RevertToSnapshot_Task
         ex = [vim.fault.NotFound]
         logging.info(f'Reverting snapshot {self.name}...')
-        r = VMJHelper.do_task(task, catch_exception=ex, suppressPowerOn=suppress_power_on)
+        r = VMJHelper.do_task(task, catch_exception=ex, timeout=timeout, suppressPowerOn=suppress_power_on)
+        return r
+
+
+def _wrap(raw, name=None):
+    """
+    Wrap raw managed object to matching vmjuggler object.
+
+    :param raw: Raw VMWare ManagedObject.
+    :param str name: Object's name if already known.
+    :return: vmjuggler object, BaseVCObject if there is no specific one.
+    """
+    for expect, cls in ((vim.VirtualMachine, VirtualMachine), (vim.Datacenter, Datacenter), (vim.Folder, Folder),
+                        (vim.VirtualApp, VApp), (vim.Network, Network), (vim.Datastore, Datastore),
+                        (vim.HostSystem, Host)):
+        if isinstance(raw, expect):
+            return cls(raw, name=name)
+    return BaseVCObject(raw, name=name)
+
+
+def _rebind(value, vc):
+    """
+    Copy vmjuggler or raw managed object bound to connection of another VCenter object.
+
+    :param value: vmjuggler object, raw ManagedObject or list, tuple or namedtuple of them.
+                  Other values are returned as is.
+    :param VCenter vc: Connected VCenter object to bind to.
+    :return: Rebound copy of value.
+    """
+    if isinstance(value, tuple) and hasattr(value, '_fields'):  # namedtuple, e.g. ObjectRef or DatastoreFile
+        return value._make(_rebind(el, vc) for el in value)
+    if type(value) in (list, tuple):
+        return type(value)(_rebind(el, vc) for el in value)
+    if isinstance(value, VmomiSupport.ManagedObject):
+        return type(value)(value._moId, vc.si._stub)
+    if isinstance(value, BaseVCObject):
+        r = copy.copy(value)
+        for k, v in vars(value).items():
+            if isinstance(v, VmomiSupport.ManagedObject):
+                setattr(r, k, _rebind(v, vc))
+        r._content = vc.content
         return r
+    return value
@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# -*- coding: future_fstrings -*-
+
+# MIT License
+#
+# Copyright (c) 2018 Alexandr Malygin
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+
+#: Datastore file entry returned by :meth:`vmjuggler.Datastore.walk`.
+#: The 'mtime' is POSIX timestamp, the 'type' is one of 'folder', 'vmdisk', 'isoimage', 'vmconfig', 'file', etc.
+DatastoreFile = namedtuple('DatastoreFile', ['path', 'name', 'size', 'mtime', 'type'])
+
+
+class ListingCache(object):
+    """
+    On-disk cache of datastore folder listings.
+
+    Folder listing is keyed by datastore and folder path and is valid while folder modification time is the same.
+    The cache is kept in memory and written to the disk by :meth:`save`.
+
+    :param str path: Path to the cache file. Created if not exists.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self._data = json.load(f)
+
+    @staticmethod
+    def _key(datastore, folder):
+        return f'{datastore}|{folder}'
+
+    def get(self, datastore, folder, mtime):
+        """
+        Return cached folder listing.
+
+        :param str datastore: Datastore key.
+        :param str folder: Folder path.
+        :param float mtime: Folder modification time.
+        :return: List of DatastoreFile or None if not cached or outdated.
+        """
+        with self._lock:
+            r = self._data.get(self._key(datastore, folder))
+        if r is None or r['mtime'] != mtime:
+            return None
+        return [DatastoreFile(*el) for el in r['entries']]
+
+    def put(self, datastore, folder, mtime, entries):
+        """
+        Cache folder listing.
+
+        :param str datastore: Datastore key.
+        :param str folder: Folder path.
+        :param float mtime: Folder modification time.
+        :param list entries: List of DatastoreFile.
+        :return: n/a
+        """
+        with self._lock:
+            self._data[self._key(datastore, folder)] = {'mtime': mtime, 'entries': [list(el) for el in entries]}
+
+    def save(self):
+        """Write cache to the disk."""
+        with self._lock:
+            tmp = f'{self.path}.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(self._data, f)
+            getattr(os, 'replace', os.rename)(tmp, self.path)
+
+
+class InventoryCache(object):
+    """
+    Persistent on-disk cache of VCenter inventory.
+
+    Keeps moId, name, type, parent and path of every managed entity in SQLite database,
+    so name can be resolved to managed object without inventory scan. Cache is bound to VCenter by its
+    instance UUID and is cleared if opened for another VCenter.
+
+    :param str path: Path to the database file. Created if not exists.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+            self._db.execute('CREATE TABLE IF NOT EXISTS objects '
+                             '(moid TEXT PRIMARY KEY, name TEXT, type TEXT, parent TEXT, path TEXT)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS objects_name ON objects (name)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS objects_parent ON objects (parent)')
+            self._db.execute('CREATE TEMP TABLE IF NOT EXISTS dirty (moid TEXT PRIMARY KEY)')  # See _update_paths()
+
+    def validate(self, instance_uuid):
+        """
+        Bind cache to VCenter, clear it if it was filled for another one.
+
+        :param str instance_uuid: VCenter instance UUID.
+        :return: True if cache belongs to the VCenter, False if it was cleared.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'instance_uuid'").fetchone()
+            if row and row[0] == instance_uuid:
+                return True
+            with self._db:
+                self._db.execute('DELETE FROM objects')
+                self._db.execute("INSERT OR REPLACE INTO meta VALUES ('instance_uuid', ?)", (instance_uuid,))
+            return False
+
+    def is_empty(self):
+        """Check if there are no cached objects."""
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM objects').fetchone()[0] == 0
+
+    def update(self, objects, removed=None, replace=False):
+        """
+        Add, change or remove cached objects and recalculate paths.
+
+        Only paths of objects which name or parent changed, and of everything under them, are recalculated,
+        unless all objects are replaced.
+
+        :param list objects: List of (moid, name, type, parent moid) tuples to add or change.
+        :param list removed: List of moIds to remove.
+        :param bool replace: If set, all cached objects are replaced by given ones.
+        :return: n/a
+        """
+        objects = list(objects)
+        with self._lock:
+            with self._db:
+                if replace:
+                    self._db.execute('DELETE FROM objects')
+                else:
+                    known = self._known([el[0] for el in objects])
+                    objects = [el for el in objects if known.get(el[0]) != (el[1], el[3])]
+                if removed:
+                    self._db.executemany('DELETE FROM objects WHERE moid = ?', [(el,) for el in removed])
+                self._db.executemany('INSERT OR REPLACE INTO objects (moid, name, type, parent) VALUES (?, ?, ?, ?)',
+                                     objects)
+                if replace:
+                    self._db.execute('WITH RECURSIVE p(moid, path) AS ('
+                                     '  SELECT moid, name FROM objects'
+                                     '  WHERE parent IS NULL OR parent NOT IN (SELECT moid FROM objects)'
+                                     '  UNION ALL'
+                                     "  SELECT o.moid, p.path || '/' || o.name"
+                                     '  FROM objects o JOIN p ON o.parent = p.moid)'
+                                     ' UPDATE objects SET path = (SELECT path FROM p WHERE p.moid = objects.moid)')
+                elif objects or removed:
+                    self._update_paths([el[0] for el in objects] + list(removed or []))
+
+    def _known(self, moids):
+        """
+        Name and parent of cached objects.
+
+        :param list moids: Managed object IDs.
+        :return: Dict of {moid: (name, parent moid)}.
+        """
+        r = {}
+        for i in range(0, len(moids), 500):  # Keep number of SQL variables within the limit
+            chunk = moids[i:i + 500]
+            query = f'SELECT moid, name, parent FROM objects WHERE moid IN ({",".join("?" * len(chunk))})'
+            r.update((moid, (name, parent)) for moid, name, parent in self._db.execute(query, chunk))
+        return r
+
+    def _update_paths(self, moids):
+        """
+        Recalculate paths of changed objects and everything under them.
+
+        Children of removed objects become top level ones, like in full recalculation.
+
+        :param list moids: MoIds of changed and removed objects.
+        :return: n/a
+        """
+        self._db.execute('DELETE FROM dirty')
+        self._db.executemany('INSERT OR IGNORE INTO dirty VALUES (?)', [(el,) for el in moids])
+        self._db.execute('WITH RECURSIVE d(moid) AS ('
+                         '  SELECT moid FROM objects WHERE moid IN dirty OR parent IN dirty'
+                         '  UNION'
+                         '  SELECT o.moid FROM objects o JOIN d ON o.parent = d.moid),'
+                         ' p(moid, path) AS ('
+                         "  SELECT o.moid, CASE WHEN q.moid IS NULL THEN o.name ELSE q.path || '/' || o.name END"
+                         '  FROM objects o LEFT JOIN objects q ON q.moid = o.parent'
+                         '  WHERE o.moid IN d AND (o.parent IS NULL OR o.parent NOT IN d)'
+                         '  UNION ALL'
+                         "  SELECT o.moid, p.path || '/' || o.name FROM objects o JOIN p ON o.parent = p.moid)"
+                         ' UPDATE objects SET path = (SELECT path FROM p WHERE p.moid = objects.moid)'
+                         ' WHERE moid IN d')
+        self._db.execute('DELETE FROM dirty')
+
+    def lookup(self, names):
+        """
+        Find cached objects by names.
+
+        :param list names: Object names.
+        :return: List of (moid, name, type, parent moid, path) tuples.
+        """
+        names = list(names)
+        r = []
+        with self._lock:
+            for i in range(0, len(names), 500):  # Keep number of SQL variables within the limit
+                chunk = names[i:i + 500]
+                query = f'SELECT moid, name, type, parent, path FROM objects WHERE name IN ({",".join("?" * len(chunk))})'
+                r.extend(self._db.execute(query, chunk).fetchall())
+        return r
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            self._db.close()
+
+
+class InventorySnapshot(object):
+    """
+    Compact snapshot of inventory properties.
+
+    Keeps only short hash of every property value of every object, which is enough to tell
+    which properties changed between two points in time. Used by :meth:`vmjuggler.VCenter.changes`.
+
+    :param str path: Path to the snapshot file. Loaded if exists. Snapshot is kept in memory only if not set.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.objects = {}  # moId -> [type name, {property path: hash}]
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.objects = json.load(f)
+
+    @staticmethod
+    def digest(value):
+        """
+        Hash of property value.
+
+        :param value: Property value.
+        :return: str
+        """
+        from .export import flatten
+        data = json.dumps(flatten(value), sort_keys=True, default=str)
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()[:16]
+
+    def update(self, moid, obj_type, props, complete=False):
+        """
+        Store new property values of object and find which of them changed.
+
+        :param str moid: Managed object ID.
+        :param str obj_type: Managed object type name.
+        :param dict props: Dict of {property path: value}.
+        :param bool complete: If set, props has all properties and missing ones are treated as unset.
+        :return: Tuple (True if object is new, list of changed property paths).
+        """
+        new = moid not in self.objects
+        entry = self.objects.setdefault(moid, [obj_type, {}])
+        hashes = entry[1]
+        changed = []
+        for path, value in props.items():
+            h = self.digest(value)
+            if hashes.get(path) != h:
+                hashes[path] = h
+                changed.append(path)
+        if complete:
+            for path in [el for el in hashes if el not in props]:
+                del hashes[path]
+                changed.append(path)
+        return new, sorted(changed)
+
+    def remove(self, moid):
+        """
+        Remove object.
+
+        :param str moid: Managed object ID.
+        :return: Type name of removed object or None if it was not in the snapshot.
+        """
+        entry = self.objects.pop(moid, None)
+        return entry[0] if entry else None
+
+    def save(self):
+        """Write snapshot to the disk if path is set."""
+        if not self.path:
+            return
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.objects, f, separators=(',', ':'))
+        getattr(os, 'replace', os.rename)(tmp, self.path)
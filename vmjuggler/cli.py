@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# -*- coding: future_fstrings -*-
+
+# MIT License
+#
+# Copyright (c) 2018 Alexandr Malygin
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Command line entry point which runs batch of VM operations over single session.
+
+Every line of the batch file is an operation: VM name, action (VirtualMachine method, see :data:`actions`)
+and its arguments. CSV needs "vm", "action" and "args" columns with arguments as JSON object,
+JSON Lines needs the same keys. All VMs are resolved by single bulk lookup, operations of different VMs
+run concurrently and operations of the same VM run one by one in the file order.
+Malformed lines are reported as failed operations and don't stop the rest of the batch.
+Result of every operation is written as JSON line once it's finished::
+
+    $ vmjuggler --host vc.local --user admin ops.csv > results.jsonl
+"""
+
+import argparse
+import csv
+import getpass
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+#: Actions allowed in batch file, all are vmjuggler.VirtualMachine methods.
+actions = ('power_on', 'power_off', 'shutdown', 'reboot', 'suspend', 'reset', 'create_snap', 'remove_snap', 'revert',
+           'reconfigure', 'run', 'upload', 'download', 'export_ovf')
+
+
+def read_ops(f, fmt):
+    """
+    Read operations from batch file.
+
+    :param f: File object.
+    :param str fmt: 'csv' or 'jsonl'.
+    :return: List of dicts with 'line', 'vm', 'action' and 'args' keys. Rows which can't be parsed
+             are kept with 'error' key set.
+    """
+    if fmt == 'csv':
+        rows = ((i, row, None) for i, row in enumerate(csv.DictReader(f), 2))
+    else:
+        rows = (_parse_line(i, line) for i, line in enumerate(f, 1) if line.strip())
+    r = []
+    for i, row, error in rows:
+        op = {'line': i, 'vm': row.get('vm'), 'action': row.get('action'), 'args': row.get('args') or {}}
+        if error is None and isinstance(op['args'], str):
+            try:
+                op['args'] = json.loads(op['args'])
+            except ValueError as e:
+                error = f'Invalid args: {e}'
+        if error is None and not isinstance(op['args'], dict):
+            error = 'Invalid args: JSON object expected'
+        if error is not None:
+            op['error'] = error
+        r.append(op)
+    return r
+
+
+def _parse_line(i, line):
+    """
+    Parse line of JSON Lines batch file.
+
+    :param int i: Line number.
+    :param str line: Line.
+    :return: Tuple of line number, row dict and error message or None.
+    """
+    try:
+        row = json.loads(line)
+    except ValueError as e:
+        return i, {}, f'Invalid JSON: {e}'
+    if not isinstance(row, dict):
+        return i, {}, 'Invalid JSON: object expected'
+    return i, row, None
+
+
+def _succeeded(action, r):
+    """
+    Judge result of the action.
+
+    :param str action: Action name.
+    :param r: Value returned by the action.
+    :return: True if the action succeeded. The 'run' succeeds only if the program exited with code 0.
+    """
+    from .helpers import TaskResult
+    if action == 'run' and not isinstance(r, TaskResult):
+        return r == 0 and not isinstance(r, bool)
+    return bool(r)
+
+
+def run_ops(vc, ops, workers=10, out=None):
+    """
+    Run operations.
+
+    Every operation is counted once by the progress tracker bound to the calling thread, if any,
+    see :mod:`vmjuggler.progress`.
+
+    :param vmjuggler.VCenter vc: Connected VCenter object.
+    :param list ops: Operations returned by :func:`read_ops`.
+    :param int workers: Max number of VMs processed at the same time.
+    :param out: File object to write results to as JSON lines.
+    :return: List of results. Every result is dict with 'line', 'vm', 'action', 'ok', 'result', 'error'
+             and 'elapsed' keys.
+    """
+    from .base_objects import VirtualMachine
+    from . import progress
+    lock = threading.Lock()
+    results = []
+    tracker = progress.current() or progress.Progress(total=len(ops), sinks=[])
+    tracker.expect(len(ops))
+
+    def report(op, ok, result=None, error=None, elapsed=0.0):
+        r = {'line': op['line'], 'vm': op['vm'], 'action': op['action'], 'ok': ok, 'result': result,
+             'error': error, 'elapsed': round(elapsed, 3)}
+        with lock:
+            results.append(r)
+            if out is not None:
+                out.write(json.dumps(r, default=str) + '\n')
+                out.flush()
+
+    def fail(op, error):
+        with tracker.operation() as operation:
+            report(op, False, error=error)
+            operation.report(False)
+
+    by_vm = OrderedDict()
+    for op in ops:
+        if op.get('error'):
+            fail(op, op['error'])
+        elif not isinstance(op['vm'], str) or not op['vm']:
+            fail(op, 'VM name expected')
+        elif not isinstance(op['args'], dict):
+            fail(op, 'Invalid args: JSON object expected')
+        elif op['action'] not in actions:
+            fail(op, f'Unknown action "{op["action"]}"')
+        else:
+            by_vm.setdefault(op['vm'], []).append(op)
+    found = vc._fetch_vms(list(by_vm), [])
+    for name in [el for el in by_vm if el not in found]:
+        for op in by_vm.pop(name):
+            fail(op, f'VM "{name}" not found')
+
+    def run(item):
+        vm, vm_ops = item
+        for op in vm_ops:
+            started = time.time()
+            # Tasks run by the action update the row's progress, but the row is counted by its own result
+            with progress.bound(tracker), tracker.operation() as operation:
+                ok = False
+                try:
+                    r = getattr(vm, op['action'])(**op['args'])
+                    ok = _succeeded(op['action'], r)
+                    report(op, ok, result=r, elapsed=time.time() - started)
+                except Exception as e:
+                    report(op, False, error=f'{type(e).__name__}: {getattr(e, "msg", None) or e}',
+                           elapsed=time.time() - started)
+                operation.report(ok)
+
+    items = [(VirtualMachine(found[name][0], name=name), vm_ops) for name, vm_ops in by_vm.items()]
+    with progress.bound(None):  # Rows are counted by run(), not VMs by map()
+        vc.map(run, items, workers=workers)
+    return results
+
+
+def main(argv=None):
+    """Console entry point."""
+    from .base_objects import VCenter
+    from .helpers import Logger
+    from .progress import Progress, TtySink
+    parser = argparse.ArgumentParser(prog='vmjuggler', description='Run batch of VM operations.')
+    parser.add_argument('file', nargs='?', default='-', help='Batch file, CSV or JSON Lines. Default is stdin.')
+    parser.add_argument('--host', required=True, help='VCenter address.')
+    parser.add_argument('--user', required=True, help='VCenter user name.')
+    parser.add_argument('--password', default=os.environ.get('VMJUGGLER_PASSWORD'),
+                        help='VCenter password. VMJUGGLER_PASSWORD environment variable used or asked if not set.')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help='Batch file format. Guessed by file extension.')
+    parser.add_argument('--output', default='-', help='Results file. Default is stdout.')
+    parser.add_argument('--workers', type=int, default=10, help='Max number of VMs processed at the same time.')
+    parser.add_argument('--progress', action='store_true', help='Show progress bar on stderr.')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Log errors only.')
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ('csv' if args.file.lower().endswith('.csv') else 'jsonl')
+    if args.file == '-':
+        ops = read_ops(sys.stdin, fmt)
+    else:
+        with open(args.file) as f:
+            ops = read_ops(f, fmt)
+    if args.quiet:
+        Logger.log_level = logging.ERROR
+    Logger.set()
+    password = args.password if args.password is not None else getpass.getpass()
+
+    vc = VCenter(args.host, args.user, password)
+    if vc.connect(exit_on_fault=False) is None:
+        return 2
+    out = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        if args.progress:
+            with Progress(total=len(ops), sinks=[TtySink()]):
+                results = run_ops(vc, ops, workers=args.workers, out=out)
+        else:
+            results = run_ops(vc, ops, workers=args.workers, out=out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        vc.disconnect()
+    return 0 if all(el['ok'] for el in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
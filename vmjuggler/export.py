@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# -*- coding: future_fstrings -*-
+
+# MIT License
+#
+# Copyright (c) 2018 Alexandr Malygin
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Row writers used by :meth:`vmjuggler.VCenter.export`.
+
+Every writer takes rows page by page and writes them to the file at once, so only single page is kept in memory.
+"""
+
+import csv
+import datetime
+import json
+import os
+import shutil
+import sys
+import tempfile
+from pyVmomi.VmomiSupport import DataObject, ManagedObject
+
+
+def _scalar(value):
+    """Convert single value to type supported by all output formats"""
+    if isinstance(value, ManagedObject):
+        return value._moId
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, DataObject):
+        return json.dumps(flatten(value), sort_keys=True)
+    if isinstance(value, type):
+        return value.__name__
+    return value
+
+
+def flatten(value, prefix=''):
+    """
+    Flatten property value to dict of scalars.
+
+    Data objects are expanded to "prefix.property" keys, managed objects are replaced by moId,
+    lists are joined by ";".
+
+    :param value: Property value.
+    :param str prefix: Key of the value.
+    :return: dict
+    """
+    if isinstance(value, DataObject):
+        r = {}
+        for prop in value._GetPropertyList():
+            if prop.name in ('dynamicType', 'dynamicProperty'):
+                continue
+            key = f'{prefix}.{prop.name}' if prefix else prop.name
+            r.update(flatten(getattr(value, prop.name), key))
+        return r
+    if isinstance(value, list):
+        return {prefix: ';'.join(str(_scalar(el)) for el in value)}
+    return {prefix: _scalar(value)}
+
+
+def _open_csv(path, mode):
+    """Open file for csv module: binary mode on Python 2, text mode without newline translation on Python 3"""
+    if sys.version_info[0] < 3:
+        return open(path, mode + 'b')
+    return open(path, mode, newline='')
+
+
+class CsvWriter(object):
+    """
+    CSV writer.
+
+    The header has to list all columns, but columns can appear on any page. So rows are written
+    to the "<path>.rows" file first, every row has the columns known by the time it's written,
+    and the file is rewritten to the output under the full header on :meth:`close`.
+
+    :param str path: Output file path.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._rows_path = f'{path}.rows'
+        self._f = _open_csv(self._rows_path, 'w')
+        self._writer = csv.writer(self._f)
+        self._columns = []
+        self._known = set()
+
+    def write(self, rows):
+        """Write page of rows"""
+        for row in rows:
+            for el in row:
+                if el not in self._known:
+                    self._known.add(el)
+                    self._columns.append(el)
+            self._writer.writerow([row.get(el) for el in self._columns])
+
+    def close(self):
+        self._f.close()
+        try:
+            with _open_csv(self._path, 'w') as out, _open_csv(self._rows_path, 'r') as rows:
+                if self._columns:
+                    writer = csv.writer(out)
+                    writer.writerow(self._columns)
+                    width = len(self._columns)
+                    for row in csv.reader(rows):
+                        writer.writerow(row + [''] * (width - len(row)))
+        finally:
+            os.remove(self._rows_path)
+
+
+class JsonLinesWriter(object):
+    """
+    JSON Lines writer.
+
+    :param str path: Output file path.
+    """
+
+    def __init__(self, path):
+        self._f = open(path, 'w')
+
+    def write(self, rows):
+        """Write page of rows"""
+        for row in rows:
+            self._f.write(json.dumps(row, default=str) + '\n')
+
+    def close(self):
+        self._f.close()
+
+
+class ParquetWriter(object):
+    """
+    Parquet writer. Requires :mod:`pyarrow` package.
+
+    Every page is written to its own part file in temporary folder next to the output first, so columns and
+    types can appear on any page. On :meth:`close` schemas of all pages are merged and parts are copied
+    to the output one by one as row groups, columns missing in the page are filled by nulls.
+    ValueError is raised if the same column has different types on different pages.
+
+    :param str path: Output file path.
+    """
+
+    def __init__(self, path):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError('The "pyarrow" package is required to export to Parquet')
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self._path = path
+        self._folder = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(path)))
+        self._parts = []
+        self._schemas = []
+
+    def write(self, rows):
+        """Write page of rows"""
+        if not rows:
+            return
+        table = self._pa.Table.from_pylist(rows)
+        part = os.path.join(self._folder, f'{len(self._parts)}.parquet')
+        self._pq.write_table(table, part)
+        self._parts.append(part)
+        self._schemas.append(table.schema)
+
+    def _schema(self):
+        """Schema of all pages, columns without values on any page are strings"""
+        try:
+            schema = self._pa.unify_schemas(self._schemas)
+        except (self._pa.ArrowInvalid, self._pa.ArrowTypeError) as e:
+            raise ValueError(f'Column types differ between pages: {e}')
+        return self._pa.schema([self._pa.field(el.name, self._pa.string()) if self._pa.types.is_null(el.type) else el
+                                for el in schema])
+
+    def close(self):
+        try:
+            if not self._parts:
+                return
+            schema = self._schema()
+            with self._pq.ParquetWriter(self._path, schema) as writer:
+                for part in self._parts:
+                    table = self._pq.read_table(part)
+                    columns = [table.column(el.name).cast(el.type) if el.name in table.column_names
+                               else self._pa.nulls(len(table), el.type) for el in schema]
+                    writer.write_table(self._pa.Table.from_arrays(columns, schema=schema))
+        finally:
+            shutil.rmtree(self._folder, ignore_errors=True)
+
+
+writers = {'csv': CsvWriter, 'jsonl': JsonLinesWriter, 'parquet': ParquetWriter}  #: Supported formats
+
+
+def get_writer(path, fmt):
+    """
+    Create writer for the format.
+
+    :param str path: Output file path.
+    :param str fmt: One of 'csv', 'jsonl', 'parquet'.
+    :return: Writer object.
+    """
+    if fmt not in writers:
+        raise ValueError(f'Unsupported format "{fmt}", expected one of {sorted(writers)}')
+    return writers[fmt](path)
@@ -0,0 +1,430 @@
+#!/usr/bin/env python
+# -*- coding: future_fstrings -*-
+
+# MIT License
+#
+# Copyright (c) 2018 Alexandr Malygin
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Compact column-oriented table of inventory objects.
+
+:class:`FleetTable` keeps every property as single array instead of object per VM, so 100k+ objects
+take a few MB and filtering, grouping and sorting run over arrays. Numbers are stored in typed arrays,
+everything else (strings, enums, managed objects replaced by moId) is stored as codes into the list of
+distinct values, so repeated values like power state or host are kept once.
+
+If :mod:`numpy` is installed, columns are NumPy arrays and operations are vectorized,
+otherwise the standard :mod:`array` module is used.
+"""
+
+import operator
+from array import array
+from pyVmomi import vim
+from .export import _scalar
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    array('q')
+    _int_code = 'q'  #: Typecode of integer columns
+except ValueError:  # No 64-bit typecode on Python 2
+    _int_code = 'l'
+
+_ops = {'==': operator.eq, '!=': operator.ne, '<': operator.lt, '<=': operator.le, '>': operator.gt,
+        '>=': operator.ge, 'in': lambda a, b: a in b, 'not in': lambda a, b: a not in b}  #: Supported operators
+
+
+def _cell(value):
+    """Convert property value to value kept in the table"""
+    if isinstance(value, list):
+        return ';'.join(str(_scalar(el)) for el in value)
+    return _scalar(value)
+
+
+def _sort_key(value):
+    """Sort key which puts unset values last"""
+    return (value is None, value)
+
+
+class _Categorical(object):
+    """Column of codes into the list of distinct values"""
+
+    def __init__(self, codes, categories):
+        self.codes = codes
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.codes)
+
+    def take(self, idx):
+        return _Categorical(_take(self.codes, idx), self.categories)
+
+    def values(self):
+        return [self.categories[el] for el in self.codes]
+
+    def value(self, i):
+        return self.categories[self.codes[i]]
+
+    def keys(self):
+        """Ranks of values as floats, NaN for unset values, so they are sorted the same way as numeric columns"""
+        order = sorted(range(len(self.categories)), key=lambda i: _sort_key(self.categories[i]))
+        rank = [0.0] * len(order)
+        for i, el in enumerate(order):
+            rank[el] = float('nan') if self.categories[el] is None else float(i)
+        if numpy is not None:
+            return numpy.asarray(rank, dtype=numpy.float64)[self.codes]
+        return [rank[el] for el in self.codes]
+
+    def nbytes(self):
+        return _nbytes(self.codes) + sum(len(el) for el in self.categories if isinstance(el, str))
+
+
+class _Builder(object):
+    """
+    Column filled value by value.
+
+    Column is numeric while all values are numbers or unset and turns to categorical at the first other value.
+    """
+
+    def __init__(self):
+        self.data = None  # array(_int_code) or array('d') of values, array('i') of codes if categorical
+        self.categories = None
+        self._index = None
+        self._unset = 0  # Number of leading unset values while column type is unknown
+
+    def append(self, value):
+        if self.categories is None:
+            if isinstance(value, bool) or not isinstance(value, (int, float, type(None))):
+                self._categorical()
+            elif self.data is None and value is None:
+                self._unset += 1
+                return
+            else:
+                if self.data is None:
+                    self.data = array(_int_code) if isinstance(value, int) and not self._unset else \
+                        array('d', [float('nan')] * self._unset)
+                elif self.data.typecode == _int_code and not isinstance(value, int):
+                    self.data = array('d', self.data)
+                try:
+                    self.data.append(float('nan') if value is None else value)
+                except OverflowError:  # Integer too big for the typecode
+                    self.data = array('d', self.data)
+                    self.data.append(float(value))
+                return
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.categories)
+            self.categories.append(value)
+        self.data.append(code)
+
+    def _categorical(self):
+        """Turn column to categorical keeping values added so far"""
+        values = [None] * self._unset if self.data is None else [None if el != el else el for el in self.data]
+        self.categories = []
+        self._index = {}
+        self.data = array('i')
+        for el in values:
+            self.append(el)
+
+    def finish(self, size):
+        """Return column of given size, missing trailing values are unset"""
+        if self.categories is None and self.data is None:
+            self._categorical()
+        for i in range(size - len(self.data)):
+            self.append(None)
+        if self.categories is None:
+            return numpy.frombuffer(self.data, dtype=self.data.typecode) if numpy is not None else self.data
+        codes = numpy.frombuffer(self.data, dtype=self.data.typecode) if numpy is not None else self.data
+        return _Categorical(codes, self.categories)
+
+
+def _take(col, idx):
+    """Select items of column by indexes"""
+    if numpy is not None:
+        return col[idx]
+    return array(col.typecode, [col[i] for i in idx])
+
+
+def _nbytes(col):
+    return col.nbytes if numpy is not None else col.itemsize * len(col)
+
+
+def _value(col, i):
+    """Single value of numeric column, unset values are None"""
+    v = col[i].item() if numpy is not None else col[i]
+    return None if v != v else v
+
+
+class FleetTable(object):
+    """
+    Compact table of inventory objects, one row per object, one column per property.
+
+    Usually created by :meth:`vmjuggler.VCenter.fleet_table`. Filtering and sorting return new tables which
+    share the distinct values with the original one. The 'moid' column is always present.
+
+    :param dict columns: Dict of {column name: column}, see :meth:`build`.
+    :param stub: SOAP stub of the VCenter session used to materialize objects by :meth:`objects`.
+    :param obj_type: Raw type of the objects, vim.VirtualMachine by default.
+    """
+
+    def __init__(self, columns, stub=None, obj_type=vim.VirtualMachine):
+        self._columns = columns
+        self._stub = stub
+        self.obj_type = obj_type
+
+    @classmethod
+    def build(cls, rows, fields, stub=None, obj_type=vim.VirtualMachine):
+        """
+        Build table from (raw object, properties) pairs.
+
+        Rows are consumed one by one, so only the compact table is kept in memory.
+
+        :param rows: Iterable of (raw object, {property path: value}) tuples, e.g. result of bulk retrieval.
+        :param list fields: List of property paths to keep as columns.
+        :param stub: SOAP stub of the VCenter session.
+        :param obj_type: Raw type of the objects.
+        :return: FleetTable object.
+        """
+        builders = dict((el, _Builder()) for el in ['moid'] + [el for el in fields if el != 'moid'])
+        size = 0
+        for obj, props in rows:
+            builders['moid'].append(obj._moId)
+            for field in fields:
+                if field != 'moid':
+                    builders[field].append(_cell(props.get(field)))
+            size += 1
+        return cls(dict((k, v.finish(size)) for k, v in builders.items()), stub=stub, obj_type=obj_type)
+
+    def __len__(self):
+        return len(self._columns['moid'])
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __getitem__(self, i):
+        """Row as dict of {column name: value}"""
+        return dict((k, v.value(i) if isinstance(v, _Categorical) else _value(v, i))
+                    for k, v in self._columns.items())
+
+    def __repr__(self):
+        return f'<FleetTable: {len(self)} rows, columns {self.columns}>'
+
+    @property
+    def columns(self):
+        """List of column names"""
+        return list(self._columns)
+
+    @property
+    def nbytes(self):
+        """Approximate memory taken by the data, in bytes"""
+        return sum(v.nbytes() if isinstance(v, _Categorical) else _nbytes(v) for v in self._columns.values())
+
+    def _column(self, name):
+        if name not in self._columns:
+            raise KeyError(f'No column "{name}", expected one of {self.columns}')
+        return self._columns[name]
+
+    def column(self, name):
+        """
+        Values of the column.
+
+        :param str name: Column name.
+        :return: List of values, unset values are None.
+        """
+        col = self._column(name)
+        if isinstance(col, _Categorical):
+            return col.values()
+        return [_value(col, i) for i in range(len(col))]
+
+    def take(self, idx):
+        """
+        Select rows by indexes.
+
+        :param idx: List or array of row indexes.
+        :return: FleetTable object.
+        """
+        if numpy is not None:
+            idx = numpy.asarray(idx, dtype=numpy.intp)
+        cols = dict((k, v.take(idx) if isinstance(v, _Categorical) else _take(v, idx))
+                    for k, v in self._columns.items())
+        return FleetTable(cols, stub=self._stub, obj_type=self.obj_type)
+
+    def mask(self, name, value, op='=='):
+        """
+        Check every row against condition.
+
+        For categorical columns the condition is checked once per distinct value, not per row.
+
+        :param str name: Column name.
+        :param value: Value to compare with, collection for 'in' and 'not in'.
+        :param str op: One of '==', '!=', '<', '<=', '>', '>=', 'in', 'not in'.
+        :return: List or array of bools.
+        """
+        if op not in _ops:
+            raise ValueError(f'Unsupported operator "{op}", expected one of {sorted(_ops)}')
+        func = _ops[op]
+        col = self._column(name)
+
+        def check(el):
+            try:
+                return func(el, value)
+            except TypeError:  # E.g. None < 1
+                return False
+
+        if isinstance(col, _Categorical):
+            matched = [i for i, el in enumerate(col.categories) if check(el)]
+            if numpy is not None:
+                return numpy.isin(col.codes, matched)
+            matched = set(matched)
+            return [el in matched for el in col.codes]
+        if numpy is not None:
+            if op in ('in', 'not in'):
+                r = numpy.isin(col, list(value))
+                return r if op == 'in' else ~r
+            if value is None and op in ('==', '!='):
+                r = numpy.isnan(col) if col.dtype.kind == 'f' else numpy.zeros(len(col), dtype=bool)
+                return r if op == '==' else ~r
+            try:
+                return func(col, value)
+            except TypeError:
+                return numpy.zeros(len(col), dtype=bool)
+        return [check(None if el != el else el) for el in col]
+
+    def where(self, name, value, op='=='):
+        """
+        Select rows matching condition, e.g. table.where('runtime.powerState', 'poweredOn').
+
+        :param str name: Column name.
+        :param value: Value to compare with, collection for 'in' and 'not in'.
+        :param str op: One of '==', '!=', '<', '<=', '>', '>=', 'in', 'not in'.
+        :return: FleetTable object.
+        """
+        return self.select(self.mask(name, value, op=op))
+
+    def select(self, mask):
+        """
+        Select rows by mask.
+
+        :param mask: List or array of bools, one per row. Masks can be combined by "&" and "|" if NumPy is used.
+        :return: FleetTable object.
+        """
+        if numpy is not None:
+            return self.take(numpy.flatnonzero(mask))
+        return self.take([i for i, el in enumerate(mask) if el])
+
+    def sort(self, name, reverse=False):
+        """
+        Sort rows by column. Unset values go last.
+
+        :param str name: Column name.
+        :param bool reverse: Sort in descending order.
+        :return: FleetTable object.
+        """
+        col = self._column(name)
+        keys = col.keys() if isinstance(col, _Categorical) else col  # Unset values are NaN in both
+        if numpy is not None:
+            idx = numpy.argsort(keys, kind='stable')
+            if reverse:
+                unset = numpy.isnan(keys[idx]) if keys.dtype.kind == 'f' else numpy.zeros(len(idx), dtype=bool)
+                idx = numpy.concatenate([idx[~unset][::-1], idx[unset]])
+            return self.take(idx)
+        idx = sorted((i for i in range(len(keys)) if keys[i] == keys[i]), key=keys.__getitem__, reverse=reverse)
+        idx.extend(i for i in range(len(keys)) if keys[i] != keys[i])
+        return self.take(idx)
+
+    def _groups(self, name):
+        """Dict of {value: row indexes}"""
+        col = self._column(name)
+        if isinstance(col, _Categorical):
+            keys, decode = col.codes, col.categories.__getitem__
+        else:
+            keys, decode = col, lambda el: None if el != el else el
+        if numpy is not None:
+            codes, inverse = numpy.unique(keys, return_inverse=True)
+            order = numpy.argsort(inverse, kind='stable')
+            bounds = numpy.cumsum(numpy.bincount(inverse, minlength=len(codes)))[:-1]
+            return dict((decode(code.item()), idx) for code, idx in zip(codes, numpy.split(order, bounds)))
+        r = {}
+        for i, el in enumerate(keys):
+            r.setdefault(decode(el), []).append(i)
+        return r
+
+    def group_by(self, name):
+        """
+        Split rows by values of the column.
+
+        :param str name: Column name.
+        :return: Dict of {value: FleetTable}.
+        """
+        return dict((k, self.take(v)) for k, v in self._groups(name).items())
+
+    def counts(self, name):
+        """
+        Number of rows per value of the column.
+
+        :param str name: Column name.
+        :return: Dict of {value: number of rows}.
+        """
+        return dict((k, len(v)) for k, v in self._groups(name).items())
+
+    def sum(self, name, by=None):
+        """
+        Sum of numeric column, unset values are skipped.
+
+        :param str name: Column name.
+        :param str by: Column to group rows by.
+        :return: Sum or dict of {value of 'by' column: sum} if 'by' is set.
+        """
+        col = self._column(name)
+        if isinstance(col, _Categorical):
+            raise ValueError(f'Column "{name}" is not numeric')
+        if by is not None:
+            return dict((k, self._sum(_take(col, v))) for k, v in self._groups(by).items())
+        return self._sum(col)
+
+    @staticmethod
+    def _sum(col):
+        if numpy is not None:
+            return numpy.nansum(col).item()
+        return sum(el for el in col if el == el)
+
+    def objects(self, raw=False):
+        """
+        Create objects for the rows. Call it on filtered table to materialize only selected objects.
+
+        :param bool raw: Raw objects are returned if set, otherwise vmjuggler objects, e.g. 'vmjuggler.VirtualMachine'.
+        :return: List of objects.
+        """
+        from .base_objects import VirtualMachine, Host, Datastore, Network, Folder, Datacenter, VApp
+        wrappers = {vim.VirtualMachine: VirtualMachine, vim.HostSystem: Host, vim.Datastore: Datastore,
+                    vim.Network: Network, vim.Folder: Folder, vim.Datacenter: Datacenter, vim.VirtualApp: VApp}
+        if self._stub is None:
+            raise ValueError('The table is not bound to VCenter session')
+        names = self.column('name') if 'name' in self._columns else [None] * len(self)
+        r = []
+        for moid, name in zip(self.column('moid'), names):
+            obj = self.obj_type(moid, self._stub)
+            r.append(obj if raw or self.obj_type not in wrappers else wrappers[self.obj_type](obj, name=name))
+        return r
@@ -23,34 +23,481 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-from pyVim.task import WaitForTask
+from multiprocessing.pool import ThreadPool
 from pyVmomi import vim, vmodl
+import datetime
 import logging
+import math
+import threading
+import time
+from collections import Counter
+from . import progress
+
+
+class TaskResult(object):
+    """
+    Outcome of the operation with timings.
+
+    Returned by operations instead of True/False if :attr:`VMJHelper.task_results` is set.
+    Evaluates to True on success and to False otherwise, so it can be used as before.
+
+    :param bool success: True if operation succeeded.
+    :param str moid: Task ID, None for operations which don't create task.
+    :param datetime queued: Time the task was queued.
+    :param datetime started: Time the task was started.
+    :param datetime completed: Time the task was completed.
+    :param result: Task result value.
+    :param str fault: Fault type name if operation failed.
+    :param bool timed_out: True if operation was not finished before deadline.
+    """
+
+    def __init__(self, success, moid=None, queued=None, started=None, completed=None, result=None, fault=None,
+                 timed_out=False):
+        self.success = success
+        self.moid = moid
+        self.queued = queued
+        self.started = started
+        self.completed = completed
+        self.result = result
+        self.fault = fault
+        self.timed_out = timed_out
+
+    def __bool__(self):
+        return self.success
+
+    __nonzero__ = __bool__
+
+    def __repr__(self):
+        return (f'TaskResult(success={self.success}, moid={self.moid}, queue_time={self.queue_time}, '
+                f'duration={self.duration}, fault={self.fault}, timed_out={self.timed_out})')
+
+    @property
+    def queue_time(self):
+        """Time in seconds the task spent in queue."""
+        if self.queued is None or self.started is None:
+            return None
+        return (self.started - self.queued).total_seconds()
+
+    @property
+    def duration(self):
+        """Time in seconds from task start to completion."""
+        if self.started is None or self.completed is None:
+            return None
+        return (self.completed - self.started).total_seconds()
+
+    @classmethod
+    def from_task(cls, task, fault=None, timed_out=False):
+        """
+        Build result from finished task.
+
+        :param vim.Task task: Task object.
+        :param Exception fault: Caught exception if any.
+        :param bool timed_out: True if task was not finished before deadline.
+        :return: TaskResult
+        """
+        info = task.info
+        fault_name = type(fault).__name__ if fault is not None else None
+        if fault_name is None and info.error is not None:
+            fault_name = type(info.error).__name__
+        if fault_name is None and timed_out:
+            fault_name = 'DeadlineExceeded'
+        return cls(info.state == vim.TaskInfo.State.success and not timed_out, moid=task._moId,
+                   queued=info.queueTime, started=info.startTime, completed=info.completeTime, result=info.result,
+                   fault=fault_name, timed_out=timed_out)
+
+    @staticmethod
+    def _percentile(values, pct):
+        """Nearest-rank percentile of sorted values"""
+        if not values:
+            return None
+        return values[min(len(values) - 1, max(0, int(math.ceil(pct / 100.0 * len(values))) - 1))]
+
+    @classmethod
+    def combine(cls, results):
+        """
+        Combine results of operation made of several tasks, e.g. removal of many snapshots.
+
+        :param list results: List of TaskResult.
+        :return: TaskResult which succeeded if all results succeeded, timed from the first task queued
+                 to the last one completed. Single result is returned as is.
+        """
+        if len(results) == 1:
+            return results[0]
+        failed = [el for el in results if not el.success]
+
+        def times(attr):
+            return [getattr(el, attr) for el in results if getattr(el, attr) is not None]
+        return cls(not failed, queued=min(times('queued') or [None]), started=min(times('started') or [None]),
+                   completed=max(times('completed') or [None]), result=results,
+                   fault=failed[0].fault if failed else None, timed_out=any(el.timed_out for el in results))
+
+    @classmethod
+    def stats(cls, results):
+        """
+        Aggregate many results.
+
+        :param results: List of TaskResult, dict returned by bulk operation ({item: result})
+                        or list of report rows with "result" key. Other values are ignored.
+        :return: Dict with "count", "succeeded", "failed", "timed_out", "faults" ({fault type: count}) keys
+                 and "p50", "p90", "p99", "max" percentiles for "duration" and "queue_time".
+        """
+        results = list(results.values()) if isinstance(results, dict) else results
+        results = [el.get('result') if isinstance(el, dict) else el for el in results]
+        results = [el for el in results if isinstance(el, cls)]
+        faults = {}
+        for el in results:
+            if el.fault:
+                faults[el.fault] = faults.get(el.fault, 0) + 1
+        r = {'count': len(results),
+             'succeeded': len([el for el in results if el.success]),
+             'failed': len([el for el in results if not el.success and not el.timed_out]),
+             'timed_out': len([el for el in results if el.timed_out]),
+             'faults': faults}
+        for attr in ('duration', 'queue_time'):
+            values = sorted(getattr(el, attr) for el in results if getattr(el, attr) is not None)
+            r[attr] = dict((f'p{pct}', cls._percentile(values, pct)) for pct in (50, 90, 99))
+            r[attr]['max'] = values[-1] if values else None
+        return r
 
 
 class VMJHelper(object):
     """Helper class"""
 
+    task_results = False  #: Return :class:`TaskResult` from operations instead of True/False.
+
+    @staticmethod
+    def deadline(timeout):
+        """
+        Convert timeout to absolute deadline.
+
+        :param float timeout: Timeout in seconds or None.
+        :return: Deadline as time.time() value or None.
+        """
+        return time.time() + timeout if timeout is not None else None
+
     @staticmethod
-    def do_task(func, catch_exception=None, show_progress=True, **kwargs):
+    def remaining(deadline):
+        """
+        Time left till deadline.
+
+        :param float deadline: Deadline as time.time() value or None.
+        :return: Seconds left, 0 if expired, None if there is no deadline.
+        """
+        return max(0, deadline - time.time()) if deadline is not None else None
+
+    @staticmethod
+    def wait_task(task, timeout=None, on_progress=None):
+        """
+        Wait for task completion.
+
+        Uses own PropertyCollector, so tasks may be waited from many threads of the same session at once.
+
+        :param vim.Task task: Task object.
+        :param float timeout: Max time in seconds to wait. Wait forever if not set.
+        :param on_progress: Callback function called with (task, percent or "created"/"completed").
+        :return: True if task finished, False if timeout expired.
+        :raise: Task fault if task failed.
+        """
+        pc_vmodl = vmodl.query.PropertyCollector
+        content = vim.ServiceInstance('ServiceInstance', task._stub).RetrieveContent()
+        pc = content.propertyCollector.CreatePropertyCollector()
+        deadline = VMJHelper.deadline(timeout)
+        try:
+            spec = pc_vmodl.FilterSpec(objectSet=[pc_vmodl.ObjectSpec(obj=task)],
+                                       propSet=[pc_vmodl.PropertySpec(type=vim.Task, all=False,
+                                                                      pathSet=['info.state', 'info.progress'])])
+            pc.CreateFilter(spec, True)
+            if on_progress:
+                on_progress(task, 'created')
+            version = ''
+            state = None
+            while state not in (vim.TaskInfo.State.success, vim.TaskInfo.State.error):
+                left = VMJHelper.remaining(deadline)
+                if left == 0:
+                    return False
+                wait = 60 if left is None else int(math.ceil(min(left, 60)))
+                update = pc.WaitForUpdatesEx(version, pc_vmodl.WaitOptions(maxWaitSeconds=wait))
+                if update is None:
+                    continue
+                version = update.version
+                for fs in update.filterSet:
+                    for obj in fs.objectSet:
+                        for change in obj.changeSet:
+                            if change.name == 'info.state':
+                                state = change.val
+                            elif change.name == 'info.progress' and on_progress and change.val is not None:
+                                on_progress(task, change.val)
+            if state == vim.TaskInfo.State.error:
+                raise task.info.error
+            if on_progress:
+                on_progress(task, 'completed')
+            return True
+        finally:
+            pc.DestroyPropertyCollector()
+
+    @staticmethod
+    def _cancel(task):
+        """Cancel task if it can be cancelled"""
+        try:
+            if task.info.cancelable:
+                task.CancelTask()
+                logging.info(f'Task {task._moId} cancelled')
+        except (vim.fault.InvalidState, vmodl.fault.NotSupported):
+            pass
+
+    @staticmethod
+    def do_task(func, catch_exception=None, show_progress=True, timeout=None, **kwargs):
         """
         Perform task and wait for result.
 
+        If task is not finished in time, it's cancelled when possible and None is returned,
+        so deadline expiry can be told from failure.
+
         :param func: Function to execute.
         :param catch_exception: Exception to catch during execution.
         :param bool show_progress: Show task execution progress if specified.
+        :param float timeout: Max time in seconds to wait for task. Wait forever if not set.
         :param kwargs: Function arguments.
-        :return: True on success, otherwise False.
+        :return: True on success, None if timeout expired, otherwise False.
+                 TaskResult if :attr:`task_results` is set.
+        """
+        tracker = progress.current()
+        if tracker is None:
+            return VMJHelper._do_task(func, catch_exception, show_progress, timeout, **kwargs)
+        with tracker.operation() as operation:
+            r = VMJHelper._do_task(func, catch_exception, lambda task, status: operation.update(status)
+                                   if isinstance(status, int) else None, timeout, **kwargs)
+            operation.report(r)
+        return r
+
+    @staticmethod
+    def _do_task(func, catch_exception, show_progress, timeout, **kwargs):
+        """
+        Perform task and wait for result, see :meth:`do_task`.
+
+        :param show_progress: True/False or callback function to report progress to.
         """
         common_exceptions = [vim.fault.NoPermission]
         exceptions_to_catch = tuple(set(common_exceptions + catch_exception)) if catch_exception else tuple(common_exceptions)
-        on_progress = VMJHelper._show_progress if show_progress else None
+        on_progress = show_progress if callable(show_progress) else VMJHelper._show_progress if show_progress else None
+        if timeout is not None and timeout <= 0:
+            logging.info('Error: Deadline exceeded before task started')
+            return TaskResult(False, fault='DeadlineExceeded', timed_out=True) if VMJHelper.task_results else None
+        task = None
         try:
-            r = WaitForTask(func(**kwargs), raiseOnError=True, onProgressUpdate=on_progress)
-            return r
+            task = func(**kwargs)
+            if not VMJHelper.wait_task(task, timeout=timeout, on_progress=on_progress):
+                logging.info(f'Error: Task {task._moId} is not finished in {timeout}s')
+                VMJHelper._cancel(task)
+                return TaskResult.from_task(task, timed_out=True) if VMJHelper.task_results else None
+            return TaskResult.from_task(task) if VMJHelper.task_results else task.info.state
         except exceptions_to_catch as e:
             logging.info(f'Error: {e.msg}')
-            return False
+            if not VMJHelper.task_results:
+                return False
+            return TaskResult.from_task(task, fault=e) if task is not None else TaskResult(False, fault=type(e).__name__)
+
+    @staticmethod
+    def do(func, catch_exception, **kwargs):
+        """
+        Perform operation which doesn't create task.
+
+        :param func: Function to execute.
+        :param tuple catch_exception: Exceptions to catch during execution.
+        :param kwargs: Function arguments.
+        :return: True on success, otherwise False. TaskResult with local timings if :attr:`task_results` is set.
+        """
+        tracker = progress.current()
+        if tracker is None:
+            return VMJHelper._do(func, catch_exception, **kwargs)
+        with tracker.operation() as operation:
+            r = VMJHelper._do(func, catch_exception, **kwargs)
+            operation.report(r)
+        return r
+
+    @staticmethod
+    def _do(func, catch_exception, **kwargs):
+        """Perform operation which doesn't create task, see :meth:`do`."""
+        started = datetime.datetime.utcnow()
+        try:
+            r = func(**kwargs)
+            if not VMJHelper.task_results:
+                return True
+            return TaskResult(True, queued=started, started=started, completed=datetime.datetime.utcnow(), result=r)
+        except catch_exception as e:
+            logging.info(f'Error: {e.msg}')
+            if not VMJHelper.task_results:
+                return False
+            return TaskResult(False, queued=started, started=started, completed=datetime.datetime.utcnow(),
+                              fault=type(e).__name__)
+
+    @staticmethod
+    def result(value, success=None, started=None, fault=None, timed_out=False):
+        """
+        Result of operation which runs neither task nor single API call, e.g. guest file transfer.
+
+        The result is reported to the progress operation bound to the thread, see :func:`vmjuggler.progress.report`.
+
+        :param value: Value returned as is if :attr:`task_results` is not set.
+        :param bool success: True if operation succeeded. Taken as bool(value) if not specified.
+        :param datetime started: Time the operation was started. Timings are not set if not specified.
+        :param fault: Caught exception or fault type name if operation failed.
+        :param bool timed_out: True if operation was not finished in time.
+        :return: value, or TaskResult if :attr:`task_results` is set.
+        """
+        success = bool(value) if success is None else success
+        # Such operations are counted by progress tracker only if they report the result themselves
+        progress.report(None if timed_out else success)
+        if not VMJHelper.task_results:
+            return value
+        fault = type(fault).__name__ if isinstance(fault, BaseException) else fault
+        if fault is None and timed_out:
+            fault = 'DeadlineExceeded'
+        completed = datetime.datetime.utcnow() if started is not None else None
+        return TaskResult(success and not timed_out, queued=started, started=started, completed=completed,
+                          result=value, fault=fault, timed_out=timed_out)
+
+    @staticmethod
+    def log_stats(results, what='Operations'):
+        """
+        Log summary of bulk operation results if :attr:`task_results` is set.
+
+        :param results: Results of bulk operation, see :meth:`TaskResult.stats`.
+        :param str what: What was done, used as the message prefix.
+        :return: n/a
+        """
+        if not VMJHelper.task_results:
+            return
+        s = TaskResult.stats(results)
+        if s['count']:
+            d = s['duration']
+            logging.info(f'{what}: {s["succeeded"]} succeeded, {s["failed"]} failed, {s["timed_out"]} timed out, '
+                         f'duration p50={d["p50"]}s p90={d["p90"]}s max={d["max"]}s, faults {s["faults"]}')
+
+    @staticmethod
+    def outcome(r):
+        """
+        Normalize operation result for reports.
+
+        :param r: Value returned by operation.
+        :return: TaskResult and None (deadline expired) as is, otherwise bool.
+        """
+        return r if isinstance(r, TaskResult) or r is None else bool(r)
+
+    @staticmethod
+    def parallel(func, items, workers=10):
+        """
+        Call function for every item using pool of threads.
+
+        Progress tracker bound to the calling thread is bound to worker threads too,
+        see :mod:`vmjuggler.progress`.
+
+        :param func: Function to execute. Takes single item as argument.
+        :param list items: Items to process.
+        :param int workers: Max number of concurrent calls.
+        :return: List of results in the same order as items.
+        """
+        items = list(items)
+        if not items:
+            return []
+        func = VMJHelper._with_progress(func, len(items))
+        pool = ThreadPool(min(workers, len(items)))
+        try:
+            return pool.map(func, items, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+    @staticmethod
+    def _with_progress(func, count):
+        """
+        Make function run with progress tracker of the calling thread bound.
+
+        Every call is counted as single operation, see :meth:`vmjuggler.progress.Progress.operation`.
+        If the calling thread is already in operation, calls are counted as part of it.
+
+        :param func: Function to run in worker threads.
+        :param int count: Number of calls, added to tracker's expected total.
+        :return: Wrapped function or the same one if there is no tracker.
+        """
+        tracker = progress.current()
+        if tracker is None:
+            return func
+        parent = progress.current_operation()
+        if parent is None:
+            tracker.expect(count)
+
+        def wrapper(item):
+            with progress.bound(tracker, parent):
+                with tracker.operation():
+                    return func(item)
+        return wrapper
+
+    @staticmethod
+    def schedule(func, items, keys, limits, workers=10):
+        """
+        Call function for every item using pool of threads, limiting number of concurrent calls per resource.
+
+        Items are started in order, but item which resources are all busy is passed over till
+        any of them is released, so busy resources don't hold up the others.
+
+        :param func: Function to execute. Takes single item as argument.
+        :param list items: Items to process.
+        :param keys: Function which takes item and returns list of (kind, id) keys of resources used by the call.
+        :param dict limits: Max number of concurrent calls per resource of kind, e.g. {'host': 4}.
+                            Resources of kinds not listed are limited by 'workers' only.
+        :param int workers: Max number of concurrent calls in total.
+        :return: List of results in the same order as items.
+        :raise: ValueError if 'workers' or any of 'limits' is less than 1, such calls would never start.
+        """
+        bad = [k for k, v in limits.items() if v < 1] + (['workers'] if workers < 1 else [])
+        if bad:
+            raise ValueError(f'Limits must be at least 1: {", ".join(sorted(bad))}')
+        items = list(items)
+        if not items:
+            return []
+        func = VMJHelper._with_progress(func, len(items))
+        item_keys = [set(keys(el)) for el in items]
+        pending = list(range(len(items)))
+        busy = Counter()
+        results = [None] * len(items)
+        errors = []
+        cond = threading.Condition()
+
+        def take():
+            with cond:
+                while pending and not errors:
+                    for i in pending:
+                        if all(busy[k] < limits.get(k[0], workers) for k in item_keys[i]):
+                            pending.remove(i)
+                            busy.update(item_keys[i])
+                            return i
+                    cond.wait()
+                return None
+
+        def run():
+            while True:
+                i = take()
+                if i is None:
+                    return
+                try:
+                    results[i] = func(items[i])
+                except Exception as e:
+                    with cond:
+                        errors.append(e)
+                finally:
+                    with cond:
+                        busy.subtract(item_keys[i])
+                        cond.notify_all()
+
+        threads = [threading.Thread(target=run) for _ in range(min(workers, len(items)))]
+        for el in threads:
+            el.start()
+        for el in threads:
+            el.join()
+        if errors:
+            raise errors[0]
+        return results
 
     @staticmethod
     def _show_progress(task, status):
@@ -72,7 +519,12 @@ class VMJHelper(object):
 
 
 class Logger(object):
-    """Set the logging"""
+    """
+    Set the logging
+
+    vmjuggler writes messages by :mod:`logging` and never configures it by itself.
+    Scripts call :meth:`set` to print the messages to the console.
+    """
 
     log_level = logging.INFO  #: Log level
     log_format = '%(message)s'  #: Message format
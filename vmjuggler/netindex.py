@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: future_fstrings -*-
+
+# MIT License
+#
+# Copyright (c) 2018 Alexandr Malygin
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from collections import namedtuple
+
+#: Network entry of :class:`NetworkIndex`.
+#: The 'key' and 'dvs_uuid' are set for distributed port groups only, 'vlan' is None if not known or trunk,
+#: the 'vms' and 'hosts' are lists of moIds.
+NetworkInfo = namedtuple('NetworkInfo', ['moid', 'name', 'type', 'obj', 'key', 'dvs_uuid', 'dvs_name', 'vlan',
+                                         'vms', 'hosts'])
+
+
+class NetworkIndex(object):
+    """
+    In-memory index of networks, built by :meth:`vmjuggler.VCenter.network_index`.
+
+    :param list networks: List of NetworkInfo.
+    """
+
+    def __init__(self, networks):
+        self.networks = dict((el.moid, el) for el in networks)  #: Dict of {network moId: NetworkInfo}.
+        self.by_name = {}  #: Dict of {network name: [NetworkInfo]}.
+        self.by_key = {}  #: Dict of {port group key: NetworkInfo}.
+        self.by_dvs = {}  #: Dict of {DVS UUID: [NetworkInfo]}.
+        self.by_vlan = {}  #: Dict of {VLAN ID: [NetworkInfo]}.
+        self.by_vm = {}  #: Dict of {VM moId: [NetworkInfo]}.
+        self.by_host = {}  #: Dict of {Host moId: [NetworkInfo]}.
+        for el in networks:
+            self.by_name.setdefault(el.name, []).append(el)
+            if el.key is not None:
+                self.by_key[el.key] = el
+            if el.dvs_uuid is not None:
+                self.by_dvs.setdefault(el.dvs_uuid, []).append(el)
+            if el.vlan is not None:
+                self.by_vlan.setdefault(el.vlan, []).append(el)
+            for vm in el.vms:
+                self.by_vm.setdefault(vm, []).append(el)
+            for host in el.hosts:
+                self.by_host.setdefault(host, []).append(el)
+
+    def find(self, name=None, key=None, vlan=None, dvs_uuid=None):
+        """
+        Find networks matching all given criteria.
+
+        :param str name: Network name.
+        :param str key: Distributed port group key.
+        :param int vlan: VLAN ID.
+        :param str dvs_uuid: Distributed switch UUID.
+        :return: List of NetworkInfo.
+        """
+        r = list(self.networks.values())
+        if name is not None:
+            r = [el for el in r if el.name == name]
+        if key is not None:
+            r = [el for el in r if el.key == key]
+        if vlan is not None:
+            r = [el for el in r if el.vlan == vlan]
+        if dvs_uuid is not None:
+            r = [el for el in r if el.dvs_uuid == dvs_uuid]
+        return r
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: future_fstrings -*-
+
+# MIT License
+#
+# Copyright (c) 2018 Alexandr Malygin
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Helpers for OVF export and import used by :meth:`vmjuggler.VirtualMachine.export_ovf`
+and :meth:`vmjuggler.VCenter.import_ovf`.
+"""
+
+import logging
+import os
+import tarfile
+import threading
+from pyVmomi import vim, vmodl
+
+
+class NfcLease(object):
+    """
+    HttpNfcLease wrapper which keeps the lease alive while files are transferred.
+
+    Transferred bytes are counted by :meth:`add` and progress is reported to VCenter every :attr:`keepalive`
+    seconds, otherwise the lease expires during long transfers. Used as context manager: the lease is completed
+    on exit from the 'with' block or aborted if the block raised exception.
+
+    :param vim.HttpNfcLease lease: Lease returned by ExportVm or ImportVApp.
+    :param int total: Expected number of bytes to transfer.
+    """
+
+    keepalive = 30  #: Interval in seconds between progress updates.
+    poll_interval = 1  #: Interval in seconds between lease state checks while it's initializing.
+
+    def __init__(self, lease, total=0):
+        self.lease = lease
+        self.total = total
+        self.done = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        while self.lease.state == vim.HttpNfcLease.State.initializing:
+            self._stop.wait(self.poll_interval)
+        if self.lease.state == vim.HttpNfcLease.State.error:
+            raise self.lease.error
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if exc_type is None:
+            self.lease.HttpNfcLeaseProgress(100)
+            self.lease.HttpNfcLeaseComplete()
+        else:
+            try:
+                self.lease.HttpNfcLeaseAbort()
+            except vmodl.MethodFault as e:
+                logging.debug(f'Lease abort failed: {e.msg}')
+        return False
+
+    @property
+    def info(self):
+        """Lease info, see vim.HttpNfcLease.Info."""
+        return self.lease.info
+
+    @property
+    def percent(self):
+        """Transfer progress. Never reaches 100 till the lease is completed."""
+        with self._lock:
+            return min(99, int(self.done * 100 / self.total)) if self.total else 0
+
+    def add(self, size):
+        """
+        Count transferred bytes. Thread safe, may be passed as progress callback to transfer methods.
+
+        :param int size: Number of bytes.
+        :return: n/a
+        """
+        with self._lock:
+            self.done += size
+
+    def _run(self):
+        while not self._stop.wait(self.keepalive):
+            percent = self.percent
+            try:
+                self.lease.HttpNfcLeaseProgress(percent)
+                logging.debug(f'Transferred {percent}%')
+            except vmodl.MethodFault as e:
+                logging.debug(f'Lease progress update failed: {e.msg}')
+
+
+class OvfSource(object):
+    """
+    OVF package opened for import.
+
+    Either '.ovf' descriptor with files next to it or '.ova' archive. Files of '.ova' are read straight
+    from the archive by their offsets, so the archive is never extracted and files may be read in parallel.
+
+    :param str path: Path to the '.ovf' or '.ova' file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._members = None
+        if path.lower().endswith('.ova'):
+            self._members = {}
+            with tarfile.open(path) as tar:
+                for el in tar:
+                    if el.isfile():
+                        self._members[el.name] = (el.offset_data, el.size)
+            names = [el for el in self._members if el.lower().endswith('.ovf')]
+            if not names:
+                raise ValueError(f'No OVF descriptor in "{path}"')
+            self._descriptor = names[0]
+        else:
+            self._descriptor = os.path.basename(path)
+
+    @property
+    def descriptor(self):
+        """OVF descriptor content."""
+        f, size = self.open(self._descriptor)
+        with f:
+            return f.read(size).decode('utf-8')
+
+    def size(self, name):
+        """
+        Size of the package file.
+
+        :param str name: File path relative to the descriptor.
+        :return: Size in bytes.
+        """
+        if self._members is not None:
+            return self._members[name][1]
+        return os.path.getsize(os.path.join(os.path.dirname(self.path), name))
+
+    def open(self, name):
+        """
+        Open package file for reading.
+
+        :param str name: File path relative to the descriptor.
+        :return: Tuple (file object positioned at the file start, size).
+        """
+        if self._members is None:
+            path = os.path.join(os.path.dirname(self.path), name)
+            return open(path, 'rb'), os.path.getsize(path)
+        offset, size = self._members[name]
+        f = open(self.path, 'rb')
+        f.seek(offset)
+        return f, size
+
+
+def write_ova(path, files):
+    """
+    Pack files to OVA archive.
+
+    The archive is written as a stream, files are copied by chunks in the given order,
+    so descriptor must be the first one.
+
+    :param str path: Path to the '.ova' file. Overwritten if exists.
+    :param list files: Paths of the files to pack.
+    :return: n/a
+    """
+    # GNU format keeps sizes over 8 GB which don't fit USTAR header
+    with tarfile.open(path, 'w|', format=tarfile.GNU_FORMAT) as tar:
+        for el in files:
+            tar.add(el, arcname=os.path.basename(el))
@@ -0,0 +1,338 @@
+#!/usr/bin/env python
+# -*- coding: future_fstrings -*-
+
+# MIT License
+#
+# Copyright (c) 2018 Alexandr Malygin
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Aggregated progress of bulk operations.
+
+:class:`Progress` tracks all in-flight operations in single structure and renders aggregate counts,
+throughput and ETA to its sinks not more often than once per :attr:`Progress.interval` seconds.
+Used as context manager, it's picked up by :meth:`vmjuggler.helpers.VMJHelper.do_task` and
+:meth:`vmjuggler.helpers.VMJHelper.do` in the same thread and in threads started by
+:meth:`vmjuggler.helpers.VMJHelper.parallel`, which report to it instead of logging every task.
+Every item processed by :meth:`vmjuggler.helpers.VMJHelper.parallel` is counted as single operation
+however many tasks it runs, see :meth:`Progress.operation`::
+
+    with Progress(sinks=[TtySink()]):
+        vc.reconfigure(vms, memory_mb=4096)
+"""
+
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+def current():
+    """
+    Progress tracker bound to the current thread.
+
+    :return: Progress object or None.
+    """
+    return getattr(_local, 'progress', None)
+
+
+def current_operation():
+    """
+    Operation bound to the current thread, see :meth:`Progress.operation`.
+
+    :return: Operation object or None.
+    """
+    return getattr(_local, 'operation', None)
+
+
+def report(result):
+    """
+    Report result of the operation bound to the current thread. Ignored if there is no operation.
+
+    :param result: Result of the operation, see :meth:`Progress.operation`.
+    :return: n/a
+    """
+    operation = current_operation()
+    if operation is not None:
+        operation.report(result)
+
+
+@contextmanager
+def bound(progress, operation=None):
+    """
+    Bind progress tracker to the current thread for the duration of 'with' block.
+
+    :param Progress progress: Progress object or None.
+    :param operation: Operation of the tracker to bind too, so calls in the thread are counted as part of it.
+    """
+    previous = current(), current_operation()
+    _local.progress = progress
+    _local.operation = operation
+    try:
+        yield progress
+    finally:
+        _local.progress, _local.operation = previous
+
+
+def _duration(seconds):
+    """Format seconds as H:MM:SS"""
+    seconds = int(seconds)
+    return f'{seconds // 3600}:{seconds % 3600 // 60:02}:{seconds % 60:02}'
+
+
+class TtySink(object):
+    """
+    Render progress as single line bar rewritten in place.
+
+    :param stream: Stream to write to. Default sys.stderr used if not specified.
+    :param int width: Bar width in characters.
+    """
+
+    def __init__(self, stream=None, width=30):
+        self.stream = stream if stream is not None else sys.stderr
+        self.width = width
+
+    def render(self, state):
+        percent = state['percent']
+        filled = int(self.width * percent / 100)
+        total = state['total'] if state['total'] is not None else '?'
+        eta = _duration(state['eta']) if state['eta'] is not None else '-'
+        label = f'{state["label"]} ' if state['label'] else ''
+        line = (f'\r{label}[{"#" * filled}{"." * (self.width - filled)}] {percent:5.1f}% '
+                f'{state["done"]}/{total} done, {state["failed"]} failed, {state["timed_out"]} timed out, '
+                f'{state["running"]} running, '
+                f'{state["rate"]:.2f} ops/s, ETA {eta}')
+        self.stream.write(line)
+        self.stream.flush()
+
+    def close(self):
+        self.stream.write('\n')
+        self.stream.flush()
+
+
+class LogSink(object):
+    """
+    Write progress as single log record of key=value pairs.
+
+    The state is also attached to the record as 'progress' attribute for structured log handlers.
+
+    :param logger: Logger to write to. Root logger used if not specified.
+    :param int level: Log level.
+    """
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger if logger is not None else logging.getLogger()
+        self.level = level
+
+    def render(self, state):
+        msg = ' '.join(f'{k}={round(v, 2) if isinstance(v, float) else v}' for k, v in sorted(state.items()))
+        self.logger.log(self.level, f'Progress {msg}', extra={'progress': state})
+
+    def close(self):
+        pass
+
+
+class CallbackSink(object):
+    """
+    Pass progress state to the function.
+
+    :param fn: Function which takes state dict, see :meth:`Progress.state`.
+    """
+
+    def __init__(self, fn):
+        self.fn = fn
+
+    def render(self, state):
+        self.fn(state)
+
+    def close(self):
+        pass
+
+
+class Progress(object):
+    """
+    Progress tracker of bulk operation.
+
+    Thread safe. Every operation is started, updated and finished by its key, or by :meth:`operation`.
+
+    :param int total: Expected number of operations. If not set, it's counted from items passed to
+                      :meth:`vmjuggler.helpers.VMJHelper.parallel` while the tracker is bound.
+    :param list sinks: Sinks to render progress to. :class:`LogSink` used if not specified.
+    :param float interval: Min time in seconds between renders.
+    :param str label: Text rendered before progress.
+    """
+
+    interval = 1.0  #: Default min time in seconds between renders.
+
+    def __init__(self, total=None, sinks=None, interval=None, label=''):
+        self.total = total
+        self.sinks = sinks if sinks is not None else [LogSink()]
+        self.interval = interval if interval is not None else self.interval
+        self.label = label
+        self._auto_total = total is None
+        self._lock = threading.Lock()
+        self._running = {}  # key -> percent
+        self._done = 0
+        self._failed = 0
+        self._timed_out = 0
+        self._started = time.time()
+        self._rendered = 0
+
+    def __enter__(self):
+        self._previous = current()
+        _local.progress = self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _local.progress = self._previous
+        self.close()
+        return False
+
+    def expect(self, count):
+        """
+        Add operations to expected total if it was not set on creation.
+
+        :param int count: Number of operations.
+        :return: n/a
+        """
+        if self._auto_total:
+            with self._lock:
+                self.total = (self.total or 0) + count
+
+    def start(self, key):
+        """Mark operation as started."""
+        with self._lock:
+            self._running[key] = 0
+        self._render()
+
+    def update(self, key, percent):
+        """Set operation progress in percent."""
+        with self._lock:
+            self._running[key] = percent
+        self._render()
+
+    def finish(self, key, success=True):
+        """Mark operation as finished. The 'success' is True, False or None if operation timed out."""
+        with self._lock:
+            self._running.pop(key, None)
+            if success is None:
+                self._timed_out += 1
+            elif success:
+                self._done += 1
+            else:
+                self._failed += 1
+        self._render()
+
+    @contextmanager
+    def operation(self):
+        """
+        Count 'with' block as single operation.
+
+        The operation is bound to the current thread. Tasks run in the block update its progress and
+        report their results to it instead of being counted separately, the last reported result wins.
+        Result is reported by :meth:`_Operation.report` or :func:`report`: None or TaskResult with 'timed_out'
+        set is counted as timeout, other values as success or failure by their truth value.
+        The operation succeeds if nothing is reported and fails if the block raises exception.
+        If the thread is already in operation of this tracker, the block is counted as part of it.
+
+        :return: Context manager which yields operation object.
+        """
+        operation = current_operation()
+        if operation is not None and operation.progress is self:
+            yield operation
+            return
+        operation = _Operation(self)
+        self.start(operation)
+        previous = current_operation()
+        _local.operation = operation
+        try:
+            yield operation
+        except BaseException:
+            operation.success = False
+            raise
+        finally:
+            _local.operation = previous
+            self.finish(operation, operation.success)
+
+    def state(self):
+        """
+        Aggregated progress.
+
+        :return: Dict with 'label', 'total', 'done', 'failed', 'timed_out', 'running', 'percent', 'rate' (finished
+                 operations per second), 'elapsed' and 'eta' (seconds, None if unknown) keys.
+        """
+        with self._lock:
+            running = len(self._running)
+            partial = sum(self._running.values())
+            done, failed, timed_out = self._done, self._failed, self._timed_out
+            total = self.total
+        finished = done + failed + timed_out
+        elapsed = time.time() - self._started
+        rate = finished / elapsed if elapsed > 0 else 0.0
+        percent = min(100.0, (finished * 100 + partial) / total) if total else 0.0
+        # Never negative, even if more operations finished than expected
+        eta = max(0.0, (total - finished) / rate) if total is not None and rate > 0 else None
+        return {'label': self.label, 'total': total, 'done': done, 'failed': failed, 'timed_out': timed_out,
+                'running': running, 'percent': percent, 'rate': rate, 'elapsed': elapsed, 'eta': eta}
+
+    def _render(self, force=False):
+        now = time.time()
+        with self._lock:
+            if not force and now - self._rendered < self.interval:
+                return
+            self._rendered = now
+        state = self.state()
+        for el in self.sinks:
+            el.render(state)
+
+    def close(self):
+        """Render final state and close sinks."""
+        self._render(force=True)
+        for el in self.sinks:
+            el.close()
+
+
+class _Operation(object):
+    """
+    Operation counted by :meth:`Progress.operation`.
+
+    :param Progress progress: Tracker the operation belongs to.
+    """
+
+    def __init__(self, progress):
+        self.progress = progress
+        self.success = True  #: True, False or None if timed out.
+
+    def update(self, percent):
+        """Set operation progress in percent."""
+        self.progress.update(self, percent)
+
+    def report(self, result):
+        """
+        Set result of the operation.
+
+        :param result: None or TaskResult with 'timed_out' set for timeout, other values are judged by truth value.
+        :return: n/a
+        """
+        self.success = None if result is None or getattr(result, 'timed_out', False) else bool(result)
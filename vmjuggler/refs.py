@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: future_fstrings -*-
+
+# MIT License
+#
+# Copyright (c) 2018 Alexandr Malygin
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from collections import namedtuple
+
+
+class ObjectRef(namedtuple('ObjectRef', ['moid', 'obj_type', 'vc'])):
+    """
+    Picklable reference to VCenter managed object.
+
+    Unlike vmjuggler objects it's not bound to connection, so it can be passed to other processes
+    and turned back to vmjuggler object there by :meth:`vmjuggler.VCenter.resolve`.
+
+    :param str moid: Managed object ID, e.g. 'vm-42'.
+    :param str obj_type: Managed object type name, e.g. 'vim.VirtualMachine'.
+    :param str vc: Address of VCenter the object belongs to.
+    """
+    __slots__ = ()
+
+
+_worker_vc = None  # VCenter attached to parent's session, one per worker process
+
+
+def _worker_init(address, cookie, version):
+    """Attach worker process to the parent's VCenter session"""
+    global _worker_vc
+    from .base_objects import VCenter
+    _worker_vc = VCenter.attach(address, cookie, version)
+
+
+def _worker_call(args):
+    """Resolve reference and call the function in worker process"""
+    from .base_objects import BaseVCObject
+    fn, ref = args
+    r = fn(_worker_vc.resolve(ref))
+    return r.ref if isinstance(r, BaseVCObject) else r
@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+# -*- coding: future_fstrings -*-
+
+# MIT License
+#
+# Copyright (c) 2018 Alexandr Malygin
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import os
+import threading
+import requests
+from multiprocessing.pool import ThreadPool
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.exceptions import InsecureRequestWarning
+
+try:
+    from urllib.parse import urlparse, urlunparse
+except ImportError:
+    from urlparse import urlparse, urlunparse
+
+requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+
+TransferError = requests.RequestException  #: Base exception raised by transfer methods on HTTP errors.
+
+
+class _Reader(object):
+    """File object wrapper which reads not more than 'size' bytes and reports every read to callback"""
+
+    def __init__(self, f, size, progress=None):
+        self._f = f
+        self._left = size
+        self._progress = progress
+
+    def __len__(self):
+        return self._left
+
+    def read(self, size=-1):
+        if self._left <= 0:
+            return b''
+        size = self._left if size is None or size < 0 else min(size, self._left)
+        data = self._f.read(size)
+        self._left -= len(data)
+        if self._progress is not None and data:
+            self._progress(len(data))
+        return data
+
+
+class HttpTransfer(object):
+    """
+    Streaming file transfer over pooled HTTP session.
+
+    All transfers share the single session, so TCP/TLS connections are reused between calls and threads.
+    Files are never loaded into memory, data is moved by chunks of :attr:`chunk_size` bytes.
+    """
+
+    chunk_size = 1024 * 1024  #: Size of the single read/write operation.
+    part_size = 64 * 1024 * 1024  #: Size of the byte range downloaded by single worker at once.
+    pool_size = 32  #: Max number of kept alive connections per host.
+    _session = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def session(cls):
+        """
+        Return shared HTTP session.
+
+        Certificates are not verified, same as for the VCenter connection.
+
+        :return: requests.Session object.
+        """
+        with cls._lock:
+            if cls._session is None:
+                adapter = HTTPAdapter(pool_connections=cls.pool_size, pool_maxsize=cls.pool_size)
+                session = requests.Session()
+                session.verify = False
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                cls._session = session
+            return cls._session
+
+    @staticmethod
+    def fix_host(url, host):
+        """
+        Replace the '*' host placeholder in URL returned by VCenter with real host name.
+
+        :param str url: URL to fix.
+        :param str host: Host name to use.
+        :return: Fixed URL.
+        """
+        parts = urlparse(url)
+        if parts.hostname != '*':
+            return url
+        netloc = parts.netloc.replace('*', host, 1)
+        return urlunparse(parts._replace(netloc=netloc))
+
+    @staticmethod
+    def _headers(cookie=None, headers=None):
+        r = dict(headers) if headers else {}
+        if cookie:
+            r['Cookie'] = cookie
+        return r
+
+    @classmethod
+    def upload(cls, url, local_path, cookie=None, method='PUT', headers=None, progress=None):
+        """
+        Stream local file to URL.
+
+        :param str url: Destination URL.
+        :param str local_path: Path to the local file.
+        :param str cookie: Session cookie, if required by the endpoint.
+        :param str method: HTTP method.
+        :param dict headers: Extra request headers.
+        :param progress: Callback function called with number of bytes sent by every chunk.
+        :return: requests.Response object.
+        """
+        with open(local_path, 'rb') as f:
+            return cls.upload_stream(url, f, os.path.getsize(local_path), cookie=cookie, method=method,
+                                     headers=headers, progress=progress)
+
+    @classmethod
+    def upload_stream(cls, url, f, size, cookie=None, method='PUT', headers=None, progress=None):
+        """
+        Stream 'size' bytes from file object to URL, starting at its current position.
+
+        :param str url: Destination URL.
+        :param f: File object opened in binary mode.
+        :param int size: Number of bytes to send.
+        :param str cookie: Session cookie, if required by the endpoint.
+        :param str method: HTTP method.
+        :param dict headers: Extra request headers.
+        :param progress: Callback function called with number of bytes sent by every chunk.
+        :return: requests.Response object.
+        """
+        headers = cls._headers(cookie, headers)
+        headers.setdefault('Content-Type', 'application/octet-stream')
+        headers['Content-Length'] = str(size)
+        r = cls.session().request(method, url, data=_Reader(f, size, progress), headers=headers)
+        r.raise_for_status()
+        return r
+
+    @classmethod
+    def download(cls, url, local_path, cookie=None, headers=None, progress=None):
+        """
+        Stream URL content to local file.
+
+        :param str url: Source URL.
+        :param str local_path: Path to the local file. Overwritten if exists.
+        :param str cookie: Session cookie, if required by the endpoint.
+        :param dict headers: Extra request headers.
+        :param progress: Callback function called with number of bytes received by every chunk.
+        :return: Number of bytes written.
+        """
+        size = 0
+        r = cls.session().get(url, headers=cls._headers(cookie, headers), stream=True)
+        try:
+            r.raise_for_status()
+            with open(local_path, 'wb') as f:
+                for chunk in r.iter_content(chunk_size=cls.chunk_size):
+                    f.write(chunk)
+                    size += len(chunk)
+                    if progress is not None:
+                        progress(len(chunk))
+        finally:
+            r.close()
+        return size
+
+    @classmethod
+    def _probe(cls, url, cookie=None):
+        """
+        Return size of the remote file and whether byte ranges are supported.
+
+        :param str url: Source URL.
+        :param str cookie: Session cookie, if required by the endpoint.
+        :return: Tuple (size or None, bool).
+        """
+        r = cls.session().get(url, headers=cls._headers(cookie, {'Range': 'bytes=0-0'}), stream=True)
+        try:
+            r.raise_for_status()
+            content_range = r.headers.get('Content-Range', '')
+            if r.status_code == 206 and '/' in content_range and not content_range.endswith('*'):
+                return int(content_range.rsplit('/', 1)[1]), True
+            size = r.headers.get('Content-Length')
+            return (int(size) if size else None), False
+        finally:
+            r.close()
+
+    @classmethod
+    def download_ranges(cls, url, local_path, cookie=None, workers=4, resume=True):
+        """
+        Download URL content to local file by parallel byte ranges.
+
+        The local file is preallocated and every worker writes its ranges straight to their offsets.
+        Completed ranges are recorded in the "<local_path>.part" file, so interrupted download continues
+        from where it stopped if resume is set. Falls back to the single stream if ranges are not supported.
+        Range is recorded only if server answered with HTTP 206 and sent exactly the requested number of bytes,
+        otherwise TransferError is raised and the range is downloaded again on resume.
+
+        :param str url: Source URL.
+        :param str local_path: Path to the local file.
+        :param str cookie: Session cookie, if required by the endpoint.
+        :param int workers: Number of parallel ranges.
+        :param bool resume: If set, continue previously interrupted download.
+        :return: Number of bytes in the file.
+        """
+        size, ranges = cls._probe(url, cookie)
+        if not ranges or not size or size <= cls.part_size:
+            return cls.download(url, local_path, cookie=cookie)
+
+        state_path = f'{local_path}.part'
+        done = set()
+        if resume and os.path.exists(state_path) and os.path.exists(local_path):
+            with open(state_path) as f:
+                state = json.load(f)
+            if state.get('size') == size and state.get('part_size') == cls.part_size:
+                done = set(state['done'])
+        if not done:
+            with open(local_path, 'wb') as f:
+                f.truncate(size)
+
+        lock = threading.Lock()
+
+        def save_state():
+            with open(state_path, 'w') as sf:
+                json.dump({'size': size, 'part_size': cls.part_size, 'done': sorted(done)}, sf)
+
+        def fetch(part):
+            start = part * cls.part_size
+            end = min(start + cls.part_size, size) - 1
+            headers = cls._headers(cookie, {'Range': f'bytes={start}-{end}'})
+            r = cls.session().get(url, headers=headers, stream=True)
+            try:
+                r.raise_for_status()
+                if r.status_code != 206:
+                    raise TransferError(f'Range {start}-{end} is not supported by server, got HTTP {r.status_code}',
+                                        response=r)
+                received = 0
+                with open(local_path, 'r+b') as lf:
+                    lf.seek(start)
+                    for chunk in r.iter_content(chunk_size=cls.chunk_size):
+                        received += len(chunk)
+                        if received > end - start + 1:
+                            break
+                        lf.write(chunk)
+                if received != end - start + 1:
+                    raise TransferError(f'Range {start}-{end} is incomplete, got {received} bytes of '
+                                        f'{end - start + 1}', response=r)
+            finally:
+                r.close()
+            with lock:
+                done.add(part)
+                save_state()
+
+        save_state()
+        parts = [el for el in range((size + cls.part_size - 1) // cls.part_size) if el not in done]
+        if parts:
+            pool = ThreadPool(min(workers, len(parts)))
+            try:
+                pool.map(fetch, parts, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+        os.remove(state_path)
+        return size
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: future_fstrings -*-
+
+# MIT License
+#
+# Copyright (c) 2018 Alexandr Malygin
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Record/replay transport for VCenter SOAP calls.
+
+:class:`Recorder` stores every SOAP request/response pair made through the connection with its timing,
+:class:`Replayer` serves them back without network. Both are passed to :meth:`vmjuggler.VCenter.connect`.
+
+The recording is gzip compressed JSON lines file. The first line keeps API version of the session,
+every other line is single call: request hash, response status, headers, body and elapsed time.
+"""
+
+import base64
+import collections
+import gzip
+import hashlib
+import json
+import threading
+import time
+from io import BytesIO
+from pyVmomi import vim, SoapStubAdapter
+
+
+def _key(body):
+    """Key to match replayed request with recorded one"""
+    body = body.encode('utf-8') if not isinstance(body, bytes) else body
+    return hashlib.sha1(body).hexdigest()
+
+
+class _Response(object):
+    """HTTP response served from memory"""
+
+    def __init__(self, status, reason, headers, body):
+        self.status = status
+        self.reason = reason
+        self._headers = headers
+        self._fd = BytesIO(body)
+
+    def getheader(self, name, default=None):
+        return self._headers.get(name.lower(), default)
+
+    def read(self, size=-1):
+        return self._fd.read(size)
+
+
+class _RecordingConnection(object):
+    """Wrapper for HTTP connection which writes every request/response pair to recorder"""
+
+    def __init__(self, recorder, conn):
+        self._recorder = recorder
+        self._conn = conn
+        self._body = None
+        self._started = None
+
+    def __getattr__(self, item):
+        return getattr(self._conn, item)
+
+    def request(self, method, url, body=None, headers=None):
+        self._body = body
+        self._started = time.time()
+        self._conn.request(method, url, body, headers or {})
+
+    def getresponse(self):
+        resp = self._conn.getresponse()
+        body = resp.read()
+        elapsed = time.time() - self._started
+        headers = {}
+        for name in ('content-encoding', 'set-cookie'):
+            value = resp.getheader(name)
+            if value is not None:
+                headers[name] = value
+        self._recorder.write(self._body, resp.status, resp.reason, headers, body, elapsed)
+        return _Response(resp.status, resp.reason, headers, body)
+
+
+class _ReplayConnection(object):
+    """HTTP connection which serves responses from replayer"""
+
+    def __init__(self, replayer):
+        self._replayer = replayer
+        self._body = None
+        self.sock = None
+
+    def request(self, method, url, body=None, headers=None):
+        self._body = body
+
+    def getresponse(self):
+        return self._replayer.read(self._body)
+
+    def close(self):
+        pass
+
+
+class Recorder(object):
+    """
+    Record SOAP calls to file.
+
+    Calls are recorded from the moment the session is established, login itself is not recorded.
+
+    :param str path: Path to the recording file. Overwritten if exists.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._f = None
+
+    def install(self, stub):
+        """
+        Start recording calls of the stub.
+
+        :param SoapStubAdapter stub: Stub of connected ServiceInstance.
+        :return: n/a
+        """
+        self._f = gzip.open(self.path, 'wt')
+        self._f.write(json.dumps({'version': stub.version}) + '\n')
+        scheme = stub.scheme
+        stub.DropConnections()  # Connections already in the pool would bypass recording
+        stub.scheme = lambda host, **kwargs: _RecordingConnection(self, scheme(host, **kwargs))
+
+    def write(self, request, status, reason, headers, body, elapsed):
+        """Write single call to the recording"""
+        line = json.dumps({'key': _key(request),
+                           'status': status,
+                           'reason': reason,
+                           'headers': headers,
+                           'body': base64.b64encode(body).decode('ascii'),
+                           'elapsed': round(elapsed, 6)})
+        with self._lock:
+            self._f.write(line + '\n')
+
+    def close(self):
+        """Finish recording and close the file."""
+        with self._lock:
+            if self._f is not None:
+                self._f.close()
+                self._f = None
+
+
+class Replayer(object):
+    """
+    Serve SOAP calls from recording without network.
+
+    Requests are matched with recorded ones by content, repeated requests get responses in recorded order.
+    Once recorded responses for the request are over, the last one is served again.
+
+    :param str path: Path to the recording made by :class:`Recorder`.
+    :param bool realtime: If set, every response is delayed by recorded time, otherwise served at once.
+    """
+
+    def __init__(self, path, realtime=False):
+        self.path = path
+        self.realtime = realtime
+        self._lock = threading.Lock()
+        self._calls = collections.defaultdict(collections.deque)
+        with gzip.open(path, 'rt') as f:
+            self.version = json.loads(f.readline())['version']
+            for line in f:
+                call = json.loads(line)
+                self._calls[call['key']].append(call)
+
+    def connect(self, address):
+        """
+        Create ServiceInstance served by this replayer.
+
+        :param str address: VCenter address the recording was made for.
+        :return: vim.ServiceInstance object.
+        """
+        stub = SoapStubAdapter(host=address, version=self.version)
+        stub.scheme = lambda host, **kwargs: _ReplayConnection(self)
+        return vim.ServiceInstance('ServiceInstance', stub)
+
+    def read(self, request):
+        """
+        Return recorded response for request.
+
+        :param request: Serialized SOAP request.
+        :return: HTTP response object.
+        """
+        key = _key(request)
+        with self._lock:
+            calls = self._calls.get(key)
+            if not calls:
+                raise KeyError(f'No recorded response for request {key}')
+            call = calls.popleft() if len(calls) > 1 else calls[0]
+        if self.realtime:
+            time.sleep(call['elapsed'])
+        return _Response(call['status'], call['reason'], call['headers'], base64.b64decode(call['body']))
+
+    def close(self):
+        """Nothing to close, exists for compatibility with :class:`Recorder`."""
+        pass